@@ -0,0 +1,252 @@
+"""Benchmark sep_json_writer on synthetic submissions.
+
+Generates a reproducible set of submissions (fixed random seed) that
+exercise every trigger type (CME, flare, CME simulation, particle
+intensity, human evaluation), both model input types (magnetic
+connectivity, magnetogram) and every forecast field (peak intensities,
+fluences, event lengths, threshold crossings, probabilities, all clear),
+then times ParseArguments, each ConvertToJSON Prep* stage and WriteJSON
+separately (with sep_json_writer.StageTimer).
+
+    python bench_sep_json_writer.py --count 500 --save bench_baseline.json
+    python bench_sep_json_writer.py --count 500 --compare bench_baseline.json
+
+--startup-budget checks the cold start instead: importing sep_json_writer
+and building its argument parser in a fresh interpreter must take less
+than the budget (exit status 1 if it doesn't).
+
+    python bench_sep_json_writer.py --startup-budget 50
+"""
+import sep_json_writer
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+# The stages WriteJSON runs, in order
+PREP_STAGES = ['PrepModel', 'PrepIssueTime', 'PrepMode', 'PrepTriggers',
+               'PrepModelInputs', 'PrepForecasts']
+STAGES = (['ParseArguments'] + PREP_STAGES
+          + ['serialize', 'write', 'WriteJSON', 'ConvertToJSON'])
+TIME_FORMAT = '%Y-%m-%dT%H:%MZ'
+# run in a fresh interpreter by startup_seconds
+STARTUP_CODE = ('import time; t0 = time.perf_counter(); import sep_json_writer; '
+                't1 = time.perf_counter(); sep_json_writer.InitParser(""); '
+                'print(t1 - t0, time.perf_counter() - t1)')
+URL = 'https://kauai.ccmc.gsfc.nasa.gov/DONKI/'
+
+
+def timestamp(dt):
+    return dt.strftime(TIME_FORMAT)
+
+
+def synthetic_argv(rng, n_forecasts):
+    """Command line arguments for one synthetic submission.
+
+    Every trigger, input and forecast field is filled in, with values
+    drawn from rng so that submissions differ from each other but are
+    always valid (times in the past, all clear thresholds matching the
+    energy channels, and so on).
+    """
+    issue = (datetime.datetime(2020, 1, 1)
+             + datetime.timedelta(minutes=rng.randrange(0, 3*365*24*60)))
+    def before(hours):
+        return timestamp(issue - datetime.timedelta(hours=hours))
+    def after(hours):
+        return timestamp(issue + datetime.timedelta(hours=hours))
+    def number(low, high, digits=2):
+        return str(round(rng.uniform(low, high), digits))
+
+    argv = ['--model-short-name', 'BENCH Model',
+            '--spase-id', 'spase://CCMC/SimulationModel/BENCH/v1',
+            '--issue-time', timestamp(issue), '--mode', 'forecast',
+            '--no-logging']
+    # triggers
+    argv += ['--cme-start-time', before(4), '--cme-liftoff-time', before(4.5),
+             '--cme-lat', number(-60, 60), '--cme-lon', number(-90, 90),
+             '--cme-coordinates', 'HEEQ', '--cme-pa', number(0, 360),
+             '--cme-half-width', number(10, 90), '--cme-speed', number(300, 3000),
+             '--cme-acceleration', number(0, 10), '--cme-height', number(2, 30),
+             '--cme-time-at-height-time', before(2),
+             '--cme-time-at-height-height', number(2, 30),
+             '--cme-catalog', 'DONKI', '--cme-catalog-id', 'BENCH-CME-001',
+             '--cme-urls', URL]
+    argv += ['--flare-last-data-time', before(5), '--flare-start-time', before(6),
+             '--flare-peak-time', before(5.5), '--flare-end-time', before(5.2),
+             '--flare-location', 'N{:02d}W{:02d}'.format(rng.randrange(90), rng.randrange(90)),
+             '--flare-intensity', '{:.1e}'.format(rng.uniform(1e-6, 1e-3)),
+             '--flare-integrated-intensity', number(0, 1, 4),
+             '--flare-noaa-region', str(rng.randrange(11000, 14000)),
+             '--flare-urls', URL]
+    argv += ['--cme-sim-model', 'WSA-ENLIL', '--cme-sim-completion-time', before(1),
+             '--cme-sim-urls', URL]
+    argv += ['--pi-observatory', 'GOES-16', '--pi-instrument', 'SEISS',
+             '--pi-last-data-time', before(0.5),
+             '--pi-ongoing-events-start-time', before(3),
+             '--pi-ongoing-events-threshold', '10',
+             '--pi-ongoing-events-energy-min', '10',
+             '--pi-ongoing-events-energy-max', '-1']
+    argv += ['--human-evaluation-last-data-time', before(1)]
+    # inputs
+    argv += ['--magcon-method', 'WSA', '--magcon-lat', number(-90, 90),
+             '--magcon-lon', number(-180, 180),
+             '--magcon-angle-great-circle', number(0, 360),
+             '--magcon-angle-lat', number(-90, 90),
+             '--magcon-angle-lon', number(-180, 180),
+             '--magcon-solar-wind-observatory', 'ACE',
+             '--magcon-solar-wind-speed', number(250, 900)]
+    argv += ['--magnetogram-observatory', 'SDO', '--magnetogram-instrument', 'HMI',
+             '--magnetogram-product', 'hmi_M_720s',
+             '--magnetogram-product-last-data-time', before(1)]
+    # forecasts: alternate the >10 MeV and >100 MeV channels
+    for i in range(n_forecasts):
+        (energy_min, threshold) = [('10', '10'), ('100', '1')][i % 2]
+        argv += ['--energy-min', energy_min, '--energy-max', '-1',
+                 '--energy-units', 'MeV', '--species', 'proton',
+                 '--location', 'earth',
+                 '--prediction-window', after(0), after(24)]
+        for (field, hours) in [('peak-intensity', 6), ('peak-intensity-esp', 5),
+                               ('peak-intensity-max', 7)]:
+            argv += ['--' + field, number(0.1, 1000),
+                     '--' + field + '-units', 'pfu',
+                     '--' + field + '-time', after(hours)]
+        argv += ['--fluences', str(rng.randrange(10000, 100000000)),
+                 '--fluence-units', 'cm^-2*sr^-1',
+                 '--event-length-start-times', after(3),
+                 '--event-length-end-times', after(12),
+                 '--event-length-thresholds', threshold,
+                 '--event-length-threshold-units', 'pfu',
+                 '--thresh-crossing-times', after(3),
+                 '--crossing-thresholds', threshold,
+                 '--crossing-threshold-units', 'pfu',
+                 '--probabilities', number(0, 1),
+                 '--prob-thresholds', threshold,
+                 '--prob-threshold-units', 'pfu',
+                 '--all-clear', rng.choice(['true', 'false']),
+                 '--all-clear-threshold', threshold,
+                 '--all-clear-threshold-units', 'pfu',
+                 '--sep-profile', 'bench_{}mev.txt'.format(energy_min),
+                 '--native-id', 'bench-{}'.format(i)]
+    return argv
+
+
+def synthetic_argvs(count, n_forecasts, seed):
+    rng = random.Random(seed)
+    return [synthetic_argv(rng, n_forecasts) for _ in range(count)]
+
+
+def run_once(argvs, output_dir, write_file):
+    """Parse and convert every submission once; return the StageTimer"""
+    timer = sep_json_writer.StageTimer()
+    parser = sep_json_writer.InitParser('benchmark')
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for (i, argv) in enumerate(argvs):
+            output_filename = os.path.join(output_dir, 'bench{:06d}.json'.format(i))
+            (_, _, log_msgs, log_dir, log_starter, data_dict) = timer.Time(
+                'ParseArguments', sep_json_writer.ParseArguments, parser, argv, 'raise')
+            timer.Time('ConvertToJSON', sep_json_writer.ConvertToJSON,
+                       data_dict, output_filename, output_dir, log_msgs,
+                       log_dir, log_starter, write_file, 'overwrite', 'raise',
+                       None, timer)
+    return timer
+
+
+def stage_seconds(timer):
+    """{stage: wall seconds} for the stages in STAGES that ran"""
+    return {name: timer.stats[name][1] for name in STAGES if name in timer.stats}
+
+
+def startup_seconds(repeat):
+    """(import, InitParser) wall seconds of the fastest of repeat fresh interpreters"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', STARTUP_CODE], cwd=here,
+                             check=True, capture_output=True, text=True).stdout
+        runs.append(tuple(float(x) for x in out.split()))
+    return min(runs, key=sum)
+
+
+def print_table(results, count, baseline=None):
+    print('{:<30} {:>10} {:>12} {:>14}{}'.format(
+        'stage', 'total (s)', 'per item (us)', 'items/s',
+        '  vs baseline' if baseline else ''))
+    for name, seconds in results.items():
+        per_item = seconds / count * 1e6
+        rate = count / seconds if seconds > 0 else float('inf')
+        line = '{:<30} {:>10.4f} {:>12.1f} {:>14.1f}'.format(name, seconds, per_item, rate)
+        if baseline and baseline.get(name):
+            line += '  {:+.1f}%'.format((seconds / baseline[name] - 1) * 100)
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark sep_json_writer on synthetic submissions'
+    )
+    parser.add_argument('--count', type=int, default=200,
+                        help='number of synthetic submissions (default 200)')
+    parser.add_argument('--forecasts', type=int, default=2,
+                        help='forecasts per submission (default 2)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='repeat the run and keep the fastest time per stage (default 3)')
+    parser.add_argument('--seed', type=int, default=20190103,
+                        help='random seed for the synthetic submissions')
+    parser.add_argument('--in-memory', action='store_true',
+                        help='do not write the JSON files (WriteJSON only serializes)')
+    parser.add_argument('--save', default=None,
+                        help='save the results (JSON) to use with --compare later')
+    parser.add_argument('--compare', default=None,
+                        help='compare with results saved by --save')
+    parser.add_argument('--validators', type=int, default=0, metavar='N',
+                        help='also list the N slowest field validators (last run)')
+    parser.add_argument('--startup-budget', type=float, default=None, metavar='MS',
+                        help='only check that importing sep_json_writer and building its '
+                             'parser takes less than MS milliseconds (best of --repeat)')
+    args = parser.parse_args()
+
+    if args.startup_budget is not None:
+        (import_s, parser_s) = startup_seconds(max(args.repeat, 1))
+        total_ms = (import_s + parser_s) * 1e3
+        print('import sep_json_writer {:.1f} ms + InitParser {:.1f} ms = {:.1f} ms '
+              '(budget {:g} ms, best of {})'.format(import_s * 1e3, parser_s * 1e3,
+                                                   total_ms, args.startup_budget,
+                                                   max(args.repeat, 1)))
+        if total_ms > args.startup_budget:
+            print('over the startup budget')
+            sys.exit(1)
+        sys.exit(0)
+
+    argvs = synthetic_argvs(args.count, args.forecasts, args.seed)
+    best = None
+    with tempfile.TemporaryDirectory(prefix='bench_sep_json_writer.') as output_dir:
+        for _ in range(args.repeat):
+            timer = run_once(argvs, output_dir, not args.in_memory)
+            totals = stage_seconds(timer)
+            if best is None:
+                best = totals
+            else:
+                best = {name: min(best[name], totals[name]) for name in best}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)['results']
+    print('{} submissions x {} forecasts, best of {} (python {})'.format(
+        args.count, args.forecasts, args.repeat, sys.version.split()[0]))
+    print_table(best, args.count, baseline)
+    if args.validators:
+        print()
+        print('\n'.join(line for line in timer.Summary(args.validators).splitlines()
+                        if not line.split()[0] in STAGES))
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump({'count': args.count, 'forecasts': args.forecasts,
+                       'seed': args.seed, 'in_memory': args.in_memory,
+                       'results': best}, fh, indent=1)
@@ -45,44 +45,111 @@ modifications are listed at the end of the file.
 
 
 #### System Imports ####
-import argparse
+import atexit
 import collections
+import contextlib
 import datetime
+import functools
+import io
+import itertools
 import logging
 import json
 import os
+import queue
 import string
 import sys
+import threading
+import time
 import traceback
+# argparse, concurrent.futures, hashlib, http.server, logging.handlers, multiprocessing, signal, socketserver and sqlite3 are 
+# imported in the functions that use them, so scripts that import sep_json_writer (and every CLI run) start quickly
 #### end of IMPORTS #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
 
 
+#### CONSTANTS #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
+noneList = [None, 'None', 'none', ['none'], ['None'], [None]] # NOTE: 0 is not included because it is valid/needed in many fields
+# the arguments ParseArguments turns into the data dictionary, in the order it handles them
+argsL = ['model_short_name', 'spase_id', 'issue_time', 'mode', 'cme_start_time', 'cme_liftoff_time', 'cme_lat', 'cme_lon', 'cme_pa', 'cme_half_width', 'cme_speed', 'cme_acceleration', 'cme_height', 'cme_time_at_height_time', 'cme_time_at_height_height', 'cme_coordinates', 'cme_catalog', 'cme_catalog_id', 'cme_urls', 'flare_last_data_time', 'flare_start_time', 'flare_peak_time', 'flare_end_time', 'flare_location', 'flare_intensity', 'flare_integrated_intensity', 'flare_noaa_region', 'flare_urls', 'cme_sim_model', 'cme_sim_completion_time', 'cme_sim_urls', 'pi_observatory', 'pi_instrument', 'pi_last_data_time', 'pi_ongoing_events_start_time', 'pi_ongoing_events_threshold', 'pi_ongoing_events_energy_min', 'pi_ongoing_events_energy_max', 'human_evaluation_last_data_time', 'magcon_method', 'magcon_lat', 'magcon_lon', 'magcon_angle_great_circle', 'magcon_angle_lat', 'magcon_angle_lon', 'magcon_solar_wind_observatory', 'magcon_solar_wind_speed', 'magnetogram_observatory', 'magnetogram_instrument', 'magnetogram_product', 'magnetogram_product_last_data_time', 'energy_min', 'energy_max', 'energy_units', 'species', 'location', 'prediction_window', 'peak_intensity', 'peak_intensity', 'peak_intensity_units', 'peak_intensity_uncertainty', 'peak_intensity_uncertainty_low', 'peak_intensity_uncertainty_high', 'peak_intensity_time', 'peak_intensity_esp', 'peak_intensity_esp_units', 'peak_intensity_esp_uncertainty', 'peak_intensity_esp_uncertainty_low', 'peak_intensity_esp_uncertainty_high', 'peak_intensity_esp_time', 'peak_intensity_max', 'peak_intensity_max_units', 'peak_intensity_max_uncertainty', 'peak_intensity_max_uncertainty_low', 'peak_intensity_max_uncertainty_high', 'peak_intensity_max_time', 'fluences', 'fluence_units', 'fluence_uncertainty_low', 'fluence_uncertainty_high', 'event_length_start_times', 'event_length_end_times', 'event_length_thresholds', 'event_length_threshold_units', 'thresh_crossing_times', 'thresh_uncertainties', 'crossing_thresholds', 'crossing_threshold_units', 'probabilities', 'prob_uncertainties', 'prob_thresholds', 'prob_threshold_units', 'all_clear', 'all_clear_threshold', 'all_clear_threshold_units', 'all_clear_probability_threshold', 'sep_profile', 'native_id']
+stubNoneList = [None, 'None', '0', 0] # the stub value list ConvertToJSON compares values against (ConvertToJSON.noneList)
+sharedLoggers = {} # (process id, log_dir, log_starter) -> (logger, QueueListener), see GetSharedLogger
+sharedLoggersLock = threading.Lock() # so threads converting at the same time don't both make the same logger
+SUBMISSION_HASH_VERSION = 1 # part of every SubmissionHash; bump it when the same submission would give a different JSON file
+SUBMISSION_HASH_INDEX_FILENAME = '.sep_json_writer_hashes.sqlite' # the default SubmissionHashIndex file (in the log directory)
+# fields whose (string) values are interned by the field validators: a few vocabulary words repeated in every forecast of every submission
+INTERNED_FIELDS = frozenset(['units', 'threshold_units', 'species', 'location', 'short_name', 'spase_id', 'observatory', 'instrument', 'coordinates', 'catalog', 'method', 'model', 'product'])
+SEP_PROFILE_BLOCK_SIZE = 4096 # bytes read from each end of an sep_profile file to find its first and last time stamps (see SEPProfileTimeRange)
+batchProfileIndex = (None, None) # (batch reference time, SEPProfileIndex) of the batch this process is working on, see ConvertBatchItem
+DATETIME_CACHE_SIZE = 4096 # how many distinct date time stamps DateTimeStampFields/DateTimeStampProblem remember
+# the characters allowed at each position of a date time stamp, by length ('YYYY-MM-DDTHH:MMZ' or 'YYYY-MM-DDTHH:MM:SSZ')
+DATETIME_STAMP_CHARS = {
+    17: [string.digits]*4 + ['-'] + [string.digits]*2 + ['-'] + [string.digits]*2 + ['T'] + [string.digits]*2 + [':'] + [string.digits]*2 + ['Z'],
+    20: [string.digits]*4 + ['-'] + [string.digits]*2 + ['-'] + [string.digits]*2 + ['T'] + [string.digits]*2 + [':'] + [string.digits]*2 + [':'] + [string.digits]*2 + ['Z'],
+}
+# the JSON output formats (ConvertToJSON(json_format=...)): name -> (encoder, gzip the file (adds .gz to its name))
+JSON_FORMATS = {
+    'default':    (json.JSONEncoder(), False), # what json.dumps writes
+    'compact':    (json.JSONEncoder(separators=(',', ':')), False),
+    'compact.gz': (json.JSONEncoder(separators=(',', ':')), True),
+}
+# the rules CheckForecastCrossFields evaluates, in the order it reports them: name -> what a failing forecast got wrong
+CROSS_FIELD_RULES = collections.OrderedDict([
+    ('unreadable', 'a time stamp or number one of the rules needs is missing or does not convert'),
+    ('prediction_window_order', 'the prediction window does not start before it ends'),
+    ('event_length_in_window', 'an event length starts or ends outside the prediction window'),
+    ('probability_range', 'a probability_value is not between 0 and 1'),
+    ('all_clear_threshold', 'the all clear threshold does not match the energy channel (10 pfu for > 10 MeV, 1 pfu for > 100 MeV)'),
+])
+# columns of the columnar submissions table (see SubmissionColumnRows and WriteSubmissionColumns)
+# one row per forecast and probability (probability_index is 0 and the probability columns are NULL if there are none)
+SUBMISSION_COLUMNS = [
+    ('output_filename', 'TEXT NOT NULL'), ('forecast_index', 'INTEGER NOT NULL'), ('probability_index', 'INTEGER NOT NULL'),
+    ('model_short_name', 'TEXT'), ('issue_time', 'TEXT'), ('mode', 'TEXT'),
+    ('energy_min', 'REAL'), ('energy_max', 'REAL'), ('energy_units', 'TEXT'), ('species', 'TEXT'), ('location', 'TEXT'),
+    ('prediction_window_start', 'TEXT'), ('prediction_window_end', 'TEXT'),
+    ('probability_value', 'REAL'), ('probability_threshold', 'REAL'), ('probability_threshold_units', 'TEXT'),
+    ('all_clear_boolean', 'INTEGER'), ('all_clear_threshold', 'REAL'), ('all_clear_threshold_units', 'TEXT'), ('all_clear_probability_threshold', 'REAL'),
+]
+#### end of CONSTANTS #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
+
+
 #### FUNCTIONS #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
 
-def CheckAllClearThresholdVsEnergyChannel(acD, totalD):
+def CheckAllClearThresholdVsEnergyChannel(acD, totalD, on_error='exit', print_function=None, logger=None):
     """ 
     Input:
         acD (dictionary) all clear data
         totalD (dictionary) the forecast's data
+        on_error (string) 'exit' (the default) or 'raise' (raise SEPValidationError), see FailValidation
+        print_function (function|None) what the message is printed with (called like print).  None means print.
+        logger (logger|None) if given, the message is also logged with it (as an error)
     Output: None.  Program exits if there is a conflict found in the values.
     Description:
         Compare the all clear threshold value against the energy channel minimum value.  
         If they don't match the expected value, explain it to the user and exit.
+        If the threshold or the energy channel is missing (or isn't a dictionary), there is nothing to compare; 
+        ConvertToJSON reports what is missing.
 
     """
-    acthresh = acD['threshold']
-    min_ = totalD['energy_channel']['min']
-    max_ = totalD['energy_channel']['max']
+    energy_channel = totalD.get('energy_channel')
+    if not isinstance(acD, dict) or not isinstance(energy_channel, dict): return
+    acthresh = acD.get('threshold')
+    min_ = energy_channel.get('min')
+    max_ = energy_channel.get('max')
+    if acthresh is None or min_ is None: return
     if max_ == -1 or max_ == '-1':
         #print('    > {0} {1}'.format(min_, totalD['energy_channel']['units']))
         if min_ in [10, "10"]:
             if acthresh not in [10, "10"]: # throw an error
-                print('Energy Channel and All Clear Threshold do not match.  With a > 10 MeV energy channel, the all clear threshold should be 10 pfu.  Exiting.')
-                sys.exit()
+                m = 'Energy Channel and All Clear Threshold do not match.  With a > 10 MeV energy channel, the all clear threshold should be 10 pfu.  Exiting.'
+                (print_function or print)(m)
+                if logger is not None: logger.error(m)
+                FailValidation(m, on_error, 'all_clear/threshold')
         elif min_ in [100, "100"]:
             if acthresh not in [1, "1"]: # throw an error
-                print('Energy Channel and All Clear Threshold do not match.  With a > 100 MeV energy channel, the all clear threshold should be 1 pfu.  Exiting.')
-                sys.exit()
+                m = 'Energy Channel and All Clear Threshold do not match.  With a > 100 MeV energy channel, the all clear threshold should be 1 pfu.  Exiting.'
+                (print_function or print)(m)
+                if logger is not None: logger.error(m)
+                FailValidation(m, on_error, 'all_clear/threshold')
     #else:
     #    #print('    {0} - {1} {2}'.format(min_, max_, totalD['energy_channel']['units']))
     #    # can't validate
@@ -115,6 +182,577 @@ def CheckForRequiredArgs(d, req_argsL=None, err_msg=None):
 # end CheckForRequiredArgs
 
 
+def CheckForecastCrossFields(forecasts):
+    """ 
+    Input: forecasts: (iterable) forecast dictionaries (a submission's 'forecasts' entries), validated or not
+    Output: (dictionary) CROSS_FIELD_RULES name -> list of the indices (into forecasts) of the forecasts that break the rule
+    Description: Check the rules that relate fields of a forecast to each other (see CROSS_FIELD_RULES) for a whole batch 
+        of forecasts at once, e.g., every forecast of a multi-year reprocessing run.  The fields the rules need are loaded
+        into NumPy arrays (one per field, with an owner index array for the event lengths and probabilities), and each rule
+        is evaluated as array expressions instead of one forecast at a time the way ConvertToJSON does.  A forecast whose 
+        fields don't convert is reported under 'unreadable' (the field validators give the details).  Requires numpy.
+
+    """
+
+    import numpy as np
+    def Number(v):
+        try: return float(v)
+        except (TypeError, ValueError): return np.nan
+    def Numbers(values):
+        try: return np.array(values, dtype=float)
+        except (TypeError, ValueError): return np.array([Number(v) for v in values], dtype=float)
+    def Stamp(dts):
+        return dts[:-1] if isinstance(dts, str) and dts.endswith('Z') else 'NaT'
+    def Time(dts):
+        try: return np.datetime64(Stamp(dts), 's')
+        except ValueError: return np.datetime64('NaT', 's')
+    def Times(stamps):
+        try: return np.array([dts[:-1] if isinstance(dts, str) and dts.endswith('Z') else 'NaT' for dts in stamps], dtype='datetime64[s]') # Stamp, inlined
+        except ValueError: return np.array([Time(dts) for dts in stamps], dtype='datetime64[s]')
+
+    forecastL = list(forecasts)
+    n = len(forecastL)
+    windowL = [f.get('prediction_window') or {} for f in forecastL]
+    (window_start, window_end) = (Times([w.get('start_time') for w in windowL]), Times([w.get('end_time') for w in windowL]))
+    window_unreadable = np.isnat(window_start) | np.isnat(window_end)
+    unreadable = window_unreadable.copy()
+    failD = {'unreadable':unreadable, 'prediction_window_order':~window_unreadable & (window_end <= window_start)}
+
+    # event lengths: one array entry per event length, owner is the index of its forecast
+    (owner, startL, endL) = ([], [], [])
+    for (i, f) in enumerate(forecastL):
+        for e in f.get('event_lengths') or []:
+            owner.append(i)
+            startL.append(e.get('start_time'))
+            endL.append(e.get('end_time'))
+    owner = np.array(owner, dtype=np.intp)
+    (start, end, has_end) = (Times(startL), Times(endL), np.array([e is not None for e in endL], dtype=bool))
+    unreadable[owner[np.isnat(start) | (has_end & np.isnat(end))]] = True
+    (w_start, w_end) = (window_start[owner], window_end[owner])
+    outside = (start < w_start) | (start > w_end) | (has_end & ((end < w_start) | (end > w_end))) # NaT compares False
+    outside &= ~window_unreadable[owner]
+    failD['event_length_in_window'] = np.zeros(n, dtype=bool)
+    failD['event_length_in_window'][owner[outside]] = True
+
+    # probabilities: one array entry per probability
+    (owner, valueL) = ([], [])
+    for (i, f) in enumerate(forecastL):
+        for p in f.get('probabilities') or []:
+            owner.append(i)
+            valueL.append(p.get('probability_value'))
+    (owner, value) = (np.array(owner, dtype=np.intp), Numbers(valueL))
+    unreadable[owner[np.isnan(value)]] = True
+    failD['probability_range'] = np.zeros(n, dtype=bool)
+    failD['probability_range'][owner[(value < 0.0) | (value > 1.0)]] = True
+
+    # all clear threshold vs. energy channel (see CheckAllClearThresholdVsEnergyChannel), for the forecasts that have one
+    owner = np.array([i for (i, f) in enumerate(forecastL) if 'all_clear' in f], dtype=np.intp)
+    threshold = Numbers([forecastL[i]['all_clear'].get('threshold') for i in owner])
+    channelL = [forecastL[i].get('energy_channel') or {} for i in owner]
+    (e_min, e_max) = (Numbers([c.get('min') for c in channelL]), Numbers([c.get('max') for c in channelL]))
+    applies = (e_max == -1) & ((e_min == 10) | (e_min == 100))
+    unreadable[owner[applies & np.isnan(threshold)]] = True
+    failD['all_clear_threshold'] = np.zeros(n, dtype=bool)
+    failD['all_clear_threshold'][owner[applies & ~np.isnan(threshold) & (threshold != np.where(e_min == 10, 10.0, 1.0))]] = True
+
+    return collections.OrderedDict([(rule, np.flatnonzero(failD[rule]).tolist()) for rule in CROSS_FIELD_RULES])
+# end CheckForecastCrossFields
+
+
+def CompileFieldValidator(pfn, k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value, min_v=None, max_v=None, check=None, addtl_chars='', check_always=False, store='valid', pair_key=None):
+    """ 
+    Input:
+        pfn:              (string) parent field name, used for error messages ('' for top level fields)
+        k:                (string) key name
+        s:                (ANY) stub value
+        r:                (boolean) whether or not the key is required
+        allow_neg:        (boolean) whether or not negative values are allowed
+        allow_neg_one:    (boolean) whether or not -1 is allowed
+        must_be_in_past:  (boolean) whether or not a date time stamp has to be in the past
+        allow_stub_value: (boolean) whether or not the stub value is allowed (i.e., skip the VerifyNonStubValue step)
+        min_v:            (float|None) the minimum value allowed
+        max_v:            (float|None) the maximum value allowed
+        check:            (string|None) the kind of validation to run on the value.  See the if/elif chain below.
+        addtl_chars:      (string) additional characters allowed by the 'alphanumeric' check
+        check_always:     (boolean) run the check even if a (non-required) stub value was found
+        store:            (string) when to put the value in the ordered dictionary:
+                              'valid'    - only if the stub value was allowed or not found
+                              'always'   - always
+                              'not_none' - always, unless the value is in noneList
+        pair_key:         (string|None) key that becomes required if this value is a non-stub value (e.g., cme lat/lon)
+    Output: a validator function, called as validator(ConvertToJSON object, data dictionary, ordered dictionary)
+    Description: Build the validator for one row of a field table.  This is done once, when the module loads,
+        so the ConvertToJSON.Prep* methods don't have to interpret the field tables for every submission.
+        The validator verifies the key is in the dictionary, verifies the stub value was replaced, validates 
+        the value and puts it in the ordered dictionary, exactly the way the Prep* loops used to.
+        String values of the INTERNED_FIELDS keys are interned, so the batch converters share one copy of each.
+
+    """
+
+    if pfn: fn = '{}/{}'.format(pfn, k) # field name used in messages
+    else: fn = k
+
+    if check == 'datetime':
+        def check_value(self, value, d):
+            self.ValidateDateTimeStamp(value, fn, ensure_in_past=must_be_in_past)
+            return value
+    elif check == 'float':
+        def check_value(self, value, d):
+            return self.ValidateFloat(value, fn, allow_neg, allow_neg_one, min_v, max_v)
+    elif check == 'probability':
+        def check_value(self, value, d):
+            value = self.ValidateFloat(value, fn, allow_neg, allow_neg_one, min_v, max_v)
+            self.ValidateForecastProbabilityValue(value)
+            return value
+    elif check == 'alphanumeric':
+        def check_value(self, value, d):
+            self.ValidateAlphaNumeric(value, fn, allow_addtl_chars=addtl_chars)
+            return value
+    elif check == 'boolean':
+        def check_value(self, value, d):
+            self.ValidateBoolean(value, fn)
+            return value
+    elif check == 'spase_id':
+        def check_value(self, value, d):
+            self.ValidateURL(value, fn, spase_id=True)
+            return value
+    elif check == 'urls':
+        def check_value(self, value, d):
+            return self.PrepTriggersURLs(value, fn) # verifies list, non-None, validates, returns fresh List
+    elif check == 'stonyhurst':
+        def check_value(self, value, d):
+            self.ValidateStonyhurstCoordinates(value, fn)
+            return value
+    elif check == 'noaa_region':
+        def check_value(self, value, d):
+            self.ValidateNOAARegion(value)
+            return value
+    elif check == 'coordinates':
+        def check_value(self, value, d):
+            self.ValidateCoordinates(value)
+            return value
+    elif check == 'catalog':
+        def check_value(self, value, d):
+            self.ValidateCatalog(value)
+            return value
+    elif check == 'catalog_id':
+        def check_value(self, value, d):
+            self.ValidateCatalogID(value, d['catalog'])
+            return value
+    elif check == 'magcon_method':
+        def check_value(self, value, d):
+            self.ValidateModelInputsMagneticConnectivityMethod(value, fn)
+            return value
+    elif check == 'species':
+        def check_value(self, value, d):
+            self.ValidateForecastSpecies(value)
+            return value
+    elif check == 'location':
+        def check_value(self, value, d):
+            self.ValidateForecastLocation(value)
+            return value
+    elif check == 'sep_profile':
+        def check_value(self, value, d):
+            self.ValidateForecastSEPProfile(value)
+            return value
+    elif check == 'native_id':
+        def check_value(self, value, d):
+            self.ValidateForecastNativeID(value)
+            return value
+    elif check is None:
+        check_value = None
+    else:
+        raise ValueError('Unknown field check \'{}\' for \'{}\'.'.format(check, fn))
+
+    intern_value = k in INTERNED_FIELDS
+    def validator(self, d, toD):
+        if self.VerifyKeyInDict(k, d, required=r):
+            value = d[k]
+            stub_found = False
+            if not allow_stub_value:
+                stub_found = self.VerifyNonStubValue(value, s, fn, required=r) # check for non-stub value
+            valid = allow_stub_value or not stub_found
+            if check_value is not None and (valid or check_always):
+                value = check_value(self, value, d)
+            if store == 'always' or (store == 'valid' and valid) or (store == 'not_none' and value not in noneList):
+                if intern_value and type(value) is str: value = sys.intern(value)
+                toD[k] = value
+            # If this is a non-zero/non-stub value, make sure the paired key is there too.
+            if pair_key is not None and not self.VerifyNonStubValue(value, s, fn, required=False):
+                self.VerifyKeyInDict(pair_key, d, required=True)
+        return
+    validator.field_name = fn # StageTimer name
+    return validator
+# end CompileFieldValidator
+
+
+def ConvertBatch(manifest_filename, workers=None, output_dir='./', log_msgs=True, log_dir='./', log_starter='isep_model_run', write_mode='overwrite', report_filename=None, columns_db=None, timer=None, now=None, dedupe=False, check_profiles=False, group=False, json_format='default', hash_index=None):
+    """ 
+    Input:
+        manifest_filename: (string) JSON Lines file, one submission per line.  Each line is either a submission dictionary
+                           (in the 'sep_forecast_submission_dataDict' shape) or an object holding that dictionary under 
+                           'sep_forecast_submission_dataDict' and, optionally, an 'output_filename'.
+        workers:           (integer|None) number of worker processes.  None means os.cpu_count().  1 converts in this process.
+        output_dir:        (string) directory where the output files should be put
+        log_msgs:          (boolean) whether or not to log the messages.
+        log_dir:           (string) the directory the log should live in.
+        log_starter:       (string) the beginning of the log filename.
+        write_mode:        (string) 'overwrite' or 'if_changed' (see ConvertToJSON)
+        report_filename:   (string|None) if given, write the per-submission report to this file (JSON Lines)
+        columns_db:        (string|None) if given, also put the converted submissions in this columnar SQLite file.
+                           The workers send their rows back, so only this process writes to it (one transaction).
+        timer:             (StageTimer|None) if given, the workers time the conversion stages and validators and send
+                           their timings back, which are added to timer
+        now:               (datetime|None) reference UTC time the 'must be in the past' checks compare with.  None means 
+                           the time the batch starts; either way every submission in the batch uses the same one.
+        dedupe:            (boolean) skip submissions already converted, in this batch or (see SubmissionHashIndex) by an
+                           earlier run, to the same output file.  Their reports say write_status 'duplicate'.
+        check_profiles:    (boolean) also check the sep_profile files the forecasts reference (see SEPProfileIndex).
+                           Each worker lists each output directory once for the whole batch.
+        group:             (boolean) first merge the submissions that only differ in their forecasts (see GroupSubmissions).
+                           The manifest is read in full first, and each report also holds the 'lines' it was made from.
+        json_format:       (string) a JSON_FORMATS name (see ConvertToJSON)
+        hash_index:        (string|None) the SubmissionHashIndex file (dedupe only).  None means SUBMISSION_HASH_INDEX_FILENAME
+                           in log_dir.
+    Output: a list of report dictionaries, one per submission, in manifest order
+    Description: Validate and convert every submission in the manifest, spread across a pool of worker processes.
+        The report keeps the manifest order no matter which worker finishes first.  A submission that fails 
+        validation does not stop the batch; its report holds the error message instead.
+
+    """
+
+    if now is None: now = datetime.datetime.utcnow()
+    index = SubmissionHashIndex(hash_index or os.path.join(log_dir, SUBMISSION_HASH_INDEX_FILENAME)) if dedupe else None
+    hashD = {}   # line number -> submission hash (dedupe only)
+    firstD = {}  # submission hash -> line number of its first occurrence in the manifest
+    repeatD = {} # line number -> line number of the same submission, or the output filename an earlier run wrote it to
+    linesD = {}  # line number -> the line numbers of the submissions merged into it (group only)
+    badL = []    # the reports of the lines that aren't submissions
+    def Items():
+        with open(manifest_filename) as infile:
+            for (line_number, line) in enumerate(infile, 1):
+                if line.strip() == '': continue
+                try:
+                    (dataDict, output_filename) = ParseManifestLine(line)
+                except ValueError as e:
+                    badL.append({'line':line_number, 'output_filename':None, 'status':'failed', 'write_status':None, 'error':'Not a JSON submission: {}'.format(e), 'messages':''})
+                    continue
+                yield (line_number, dataDict, output_filename)
+    def Jobs():
+        items = Items()
+        if group:
+            itemL = list(items)
+            (dataDictL, output_filenameL, membersL) = GroupSubmissions([item[1] for item in itemL], [item[2] for item in itemL])
+            items = []
+            for (dataDict, output_filename, members) in zip(dataDictL, output_filenameL, membersL):
+                linesD[itemL[members[0]][0]] = [itemL[m][0] for m in members]
+                items.append((itemL[members[0]][0], dataDict, output_filename))
+        for (line_number, dataDict, output_filename) in items:
+            if index is not None:
+                h = SubmissionHash(dataDict, output_filename, json_format)
+                known = firstD.get(h) or index.Lookup(h)
+                if known is not None:
+                    repeatD[line_number] = known
+                    continue
+                (hashD[line_number], firstD[h]) = (h, line_number)
+            yield (line_number, dataDict, output_filename, output_dir, log_msgs, log_dir, log_starter, write_mode, columns_db is not None, timer is not None, now, True, False, check_profiles, json_format)
+
+    if workers is None: workers = os.cpu_count() or 1
+    import concurrent.futures
+    try:
+        if workers == 1:
+            reportL = [ConvertBatchItem(job) for job in Jobs()]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                reportL = list(executor.map(ConvertBatchItem, Jobs(), chunksize=8))
+        if index is not None:
+            for r in reportL:
+                if r['write_status'] in ['written', 'unchanged']: index.Record(hashD[r['line']], r['output_filename'])
+    finally:
+        if index is not None: index.Close()
+
+    if repeatD or badL:
+        lineD = dict([(r['line'], r) for r in reportL])
+        for (line_number, known) in repeatD.items():
+            if known in lineD: # repeated in this batch: same outcome as the first one
+                r = dict([(k, v) for (k, v) in lineD[known].items() if k not in ['column_rows', 'timing']])
+                r.update({'line':line_number, 'messages':''})
+                if r['status'] == 'ok': r['write_status'] = 'duplicate'
+            else: # converted by an earlier run
+                r = {'line':line_number, 'output_filename':known, 'status':'ok', 'write_status':'duplicate', 'error':None, 'messages':''}
+                if columns_db is not None:
+                    r['column_rows'] = SubmissionColumnRows(json.loads(ReadJSONFile(known))['sep_forecast_submission'], known)
+            reportL.append(r)
+        reportL.extend(badL)
+        reportL.sort(key=lambda r: r['line'])
+    if group:
+        for r in reportL: r['lines'] = linesD.get(r['line'], [r['line']])
+
+    if columns_db is not None:
+        WriteSubmissionColumns(columns_db, collections.OrderedDict([(r['output_filename'], r.pop('column_rows')) for r in reportL if 'column_rows' in r]))
+    if timer is not None:
+        for r in reportL:
+            if 'timing' in r: timer.Merge(r.pop('timing'))
+    failedL = [r for r in reportL if r['status'] != 'ok']
+    for r in failedL:
+        print('FAILED (manifest line {}): {}'.format(r['line'], r['error']))
+    statusL = [r['write_status'] for r in reportL]
+    print('{} submission(s) converted, {} failed. {} JSON file(s) written, {} unchanged.'.format(len(reportL) - len(failedL), len(failedL), statusL.count('written'), statusL.count('unchanged'))
+        + (' {} duplicate(s) skipped.'.format(statusL.count('duplicate')) if dedupe else '')
+        + (' ({} manifest line(s) grouped into {} submission(s).)'.format(sum([len(l) for l in linesD.values()]), len(linesD)) if group else ''))
+    if report_filename is not None:
+        WriteFileAtomically(report_filename, ''.join([json.dumps(r) + '\n' for r in reportL]).encode('utf-8'))
+    return reportL
+# end ConvertBatch
+
+
+def ConvertBatchItem(job):
+    """ 
+    Input: job: (tuple) (line_number, dataDict, output_filename, output_dir, log_msgs, log_dir, log_starter, write_mode, want_columns, want_timing, now,
+        write_file, want_json, check_profiles, json_format)
+    Output: a report dictionary: 'line', 'output_filename', 'status' ('ok' or 'failed'), 'write_status', 'error' and 'messages'
+        (and 'column_rows', see SubmissionColumnRows, if want_columns is True and the conversion worked,
+        'timing', see StageTimer.AsDict, if want_timing is True, and 'json', the JSON text, if want_json is True and the conversion worked)
+    Description: Convert a single batch submission.  This runs in the worker processes, so validation errors are
+        raised (on_error='raise') instead of exiting; the error (or any other exception) is turned into a 'failed' report.
+        What the conversion prints is captured in the report's 'messages' instead of interleaving on stdout.
+        The jobs of one batch share the same reference time (now), which is how they share one SEPProfileIndex per process;
+        jobs without one (--stream, --serve) get a fresh SEPProfileIndex each.
+
+    """
+
+    global batchProfileIndex
+    (line_number, dataDict, output_filename, output_dir, log_msgs, log_dir, log_starter, write_mode, want_columns, want_timing, now, write_file, want_json, check_profiles, json_format) = job
+    profile_index = None
+    if check_profiles:
+        if now is None or batchProfileIndex[0] != now: batchProfileIndex = (now, SEPProfileIndex())
+        profile_index = batchProfileIndex[1]
+    report = {'line':line_number, 'output_filename':output_filename, 'status':'ok', 'write_status':None, 'error':None}
+    timer = StageTimer() if want_timing else None
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        try:
+            for f in dataDict.get('forecasts', []):
+                if 'all_clear' in f: CheckAllClearThresholdVsEnergyChannel(f['all_clear'], f, 'raise')
+            c = ConvertToJSON(dataDict, output_filename, output_dir, log_msgs, log_dir, log_starter, write_file=write_file, write_mode=write_mode, on_error='raise', timer=timer, now=now, profile_index=profile_index, json_format=json_format)
+            (report['output_filename'], report['write_status']) = (c.output_filename, c.write_status)
+            if want_json: report['json'] = c.json_bytes.decode('utf-8')
+            if want_columns: report['column_rows'] = SubmissionColumnRows(c.orderedDict, c.output_filename)
+        except SEPValidationError as e:
+            report.update({'status':'failed', 'error':e.message.strip()})
+        except SystemExit: # anything that still exits
+            lineL = [l.strip() for l in out.getvalue().splitlines() if l.strip() != '']
+            errorL = [l for l in lineL if 'ERROR' in l or 'Exiting' in l] or lineL # the validation messages end with 'Exiting.'
+            report.update({'status':'failed', 'error':errorL[-1] if errorL else 'Exited during validation.'})
+        except Exception as e:
+            report.update({'status':'failed', 'error':''.join(traceback.format_exception_only(type(e), e)).strip()})
+    report['messages'] = out.getvalue()
+    if timer is not None: report['timing'] = timer.AsDict()
+    return report
+# end ConvertBatchItem
+
+
+def ConvertDataDicts(dataDicts, output_filenames=None, output_dir='./', log_msgs=True, log_dir='./', log_starter='isep_model_run', write_file=True, write_mode='overwrite', on_error='exit', columns_db=None, timer=None, now=None, dedupe=False, check_profiles=False, group=False, json_format='default', hash_index=None, print_function=None, logger=None):
+    """ 
+    Input:
+        dataDicts:        (iterable) submission dictionaries, each in the 'sep_forecast_submission_dataDict' shape
+        output_filenames: (iterable|None) output filename for each submission.  None (or a None entry) means use the default filename
+                          (in the current directory, or in the directory given by an entry ending in os.sep).
+        output_dir:       (string) directory where the output files should be put
+        log_msgs:         (boolean) whether or not to log the messages.
+        log_dir:          (string) the directory the log should live in.
+        log_starter:      (string) the beginning of the log filename.
+        write_file:       (boolean) write each JSON file to disk (True) or only keep the JSON in memory (False)
+        write_mode:       (string) 'overwrite' (always write) or 'if_changed' (only write files whose content changed)
+        on_error:         (string) what to do with a submission that fails validation:
+                              'exit'    - exit the program (the default)
+                              'raise'   - raise SEPValidationError
+                              'collect' - record the error in the submission's 'errors' and go on with the next submission
+        columns_db:       (string|None) if given, also put the validated submissions in this columnar SQLite file (one transaction)
+        timer:            (StageTimer|None) if given, time the conversion stages and validators of every submission (see StageTimer)
+        now:              (datetime|None) reference UTC time the 'must be in the past' checks compare with.  None means the time
+                          ConvertDataDicts is called; either way every submission uses the same one.
+        dedupe:           (boolean) skip (no validation, no serialization) submissions already converted to the same output file,
+                          earlier in dataDicts or, when writing files, by an earlier run (see SubmissionHashIndex)
+        check_profiles:   (boolean) also check the sep_profile files the forecasts reference (see SEPProfileIndex).
+                          Each output directory is listed once for all the submissions.
+        group:            (boolean) first merge the submissions that only differ in their forecasts (see GroupSubmissions)
+        json_format:      (string) a JSON_FORMATS name (see ConvertToJSON).  The 'bytes' are the JSON, never gzipped.
+        hash_index:       (string|None) the SubmissionHashIndex file (dedupe only).  None means SUBMISSION_HASH_INDEX_FILENAME
+                          in log_dir.
+        print_function:   (function|None) what the messages are printed with (called like print).  None means print.
+        logger:           (logger|None) what the messages are logged with.  None means the shared logger (see ConvertToJSON).
+    Output: a list of dictionaries (one per submission) holding the 'output_filename', the JSON 'bytes' (None if it failed),
+        the 'write_status' ('written', 'unchanged', 'duplicate' (dedupe skipped it; it has the first one's 'bytes' and 
+        'errors') or None if nothing was written) and the validation 'errors' (a list of dictionaries).  With group, one per merged submission, also holding the 
+        'members' (the indices into dataDicts of the submissions it was made from).
+    Description: Validate and convert already-structured submission dictionaries to JSON, in-process.
+        This skips building command line arguments and running them through ParseArguments,
+        but runs the same validation, including the all clear threshold check ParseArguments does.
+
+    """
+
+    if output_filenames is None: output_filenames = itertools.repeat(None)
+    if group: (dataDicts, output_filenames, membersL) = GroupSubmissions(dataDicts, output_filenames)
+    if now is None: now = datetime.datetime.utcnow()
+    if print_function is None: print_function = print
+    resultL = []
+    columnsD = collections.OrderedDict()
+    index = SubmissionHashIndex(hash_index or os.path.join(log_dir, SUBMISSION_HASH_INDEX_FILENAME)) if (dedupe and write_file) else None
+    seenD = {} # submission hash -> result of its first occurrence (dedupe only)
+    profile_index = SEPProfileIndex() if check_profiles else None
+    try:
+        for (dataDict, output_filename) in zip(dataDicts, output_filenames):
+            if dedupe:
+                h = SubmissionHash(dataDict, output_filename, json_format)
+                if h in seenD: # same outcome as the first one
+                    result = dict(seenD[h], write_status='duplicate')
+                    resultL.append(result)
+                    continue
+                known = index.Lookup(h) if index is not None else None
+                if known is not None: # converted by an earlier run
+                    content = ReadJSONFile(known)
+                    seenD[h] = result = {'output_filename':known, 'bytes':content, 'write_status':'duplicate', 'errors':[]}
+                    resultL.append(result)
+                    if columns_db is not None: columnsD[known] = SubmissionColumnRows(json.loads(content)['sep_forecast_submission'], known)
+                    continue
+            try:
+                for f in dataDict.get('forecasts', []):
+                    if isinstance(f, dict) and 'all_clear' in f: CheckAllClearThresholdVsEnergyChannel(f['all_clear'], f, on_error, print_function, logger)
+                c = ConvertToJSON(dataDict, output_filename, output_dir, log_msgs, log_dir, log_starter, write_file=write_file, write_mode=write_mode, on_error=on_error, timer=timer, now=now, profile_index=profile_index, json_format=json_format, print_function=print_function, logger=logger)
+            except SEPValidationError as e:
+                if on_error != 'collect': raise
+                e.output_filename = output_filename
+                result = {'output_filename':output_filename, 'bytes':None, 'write_status':None, 'errors':[e.AsDict()]}
+            except Exception as e: # a submission too broken to validate (e.g., a field of the wrong type)
+                if on_error != 'collect': raise
+                e = SEPValidationError(''.join(traceback.format_exception_only(type(e), e)).strip(), None, output_filename)
+                result = {'output_filename':output_filename, 'bytes':None, 'write_status':None, 'errors':[e.AsDict()]}
+            else:
+                result = {'output_filename':c.output_filename, 'bytes':c.json_bytes, 'write_status':c.write_status, 'errors':c.errors}
+                if columns_db is not None and c.json_bytes is not None:
+                    columnsD[c.output_filename] = SubmissionColumnRows(c.orderedDict, c.output_filename)
+                if index is not None and c.write_status is not None: index.Record(h, c.output_filename)
+            resultL.append(result)
+            if dedupe: seenD[h] = result
+    finally:
+        if index is not None: index.Close()
+    if group:
+        for (i, members) in enumerate(membersL): resultL[i] = dict(resultL[i], members=members)
+    if columns_db is not None: WriteSubmissionColumns(columns_db, columnsD)
+    if write_file:
+        statusL = [r['write_status'] for r in resultL]
+        print_function('{} JSON file(s) written, {} unchanged.'.format(statusL.count('written'), statusL.count('unchanged'))
+            + (' {} duplicate(s) skipped.'.format(statusL.count('duplicate')) if dedupe else ''))
+    failedL = [r for r in resultL if r['errors'] != [] and r['write_status'] != 'duplicate'] # a failed duplicate is counted once, as a duplicate
+    if failedL != []:
+        print_function('{} submission(s) failed validation and were skipped.'.format(len(failedL)))
+    return resultL
+# end ConvertDataDicts
+
+
+def ConvertStream(infile, outfile, output_dir='./', log_msgs=True, log_dir='./', log_starter='isep_model_run', write_mode='overwrite', columns_db=None, timer=None, check_profiles=False, json_format='default'):
+    """ 
+    Input:
+        infile:       (file object) JSON Lines input, one submission per line, in the --batch manifest format (see ParseManifestLine)
+        outfile:      (file object) where the result lines go (one JSON object per input line, flushed right away)
+        output_dir:   (string) directory where the output files should be put
+        log_msgs:     (boolean) whether or not to log the messages.
+        log_dir:      (string) the directory the log should live in.
+        log_starter:  (string) the beginning of the log filename.
+        write_mode:   (string) 'overwrite' or 'if_changed' (see ConvertToJSON)
+        columns_db:   (string|None) if given, also put each converted submission in this columnar SQLite file
+        timer:        (StageTimer|None) if given, time the conversion stages and validators (see StageTimer)
+        check_profiles: (boolean) also check the sep_profile files the forecasts reference (see SEPProfileIndex)
+        json_format:  (string) a JSON_FORMATS name (see ConvertToJSON)
+    Output: (tuple) (number of submissions converted, number that failed)
+    Description: Convert submissions as they arrive, in this process, so a model wrapper can pipe any number of them 
+        through one running sep_json_writer (--stream).  Each input line gets a result line, the --batch report without
+        the 'messages', which go to stderr instead.  A line that isn't valid JSON or fails validation gets a 'failed' 
+        result line and the stream goes on.  Each submission's 'in the past' checks use the time it was read.
+
+    """
+
+    (n_ok, n_failed) = (0, 0)
+    for (line_number, line) in enumerate(infile, 1):
+        if line.strip() == '': continue
+        try:
+            (dataDict, output_filename) = ParseManifestLine(line)
+        except ValueError as e:
+            report = {'line':line_number, 'output_filename':None, 'status':'failed', 'write_status':None, 'error':'Not a JSON submission: {}'.format(e), 'messages':''}
+        else:
+            report = ConvertBatchItem((line_number, dataDict, output_filename, output_dir, log_msgs, log_dir, log_starter, write_mode, columns_db is not None, timer is not None, None, True, False, check_profiles, json_format))
+        sys.stderr.write(report.pop('messages'))
+        if 'column_rows' in report: WriteSubmissionColumns(columns_db, {report['output_filename']:report.pop('column_rows')})
+        if 'timing' in report: timer.Merge(report.pop('timing'))
+        if report['status'] == 'ok': n_ok += 1
+        else: n_failed += 1
+        outfile.write(json.dumps(report) + '\n')
+        outfile.flush()
+    return (n_ok, n_failed)
+# end ConvertStream
+
+
+def CreateConversionServer(address):
+    """ 
+    Input: address: (string) where to listen: a Unix domain socket path (anything with a '/' in it, or 'unix:<path>'),
+        or a localhost TCP port as '<port>' or '<host>:<port>' (the host defaults to 127.0.0.1)
+    Output: a threading HTTP server (not started) whose requests are handled by ConversionRequestHandler
+    Description: Build the --serve server.  An existing Unix domain socket file at the path is replaced.
+        http.server is only imported here (it is slow to import), so the request handler class is put together here 
+        from ConversionRequestHandler and http.server.BaseHTTPRequestHandler.
+
+    """
+
+    import http.server, socketserver
+    handler = type('ConversionRequestHandler', (ConversionRequestHandler, http.server.BaseHTTPRequestHandler), {})
+    if address.startswith('unix:') or '/' in address:
+        path = address[len('unix:'):] if address.startswith('unix:') else address
+        if os.path.exists(path): os.remove(path) # a socket left behind by an earlier server
+        server = type('ThreadingUnixHTTPServer', (socketserver.ThreadingMixIn, socketserver.UnixStreamServer), {'daemon_threads':True})(path, handler)
+        server.unix_socket_path = path
+    else:
+        (host, _, port) = address.rpartition(':')
+        server = http.server.ThreadingHTTPServer((host or '127.0.0.1', int(port)), handler)
+        server.unix_socket_path = None
+    return server
+# end CreateConversionServer
+
+
+@functools.lru_cache(maxsize=DATETIME_CACHE_SIZE)
+def DateTimeStampFields(dts):
+    """ 
+    Input: dts: (string) date time stamp in 'YYYY-MM-DDTHH:MMZ' or 'YYYY-MM-DDTHH:MM:SSZ' format
+    Output: (tuple) (year, month, day, hour, minute, second) integers.  second is 0 if the stamp has no seconds.
+    Description: Split a date time stamp into its fields.  The results are cached (DATETIME_CACHE_SIZE), since the 
+        same issue times and prediction windows come up over and over in a batch.  A stamp that doesn't convert raises 
+        (and isn't cached).
+
+    """
+
+    s = 0
+    if len(dts) == 20: s = int(dts[17:19])
+    return (int(dts[0:4]), int(dts[5:7]), int(dts[8:10]), int(dts[11:13]), int(dts[14:16]), s)
+# end DateTimeStampFields
+
+
+@functools.lru_cache(maxsize=DATETIME_CACHE_SIZE)
+def DateTimeStampProblem(dts):
+    """ 
+    Input: dts: (string) date time stamp
+    Output: None if the stamp has the right format, 'length' if it is the wrong length, otherwise the index of the 
+        first character that is not allowed (see DATETIME_STAMP_CHARS)
+    Description: The format check of ConvertToJSON.ValidateDateTimeStamp, cached (DATETIME_CACHE_SIZE) like DateTimeStampFields.
+
+    """
+
+    if len(dts) not in DATETIME_STAMP_CHARS: return 'length'
+    for (i, (c, allowed)) in enumerate(zip(dts, DATETIME_STAMP_CHARS[len(dts)])):
+        if c not in allowed: return i
+    return None
+# end DateTimeStampProblem
+
+
 def DontAllowNoneValues(v, field_name, d):
     """ 
     Input:
@@ -126,7 +764,6 @@ def DontAllowNoneValues(v, field_name, d):
 
     """
     
-    noneList = [None, 'None', 'none', ['none'], ['None'], [None]] # NOTE: 0 is not included because it is valid/needed in many fields
     if isinstance(v, list):
         #print('{} is a list? {}'.format(field_name, v))
         if v == []:
@@ -143,6 +780,160 @@ def DontAllowNoneValues(v, field_name, d):
 # end DontAllowNoneValues
 
 
+def DefaultOutputFilenameFilter(record):
+    """ 
+    Input: record: (logging.LogRecord) the log record
+    Output: True (the record is always logged)
+    Description: Log filter for the shared log file: records that were not tagged with an output filename 
+        (e.g., command line argument errors) get '-' so the log format still works.
+
+    """
+
+    if not hasattr(record, 'output_filename'): record.output_filename = '-'
+    return True
+# end DefaultOutputFilenameFilter
+
+
+def FileContentUnchanged(filename, content):
+    """ 
+    Input:
+        filename: (string) the file to compare against
+        content:  (bytes) the content that is about to be written
+    Output: (boolean) True if the file exists and already holds exactly that content
+    Description: Compare the sha256 hash of the file with the hash of the content.  The file is only read
+        when the sizes match, so most changed files are caught by a single os.stat.
+
+    """
+
+    try:
+        if os.stat(filename).st_size != len(content): return False
+        with open(filename, 'rb') as infile:
+            import hashlib
+            return hashlib.sha256(infile.read()).digest() == hashlib.sha256(content).digest()
+    except OSError: # the file does not exist (or can not be read), so it has to be written
+        return False
+# end FileContentUnchanged
+
+
+def FailValidation(m, on_error='exit', field_name=None, output_filename=None):
+    """ 
+    Input:
+        m:               (string) the error message (it has already been printed)
+        on_error:        (string) 'exit' - exit the program (the default, how sep_json_writer always worked)
+                                  'raise' or 'collect' - raise SEPValidationError (ConvertToJSON catches it in 'collect' mode)
+        field_name:      (string|None) the field that failed validation, if known
+        output_filename: (string|None) the JSON file the submission was going to be written to, if known
+    Output: None (it does not return)
+    Description: Stop validating the current submission.
+
+    """
+
+    if on_error == 'exit': sys.exit()
+    raise SEPValidationError(m, field_name, output_filename)
+# end FailValidation
+
+
+def GetSharedLogger(log_dir, log_starter):
+    """ 
+    Input:
+        log_dir:     (string) the directory the log should live in.
+        log_starter: (string) the beginning of the log filename.
+    Output: a Python logging object
+    Description: Return the logger shared by every conversion in this process that logs to log_dir/log_starter.
+        The first call opens the log file and starts a QueueListener thread that writes to it; the logger 
+        itself only has a QueueHandler, so logging a message never waits on the file.  Later calls reuse 
+        the same logger, so a batch of conversions opens one log file instead of one per conversion.
+        Records can be tagged with the output filename (see ConvertToJSON.InitLogger).
+        Worker processes get their own log file (the process id is added to the name).  Threads share it; 
+        the first one to ask makes it (sharedLoggersLock).
+
+    """
+
+    key = (os.getpid(), os.path.abspath(log_dir), log_starter)
+    if key in sharedLoggers: return sharedLoggers[key][0]
+    import logging.handlers, multiprocessing, multiprocessing.util
+
+    with sharedLoggersLock:
+        if key in sharedLoggers: return sharedLoggers[key][0] # another thread just made it
+        first_msg = ''
+        if not os.path.exists(log_dir):
+            try: os.makedirs(log_dir, exist_ok=True)
+            except OSError as e:
+                first_msg = 'WARNING: can\'t make log directory. Using current directory. Error message is (\'{}\').'.format(e)
+                log_dir = './'
+        n = datetime.datetime.utcnow()
+        now_ts = '{}{:02d}{:02d}{:02d}{:02d}{:02d}'.format(n.year, n.month, n.day, n.hour, n.minute, n.second)
+        if multiprocessing.parent_process() is None: log_file = os.path.join(log_dir, '{}.{}.log'.format(log_starter, now_ts))
+        else: log_file = os.path.join(log_dir, '{}.{}.{}.log'.format(log_starter, now_ts, os.getpid())) # worker process
+
+        fh = logging.FileHandler(log_file)
+        fh.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(output_filename)s] %(message)s'))
+        fh.addFilter(DefaultOutputFilenameFilter)
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, fh, respect_handler_level=True)
+        listener.start()
+
+        logger = logging.getLogger('{}.{}.{}'.format(__name__, log_starter, len(sharedLoggers)))
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        logger.setLevel(logging.INFO) # replace INFO with DEBUG, WARNING, ERROR, or CRITICAL, as desired
+        logger.propagate = False
+        if not sharedLoggers: # first shared logger: make sure the queues get drained at exit (worker processes don't run atexit)
+            atexit.register(StopSharedLoggers)
+            multiprocessing.util.Finalize(None, StopSharedLoggers, exitpriority=10)
+        sharedLoggers[key] = (logger, listener)
+        if first_msg != '': logger.warning(first_msg)
+    return logger
+# end GetSharedLogger
+
+
+def GroupSubmissions(dataDicts, output_filenames=None):
+    """ 
+    Input:
+        dataDicts:        (iterable) submission dictionaries, each in the 'sep_forecast_submission_dataDict' shape
+        output_filenames: (iterable|None) output filename for each submission.  None (or a None entry) means the default filename.
+    Output: (tuple) (dataDictL, output_filenameL, membersL): per group, the merged submission, its output filename and the 
+        indices (into dataDicts) of the submissions it was made from.  The groups are in order of their first submission.
+    Description: Fan in: submissions that only differ in their forecasts (same model, issue time, mode, triggers, inputs, ...), 
+        like the one-per-energy-channel files a model writes for each issue time, are merged into one submission holding all 
+        their forecasts (in order).  The shared fields are then validated once and one JSON file is written for the group.
+        A group's output filename is the one its submissions share.  If they don't all have the same one, it is the default 
+        filename (from the model, issue time and first prediction window; see ConvertToJSON) in the directory their output 
+        filenames have in common (the current directory if they have none, or if some of them have no output filename).
+        A submission in a group of its own is passed through as it is.
+
+    """
+
+    if output_filenames is None: output_filenames = itertools.repeat(None)
+    groupD = {} # the submission without its forecasts (JSON) -> group number
+    (dataDictL, output_filenameL, membersL) = ([], [], [])
+    for (i, (dataDict, output_filename)) in enumerate(zip(dataDicts, output_filenames)):
+        key = json.dumps(dict([(k, v) for (k, v) in dataDict.items() if k != 'forecasts']), sort_keys=True, default=str)
+        g = groupD.get(key) if isinstance(dataDict.get('forecasts'), list) else None
+        if g is None:
+            if isinstance(dataDict.get('forecasts'), list): groupD.setdefault(key, len(dataDictL))
+            dataDictL.append(dataDict)
+            output_filenameL.append([output_filename])
+            membersL.append([i])
+            continue
+        if len(membersL[g]) == 1: dataDictL[g] = dict(dataDictL[g], forecasts=list(dataDictL[g]['forecasts'])) # don't change the caller's dictionary
+        dataDictL[g]['forecasts'].extend(dataDict['forecasts'])
+        output_filenameL[g].append(output_filename)
+        membersL[g].append(i)
+    for (g, filenameL) in enumerate(output_filenameL):
+        if len(set(filenameL)) == 1:
+            output_filenameL[g] = filenameL[0]
+        elif None in filenameL:
+            output_filenameL[g] = None
+        else:
+            try:
+                directory = os.path.commonpath([os.path.dirname(f) for f in filenameL])
+            except ValueError: # absolute and relative paths, or different drives
+                directory = ''
+            output_filenameL[g] = os.path.join(directory, '') if directory != '' else None # ConvertToJSON puts the default filename in it
+    return (dataDictL, output_filenameL, membersL)
+# end GroupSubmissions
+
+
 def InitLogger(log_dir, log_file_starter, file_handler_level='warning'):
     """ 
     Input:
@@ -267,6 +1058,7 @@ def InitParser(desc):
 
     """
 
+    import argparse
     parser = argparse.ArgumentParser(description=desc, formatter_class=argparse.RawTextHelpFormatter)
     # Make output JSON filename an arg, otherwise give it a good default
     parser.add_argument("-o", "--output", dest="output_filename", help="JSON output filename.  Default is the <model_short_name>.<prediction_window_start_time>.<issue_time>.json")
@@ -279,6 +1071,21 @@ def InitParser(desc):
     parser.add_argument("-b", "--log-basename", dest="log_starter", default='isep_model_run', help="Beginning of the log filename (date and time will be added automatically).  Default is \'isep_model_run\'.")
     parser.add_argument('--import-data-dictionary', action='store_true', default=False, help='import the data dictionary (in the \'sep_forecast_submission_dataDict\' variable from a file named \'named input_sep.py\', OR use the --data-dictionary option to specify the full path to the file that holds the \'sep_forecast_submission_dataDict\' variable.')
     parser.add_argument('--data-dictionary', default=None, help='full path to the file holding the \'sep_forecast_submission_dataDict\'data dictionary. NOTE: this is ignored if --import-data-dictionary is not used.')
+    parser.add_argument('--write-mode', choices=['overwrite', 'if_changed'], default='overwrite', help='\'overwrite\' always writes the JSON file, \'if_changed\' leaves it alone if it already holds the same JSON.  Default is \'overwrite\'.')
+    parser.add_argument('--json-format', choices=list(JSON_FORMATS), default='default', help='\'default\' writes the JSON the way json.dumps does, \'compact\' without whitespace, \'compact.gz\' without whitespace and\ngzipped (.gz is added to the output filename).  Default is \'default\'.')
+    # batch mode (the model/forecast args below are ignored)
+    parser.add_argument('--batch', dest='batch_manifest', default=None, help='Convert many submissions: full path to a JSON Lines manifest, one \'sep_forecast_submission_dataDict\' per line\n(or an object holding \'sep_forecast_submission_dataDict\' and \'output_filename\').')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes for --batch.  Default is the number of CPUs.')
+    parser.add_argument('--columns-db', default=None, help='Full path to a columnar SQLite file (e.g., one per month) to also put the submission(s) in.  Default is none.')
+    parser.add_argument('--batch-report', default=None, help='Full path to a JSON Lines file for the per-submission --batch report.  Default is no report file.')
+    parser.add_argument('--dedupe', action='store_true', default=False, help='With --batch: skip submissions that were already converted to the same output file, in the manifest or by an\nearlier run (see --hash-index).')
+    parser.add_argument('--hash-index', default=None, help='Full path to the SQLite file --dedupe keeps the hashes of the converted submissions in.  Default is\n{} in the log directory.'.format(SUBMISSION_HASH_INDEX_FILENAME))
+    parser.add_argument('--group', action='store_true', default=False, help='With --batch: merge the submissions that only differ in their forecasts (e.g., one per energy channel) into\none submission (and JSON file) per model, issue time, triggers and inputs.')
+    parser.add_argument('--check-profiles', action='store_true', default=False, help='Also check that each forecast\'s sep_profile file is next to the JSON file, is not empty, and has readable\nfirst and last time stamps.')
+    parser.add_argument('--stream', default=None, help='Convert submissions as they arrive: full path to a JSON Lines file, or - for stdin, in the --batch manifest format.\nOne result line (JSON) per submission is written to stdout; everything else goes to stderr.')
+    parser.add_argument('--serve', default=None, metavar='ADDRESS', help='Run as a conversion service: POST submissions (--batch manifest line format) to /convert and get the JSON\nor the errors back.  ADDRESS is a Unix domain socket path, or a localhost TCP [HOST:]PORT.  Uses --workers processes.')
+    parser.add_argument('--timing', action='store_true', default=False, help='Time each conversion stage and field validator and print a summary table at the end (for --batch, added up over all submissions).')
+    parser.add_argument('--timing-json', default=None, help='Full path to a JSON file to write the --timing numbers to (implies --timing).  Default is none.')
 
     parser.add_argument('--contact-name', nargs='*', action='append', help='DEPRECATED.  Do not use.')
     parser.add_argument('--contact-email', action='append', help='DEPRECATED.  Do not use.')
@@ -473,9 +1280,14 @@ def OrganizeIntensityData(intensity_field_name, got_argL, d, i):
 # end OrganizeIntensityData
 
 
-def ParseArguments(parser, useargs=None):
+def ParseArguments(parser, useargs=None, on_error='exit', print_function=None, logger=None):
     """ 
-    Input: parser (argparse parser object)
+    Input: 
+        parser   (argparse parser object)
+        useargs  (list|None) the arguments to parse.  None means the command line arguments.
+        on_error (string) 'exit' (the default) or 'raise' (argument errors raise SEPValidationError), see FailValidation
+        print_function (function|None) what argument errors are printed with (called like print).  None means print.
+        logger   (logger|None) what argument errors are logged with.  None means the shared logger (if logging), see ThrowArgError.
     Output: a tuple holding: (args.output_filename, args.output_dir, args.log_msgs, args.log_dir, args.log_starter, dataDict)
     Description: Build the data dictionary based on the arguments the user included on the command line. 
     Warnings: This does NOT run if importing the input_sep dictionary!
@@ -521,8 +1333,9 @@ def ParseArguments(parser, useargs=None):
                 """)
                 sys.exit()
     d = vars(args)
-    argsL = ['model_short_name', 'spase_id', 'issue_time', 'mode', 'cme_start_time', 'cme_liftoff_time', 'cme_lat', 'cme_lon', 'cme_pa', 'cme_half_width', 'cme_speed', 'cme_acceleration', 'cme_height', 'cme_time_at_height_time', 'cme_time_at_height_height', 'cme_coordinates', 'cme_catalog', 'cme_catalog_id', 'cme_urls', 'flare_last_data_time', 'flare_start_time', 'flare_peak_time', 'flare_end_time', 'flare_location', 'flare_intensity', 'flare_integrated_intensity', 'flare_noaa_region', 'flare_urls', 'cme_sim_model', 'cme_sim_completion_time', 'cme_sim_urls', 'pi_observatory', 'pi_instrument', 'pi_last_data_time', 'pi_ongoing_events_start_time', 'pi_ongoing_events_threshold', 'pi_ongoing_events_energy_min', 'pi_ongoing_events_energy_max', 'human_evaluation_last_data_time', 'magcon_method', 'magcon_lat', 'magcon_lon', 'magcon_angle_great_circle', 'magcon_angle_lat', 'magcon_angle_lon', 'magcon_solar_wind_observatory', 'magcon_solar_wind_speed', 'magnetogram_observatory', 'magnetogram_instrument', 'magnetogram_product', 'magnetogram_product_last_data_time', 'energy_min', 'energy_max', 'energy_units', 'species', 'location', 'prediction_window', 'peak_intensity', 'peak_intensity', 'peak_intensity_units', 'peak_intensity_uncertainty', 'peak_intensity_uncertainty_low', 'peak_intensity_uncertainty_high', 'peak_intensity_time', 'peak_intensity_esp', 'peak_intensity_esp_units', 'peak_intensity_esp_uncertainty', 'peak_intensity_esp_uncertainty_low', 'peak_intensity_esp_uncertainty_high', 'peak_intensity_esp_time', 'peak_intensity_max', 'peak_intensity_max_units', 'peak_intensity_max_uncertainty', 'peak_intensity_max_uncertainty_low', 'peak_intensity_max_uncertainty_high', 'peak_intensity_max_time', 'fluences', 'fluence_units', 'fluence_uncertainty_low', 'fluence_uncertainty_high', 'event_length_start_times', 'event_length_end_times', 'event_length_thresholds', 'event_length_threshold_units', 'thresh_crossing_times', 'thresh_uncertainties', 'crossing_thresholds', 'crossing_threshold_units', 'probabilities', 'prob_uncertainties', 'prob_thresholds', 'prob_threshold_units', 'all_clear', 'all_clear_threshold', 'all_clear_threshold_units', 'all_clear_probability_threshold', 'sep_profile', 'native_id']
-    noneList = [None, 'None', 'none', ['none'], ['None'], [None]] # NOTE: 0 is not included because it is valid/needed in many fields
+    d['on_error'] = on_error
+    d['print_function'] = print_function
+    d['logger'] = logger
     dataDict = collections.OrderedDict()
     checkedL = []
     CheckForRequiredArgs(d) # if this returns, we have the required arg values
@@ -954,8 +1767,9 @@ def ParseArguments(parser, useargs=None):
                                                 t2D[translate_arg2keyD[f]] = d[f][i][j]
                                                 updated_dict = True
                                         except:
-                                            print('[L568] some error with {}.  Exiting.'.format(f))
-                                            sys.exit()
+                                            m = '[L568] some error with {}.  Exiting.'.format(f)
+                                            print(m)
+                                            FailValidation(m, on_error, f)
                                 if updated_dict: t2L.append(t2D)
                             if t2L != []: tD['fluences'] = t2L
 
@@ -996,8 +1810,9 @@ def ParseArguments(parser, useargs=None):
                                                 t2D[translate_arg2keyD[f]] = d[f][i][j]
                                                 updated_dict = True
                                         except:
-                                            print('[L568] some error with {}.  Exiting.'.format(f))
-                                            sys.exit()
+                                            m = '[L568] some error with {}.  Exiting.'.format(f)
+                                            print(m)
+                                            FailValidation(m, on_error, f)
                                 if updated_dict: t2L.append(t2D)
                             if t2L != []: tD['event_lengths'] = t2L
 
@@ -1029,8 +1844,9 @@ def ParseArguments(parser, useargs=None):
                                                 t2D[translate_arg2keyD[f]] = d[f][i][j]
                                                 updated_dict = True
                                         except:
-                                            print('[L608] some error with {}.  Exiting.'.format(f))
-                                            sys.exit()
+                                            m = '[L608] some error with {}.  Exiting.'.format(f)
+                                            print(m)
+                                            FailValidation(m, on_error, f)
                                 if updated_dict: t2L.append(t2D)
                             if t2L != []: tD['threshold_crossings'] = t2L
                         elif aa == 'probabilities' and d['probabilities'][i] not in noneList: # going to get a list of lists for these because they are nargs=* and append 
@@ -1096,7 +1912,7 @@ def ParseArguments(parser, useargs=None):
                                         k = j[co:]
                                         if d[j][i] not in noneList:
                                             t2D[k] = d[j][i]
-                            CheckAllClearThresholdVsEnergyChannel(t2D, tD)
+                            CheckAllClearThresholdVsEnergyChannel(t2D, tD, on_error, print_function, logger)
                             tD['all_clear'] = t2D
                         elif aa in ['sep_profile', 'native_id']:
                             if aa in d.keys() and d[aa][i] not in noneList: # optional
@@ -1109,57 +1925,654 @@ def ParseArguments(parser, useargs=None):
     #print('====Finished parsing arguments.===========================================')
     return (args.output_filename, args.output_dir, args.log_msgs, args.log_dir, args.log_starter, dataDict)
 # end ParseArguments
+
+
+def ParseManifestLine(line):
+    """ 
+    Input: line: (string) one line of a --batch manifest or --stream input
+    Output: (tuple) (dataDict, output_filename).  output_filename is None if the line doesn't give one.
+    Description: A line is either a submission dictionary (in the 'sep_forecast_submission_dataDict' shape) or an object 
+        holding that dictionary under 'sep_forecast_submission_dataDict' and, optionally, an 'output_filename'.
+        Raises ValueError if the line is not valid JSON or the submission is not a JSON object.
+
+    """
+
+    item = json.loads(line)
+    if isinstance(item, dict) and 'sep_forecast_submission_dataDict' in item:
+        (dataDict, output_filename) = (item['sep_forecast_submission_dataDict'], item.get('output_filename'))
+    else:
+        (dataDict, output_filename) = (item, None)
+    if not isinstance(dataDict, dict):
+        raise ValueError('the submission is a JSON {}, not an object'.format(type(dataDict).__name__))
+    if output_filename is not None and not isinstance(output_filename, str):
+        raise ValueError('the output_filename is not a string')
+    return (dataDict, output_filename)
+# end ParseManifestLine
+
+
+def ParseProfileTimeStamp(line):
+    """ 
+    Input: line: (string) a data line of an sep_profile file
+    Output: (datetime) the time stamp the line starts with
+    Description: The profile lines start with an ISO 8601 time stamp, either as one field ('2020-01-01T00:00Z', with or without 
+        seconds and 'Z') or as two ('2020-01-01 00:00:00').  Raises ValueError if the line doesn't start with one.
+
+    """
+
+    fieldL = line.split()
+    for candidate in [' '.join(fieldL[:2]), ' '.join(fieldL[:1])]:
+        try:
+            return datetime.datetime.fromisoformat(candidate.rstrip('Z'))
+        except ValueError:
+            pass
+    raise ValueError('no time stamp at the start of \'{}\''.format(line.strip()[:40]))
+# end ParseProfileTimeStamp
+
+
+def ReadJSONFile(filename):
+    """ 
+    Input: filename: (string) a JSON file written by ConvertToJSON
+    Output: (bytes) the JSON (ungzipped if the filename ends with .gz, see JSON_FORMATS)
+
+    """
+
+    with open(filename, 'rb') as infile: content = infile.read()
+    if filename.endswith('.gz'):
+        import gzip
+        content = gzip.decompress(content)
+    return content
+# end ReadJSONFile
+
+
+def SEPProfileTimeRange(filename, block_size=SEP_PROFILE_BLOCK_SIZE):
+    """ 
+    Input:
+        filename:   (string) an sep_profile file
+        block_size: (integer) how many bytes to read from each end of the file at a time
+    Output: (tuple) the (first, last) time stamps (datetimes) of the profile
+    Description: Read just the start and the end of the file (growing the blocks only if a line is longer than a block) 
+        to find the first and last data lines, skipping blank lines and '#' comments.  Raises ValueError if there are no 
+        data lines or their time stamps don't parse.
+
+    """
+
+    def DataLines(block):
+        return [l for l in block.decode('utf-8', 'replace').splitlines() if l.strip() != '' and not l.lstrip().startswith('#')]
+
+    with open(filename, 'rb') as infile:
+        size = os.fstat(infile.fileno()).st_size
+        (n, firstL) = (block_size, [])
+        while True: # the first complete data line
+            infile.seek(0)
+            block = infile.read(n)
+            firstL = DataLines(block if n >= size else block[:block.rfind(b'\n') + 1])
+            if firstL or n >= size: break
+            n *= 2
+        (n, lastL) = (block_size, [])
+        while True: # the last complete data line
+            infile.seek(max(0, size - n))
+            block = infile.read(n)
+            lastL = DataLines(block if n >= size else block[block.find(b'\n') + 1:] if b'\n' in block else b'')
+            if lastL or n >= size: break
+            n *= 2
+    if not firstL or not lastL: raise ValueError('it has no data lines')
+    return (ParseProfileTimeStamp(firstL[0]), ParseProfileTimeStamp(lastL[-1]))
+# end SEPProfileTimeRange
+
+
+def ServeConversions(address, workers=None, output_dir='./', log_msgs=True, log_dir='./', log_starter='isep_model_run', write_mode='overwrite', columns_db=None, timer=None, check_profiles=False, json_format='default'):
+    """ 
+    Input:
+        address:     (string) Unix domain socket path or localhost TCP port to listen on (see CreateConversionServer)
+        workers:     (integer|None) number of worker processes doing the conversions.  None means os.cpu_count().
+        output_dir:  (string) directory where the output files should be put
+        log_msgs:    (boolean) whether or not to log the messages.
+        log_dir:     (string) the directory the log should live in.
+        log_starter: (string) the beginning of the log filename.
+        write_mode:  (string) 'overwrite' or 'if_changed' (see ConvertToJSON)
+        columns_db:  (string|None) if given, also put each converted submission in this columnar SQLite file
+        timer:       (StageTimer|None) if given, time the conversion stages and validators (see StageTimer)
+        check_profiles: (boolean) also check the sep_profile files the forecasts reference (see SEPProfileIndex)
+        json_format: (string) a JSON_FORMATS name (see ConvertToJSON).  The reply's 'json' is never gzipped.
+    Output: None (runs until interrupted: Ctrl-C or SIGTERM)
+    Description: Run sep_json_writer as a conversion service (--serve), so model runners can send submissions to one 
+        running process instead of starting a new one for each.  The requests are handled concurrently (one thread 
+        each) and converted by a pool of worker processes; see ConversionRequestHandler for the protocol.
+
+    """
+
+    import concurrent.futures, signal
+    server = CreateConversionServer(address)
+    server.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+    server.settings = (output_dir, log_msgs, log_dir, log_starter, write_mode, json_format)
+    (server.columns_db, server.timer, server.lock, server.check_profiles) = (columns_db, timer, threading.Lock(), check_profiles)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, signal.default_int_handler) # stop cleanly (like Ctrl-C) when a service manager stops us
+    print('sep_json_writer is serving on {} (POST submissions to /convert). Press Ctrl-C to stop.'.format(server.unix_socket_path or 'http://{}:{}'.format(*server.server_address[:2])), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.executor.shutdown()
+        if server.unix_socket_path is not None and os.path.exists(server.unix_socket_path): os.remove(server.unix_socket_path)
+    return
+# end ServeConversions
     
     
+def StopSharedLoggers():
+    """ 
+    Input: None
+    Output: None
+    Description: Stop this process's shared log listeners (see GetSharedLogger), which writes out whatever is 
+        still in the queues and closes the log files.  Safe to call more than once.
+
+    """
+
+    for key in [k for k in sharedLoggers if k[0] == os.getpid()]:
+        (logger, listener) = sharedLoggers.pop(key)
+        listener.stop()
+        for h in listener.handlers: h.close()
+    return
+# end StopSharedLoggers
+
+
+def SubmissionColumnRows(orderedDict, output_filename):
+    """ 
+    Input:
+        orderedDict:     (dictionary) a validated submission (ConvertToJSON.orderedDict)
+        output_filename: (string) the JSON file the submission was written to
+    Output: a list of tuples, one per forecast and probability, in SUBMISSION_COLUMNS order
+    Description: Flatten the fields the verification jobs need into typed columns (see WriteSubmissionColumns).
+
+    """
+
+    def Number(v):
+        return None if v is None else float(v)
+
+    def Boolean(v):
+        if v is None: return None
+        if isinstance(v, str): return int(v.lower() == 'true')
+        return int(bool(v))
+
+    model = orderedDict.get('model', {})
+    rowL = []
+    for (fi, f) in enumerate(orderedDict.get('forecasts', [])):
+        ec = f.get('energy_channel', {})
+        pw = f.get('prediction_window', {})
+        ac = f.get('all_clear', {})
+        common = (model.get('short_name'), orderedDict.get('issue_time'), orderedDict.get('mode'),
+            Number(ec.get('min')), Number(ec.get('max')), ec.get('units'), f.get('species'), f.get('location'),
+            pw.get('start_time'), pw.get('end_time'))
+        all_clear = (Boolean(ac.get('all_clear_boolean')), Number(ac.get('threshold')), ac.get('threshold_units'), Number(ac.get('probability_threshold')))
+        probabilityL = f.get('probabilities', []) or [{}]
+        for (pi, prob) in enumerate(probabilityL):
+            probability = (Number(prob.get('probability_value')), Number(prob.get('threshold')), prob.get('threshold_units'))
+            rowL.append((output_filename, fi, pi) + common + probability + all_clear)
+    return rowL
+# end SubmissionColumnRows
+
+
+def SubmissionHash(dataDict, output_filename=None, json_format='default'):
+    """ 
+    Input:
+        dataDict:        (dictionary) a submission, in the 'sep_forecast_submission_dataDict' shape
+        output_filename: (string|None) the output filename it was given (None for the default filename)
+        json_format:     (string) the JSON_FORMATS name it is written in
+    Output: (string) hex SHA-256 of the canonical form of the submission and its output filename
+    Description: Key for deduplicating submissions (see SubmissionHashIndex).  The canonical form is the JSON with sorted 
+        keys and no whitespace, so the key order of the dictionaries doesn't matter.  SUBMISSION_HASH_VERSION is part of it,
+        and so is the json_format unless it is 'default' (so the hashes of 'default' submissions didn't change).
+
+    """
+
+    import hashlib
+    keyL = [SUBMISSION_HASH_VERSION, output_filename, dataDict] + ([json_format] if json_format != 'default' else [])
+    canonical = json.dumps(keyL, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+# end SubmissionHash
+
+
 def ThrowArgError(msg, d):
     """ 
     Input:
         msg: (string) the message to be presented as an error message.
-        d:   (dictionary) data for initializing the log file.
+        d:   (dictionary) data for initializing the log file (and 'on_error', 'print_function' and 'logger', if ParseArguments was given them).
     Output: None
     Description: print the message.  if indicated, initialize logger object then log the message also.
+        Then exit (or raise SEPValidationError, see FailValidation).
 
     """
 
-    print(msg)
+    (d.get('print_function') or print)(msg)
+    logger = d.get('logger')
     # if logging is desired, log the message
-    if d['log_msgs']: 
-        # initialize logger object (from parameters)
-        logger = InitLogger(d['log_dir'], d['log_starter'], 'debug')
+    if logger is not None or d['log_msgs']: 
+        # get the shared logger object (from parameters), unless one was given
+        if logger is None: logger = GetSharedLogger(d['log_dir'], d['log_starter'])
         # log the message.  It if is being called from here, it's an error message.
         logger.error(msg)
-    sys.exit()
+    FailValidation(msg, d.get('on_error', 'exit'))
 # end ThrowArgError
 
 
+def WriteFileAtomically(filename, content, fsync=False):
+    """ 
+    Input:
+        filename: (string) the file to write
+        content:  (bytes) the content to write
+        fsync:    (boolean) also make sure the content is on disk (os.fsync) before the file is moved into place
+    Output: None
+    Description: Write the content to a temporary file next to filename, then move it into place with os.replace,
+        so a reader never sees a partially written file.
+
+    """
+
+    tmp_filename = '{}.{}.{}.tmp'.format(filename, os.getpid(), threading.get_ident()) # unique per thread, too
+    try:
+        with open(tmp_filename, 'wb') as outfile:
+            outfile.write(content)
+            if fsync:
+                outfile.flush()
+                os.fsync(outfile.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename): os.remove(tmp_filename)
+        raise
+    return
+# end WriteFileAtomically
+
+
+def WriteSubmissionColumns(db_filename, rowsD):
+    """ 
+    Input:
+        db_filename: (string) the SQLite file (e.g., one per month) holding the 'submissions' table
+        rowsD:       (dictionary) output filename -> list of rows from SubmissionColumnRows
+    Output: None
+    Description: Put the submissions' rows in the columnar 'submissions' table, in a single transaction.
+        A submission's old rows are replaced, so re-running a month does not duplicate anything.
+
+    """
+
+    if not rowsD: return
+    columnL = [c for (c, t) in SUBMISSION_COLUMNS]
+    import sqlite3
+    cx = sqlite3.connect(db_filename, timeout=60)
+    try:
+        with cx:
+            cx.execute('CREATE TABLE IF NOT EXISTS submissions ({}, PRIMARY KEY (output_filename, forecast_index, probability_index))'.format(', '.join(['{} {}'.format(c, t) for (c, t) in SUBMISSION_COLUMNS])))
+            cx.executemany('DELETE FROM submissions WHERE output_filename = ?', [(f,) for f in rowsD])
+            cx.executemany('INSERT OR REPLACE INTO submissions ({}) VALUES ({})'.format(', '.join(columnL), ', '.join(['?'] * len(columnL))), [row for rowL in rowsD.values() for row in rowL])
+    finally:
+        cx.close()
+    return
+# end WriteSubmissionColumns
+
+
 #### END of FUNCTIONS ## #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
 
 
+#### FIELD TABLES #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
+# The field tables ConvertToJSON validates against.  Each table is (parent field name, rows), and each row is:
+#   key name, stub value, req'd, allow_neg values, allow_neg_one values, must_be_in_past, allow_stub_value, min_value, max_value, check[, options]
+# See CompileFieldValidator for the meaning of check and the options.
+# The tables are compiled into validator functions once, when the module loads (see FIELD_VALIDATORS below).
+units_chars = ' -_+*^()/' # allowed characters for all 'units' fields (besides letters and digits)
+peak_intensity_rows = [
+    ('intensity', '0', True, False, False, None, False, None, None, 'float'),
+    ('units', 'pfu', True, None, None, None, True, None, None, 'alphanumeric', {'addtl_chars':units_chars}), 
+    ('uncertainty', 0, False, False, False, None, True, None, None, 'float'),
+    ('uncertainty_low', 0, False, False, False, None, True, None, None, 'float'),
+    ('uncertainty_high', 0, False, False, False, None, True, None, None, 'float'),
+    ('time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False, None, None, 'datetime'),
+]
+FIELD_TABLES = {
+    'issue_time': ('', [
+        ('issue_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, True, False, None, None, 'datetime'),
+    ]),
+    'model': ('model', [
+        ('short_name', 'Short name for your model', True, None, None, None, False, None, None, 'alphanumeric', {'addtl_chars':' -_+().'}), # should I allow other characters?
+        ('spase_id', 'spase://CCMC/SimulationModel/MODEL_NAME/VERSION', True, None, None, None, False, None, None, 'spase_id'),
+    ]),
+    'forecasts': ('forecasts', [
+        ('species', stubNoneList, True, None, None, None, False, None, None, 'species'),
+        ('location', stubNoneList, True, None, None, None, False, None, None, 'location'),
+        ('sep_profile', "filename_energychannel.txt", False, None, None, None, False, None, None, 'sep_profile'),
+        ('native_id', stubNoneList, False, None, None, None, False, None, None, 'native_id'),
+    ]),
+    'forecasts/all_clear': ('forecasts/all_clear', [
+        ('all_clear_boolean', False, True, None, None, None, True, None, None, 'boolean'),
+        ('threshold', 0, True, False, False, None, False, None, None, 'float'), # Can be 10 pfu, 1 pfu, or custom 
+        ('threshold_units', 'pfu', True, None, None, None, True, None, None, 'alphanumeric', {'addtl_chars':units_chars}), 
+        ('probability_threshold', 0, False, False, False, None, True, None, None, 'float'),
+    ]),
+    'forecasts/energy_channel': ('forecasts/energy_channel', [
+        ('min', 0, True, False, False, None, False, None, None, 'float'), # is allow_stub_value correct?
+        ('max', 0, True, False, True, None, False, None, None, 'float'), # is allow_stub_value correct?
+        ('units', 'pfu', True, None, None, None, True, None, None, 'alphanumeric', {'addtl_chars':units_chars}), 
+    ]),
+    'forecasts/event_lengths': ('forecasts/event_lengths', [
+        ('start_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False, None, None, 'datetime'), 
+        ('end_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False, None, None, 'datetime'), 
+        ('threshold', 0, True, False, False, None, False, None, None, 'float'),
+        ('threshold_units', 'pfu', True, None, None, None, True, None, None, 'alphanumeric', {'addtl_chars':units_chars}), 
+    ]),
+    'forecasts/fluences': ('forecasts/fluences', [
+        ('fluence', '0', True, False, False, None, True, None, None, 'float'),
+        ('units', 'pfu', True, None, None, None, True, None, None, 'alphanumeric', {'addtl_chars':units_chars}), 
+        ('uncertainty_low', 0, False, False, False, None, True, None, None, 'float'),
+        ('uncertainty_high', 0, False, False, False, None, True, None, None, 'float'),
+    ]),
+    'forecasts/peak_intensity': ('forecasts/peak_intensity', peak_intensity_rows),
+    'forecasts/peak_intensity_esp': ('forecasts/peak_intensity_esp', peak_intensity_rows),
+    'forecasts/peak_intensity_max': ('forecasts/peak_intensity_max', peak_intensity_rows),
+    'forecasts/prediction_window': ('forecasts/prediction_window', [
+        ('start_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False, None, None, 'datetime'), # TODO start of forecast prediction window (must be within one hour of forecast issue time for "forecast" mode)
+        ('end_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False, None, None, 'datetime'),
+    ]),
+    'forecasts/probabilities': ('forecasts/probabilities', [
+        ('probability_value', 0, True, False, False, None, False, None, None, 'probability'),
+        ('uncertainty', 0, False, False, False, None, True, None, None, 'float'),
+        ('threshold', 0, True, False, False, None, False, None, None, 'float'),
+        ('threshold_units', 'pfu', True, None, None, None, True, None, None, None), 
+    ]),
+    'forecasts/threshold_crossings': ('forecasts/threshold_crossings', [
+        ('crossing_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False, None, None, 'datetime'),
+        ('uncertainty', 0, False, False, False, None, True, None, None, 'float'),
+        ('threshold', 0, True, False, False, None, False, None, None, 'float'),
+        ('threshold_units', 'pfu', True, None, None, None, True, None, None, None), 
+    ]),
+    'inputs/magnetic_connectivity': ('inputs/magnetic_connectivity', [
+        # allowed method values: Parker Spiral, PFSS-Parker Spiral, WSA, WSA-ENLIL, ADAPT-WSA-ENLIL  (& maybe: Parker_Spiral_2.5Rs)
+        ('method', None, True, None, None, False, False, None, None, 'magcon_method', {'check_always':True, 'store':'always'}),
+        ('lat', 0, False, True, True, None, True, -90, 90, 'float'),
+        ('lon', 0, True, True, True, None, True, -180, 180, 'float'),
+    ]),
+    'inputs/magnetic_connectivity/connection_angle': ('inputs/magnetic_connectivity/connection_angle', [
+        ('great_circle', 0, False, False, False, None, True, 0, 360, 'float'),
+        ('lat', 0, False, True, True, None, True, -90, 90, 'float'),
+        ('lon', 0, True, True, True, None, True, -180, 180, 'float'),
+    ]),
+    'inputs/magnetic_connectivity/solar_wind': ('inputs/magnetic_connectivity/connection_angle', [
+        # do not bother to save the observatory value if it is None
+        ('observatory', None, False, None, None, None, True, None, None, 'alphanumeric', {'addtl_chars':'-_', 'store':'not_none'}),
+        ('speed', 0, True, False, False, None, True, 0, None, 'float'),
+    ]),
+    'inputs/magnetogram': ('inputs/magnetogram', [
+        ('observatory', None, True, None, None, False, False, None, None, 'alphanumeric', {'addtl_chars':'-_', 'check_always':True, 'store':'always'}),
+        ('instrument', None, True, None, None, False, False, None, None, 'alphanumeric', {'addtl_chars':'-_', 'check_always':True, 'store':'always'}),
+    ]),
+    'inputs/magnetogram/products': ('inputs/magnetogram/products', [
+        # do not bother to save the product value if it is None
+        ('product',        None,                False, None, None, False, False, None, None, 'alphanumeric', {'addtl_chars':'-_', 'check_always':True, 'store':'not_none'}),
+        ('last_data_time', 'YYYY-MM-DDTHH:MMZ', True,  None, None, False, False, None, None, 'datetime', {'store':'always'}), 
+    ]),
+    'triggers/cme': ('triggers/cme', [
+        ('start_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False, None, None, 'datetime'),
+        ('liftoff_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False, None, None, 'datetime'),
+        ('lat', 0, False, True, True, None, True, -90, 90, 'float', {'pair_key':'lon'}), # If 'lat' is a non-zero/non-stub value given, make sure 'lon' is there too.
+        ('lon', 0, False, True, True, None, True, -180, 180, 'float', {'pair_key':'lat'}), # If 'lon' is a non-zero/non-stub value given, make sure 'lat' is there too.
+        ('pa', 0, False, True, True, None, True, 0, 360, 'float'),
+        ('half_width', 0, False, True, True, None, True, 0, 180, 'float'),
+        ('speed', 0, False, True, True, None, True, 0, 5000, 'float'),
+        ('acceleration', 0, False, False, False, None, True, None, None, 'float'),
+        ('height', 0, False, True, True, None, False, 1, 250, 'float'),
+    ]),
+    # coordinates are required if lat or lon are given.  catalog_id is required if the catalog is DONKI.
+    'triggers/cme/coordinates/required': ('triggers/cme', [('coordinates', stubNoneList, True, None, None, None, False, None, None, 'coordinates', {'store':'always'})]),
+    'triggers/cme/coordinates/optional': ('triggers/cme', [('coordinates', stubNoneList, False, None, None, None, False, None, None, 'coordinates', {'store':'always'})]),
+    'triggers/cme/catalog': ('triggers/cme', [('catalog', stubNoneList, False, None, None, None, False, None, None, 'catalog', {'store':'always'})]),
+    'triggers/cme/catalog_id/required': ('triggers/cme', [('catalog_id', stubNoneList, True, None, None, None, True, None, None, 'catalog_id', {'store':'always'})]),
+    'triggers/cme/catalog_id/optional': ('triggers/cme', [('catalog_id', stubNoneList, False, None, None, None, True, None, None, 'catalog_id', {'store':'always'})]),
+    'triggers/cme/time_at_height': ('triggers/cme/time_at_height', [
+        ('time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False, None, None, 'datetime'),
+        ('height', 0, True, False, False, None, False, 1, 9000, 'float'),
+    ]),
+    'triggers/cme_simulation': ('triggers/cme_simulation', [
+        ('model', stubNoneList, True, None, None, None, False, None, None, 'alphanumeric', {'addtl_chars':' -_+'}),
+        ('simulation_completion_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, True, False, None, None, 'datetime'),
+        ('urls', [], False, None, None, None, True, None, None, 'urls'), 
+    ]),
+    'triggers/flare': ('triggers/flare', [
+        ('last_data_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False, None, None, 'datetime'), 
+        ('start_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False, None, None, 'datetime'), 
+        ('peak_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False, None, None, 'datetime'), 
+        ('end_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False, None, None, 'datetime'),
+        ('location', stubNoneList, False, None, None, None, False, None, None, 'stonyhurst'), # Stonyhurst coordinates (N00W00/S00E00 format)
+        ('intensity', 0, False, None, None, None, False, None, None, 'float'),
+        ('integrated_intensity', 0, False, None, None, None, False, None, None, 'float'),
+        ('noaa_region', stubNoneList, False, None, None, None, False, None, None, 'noaa_region'), # include the preceding 1
+        ('urls', [], False, None, None, None, True, None, None, 'urls'), 
+    ]),
+    'triggers/particle_intensity': ('triggers/particle_intensity', [
+        # observatory and instrument values (is that even possible?  alphanumeric + some special characters?)
+        ('observatory', stubNoneList, True, None, None, None, False, None, None, 'alphanumeric', {'addtl_chars':'-_'}), 
+        ('instrument', stubNoneList, True, None, None, None, False, None, None, 'alphanumeric', {'addtl_chars':'-_'}),
+        ('last_data_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False, None, None, 'datetime'),
+    ]),
+    'triggers/particle_intensity/ongoing_events': ('triggers/particle_intensity/ongoing_events', [
+        ("start_time", "YYYY-MM-DDTHH:MMZ", True, None, None, False, False, None, None, 'datetime'),
+        ("threshold", 0, True, False, False, None, True, None, None, 'float'), 
+        ("energy_min", 0, True, False, False, None, True, None, None, 'float'), 
+        ("energy_max", 0, True, False, True, None, True, None, None, 'float'), # -1 ok. o/w float
+    ]),
+}
+FIELD_VALIDATORS = collections.OrderedDict()
+for (table_name, (pfn, rowL)) in FIELD_TABLES.items():
+    FIELD_VALIDATORS[table_name] = [CompileFieldValidator(pfn, *row[:10], **(row[10] if len(row) > 10 else {})) for row in rowL]
+
+# the order of a forecast's fields: (key name, req'd, Prep method name or None for leaf values)
+FORECAST_FIELDS = [
+    ('energy_channel', True, 'PrepForecastEnergyChannel'),
+    ('species', True, None),
+    ('location', True, None),
+    ('prediction_window', True, 'PrepForecastPredictionWindow'),
+    ('peak_intensity', False, 'PrepForecastPeakIntensity'),
+    ('peak_intensity_esp', False, 'PrepForecastPeakIntensityEsp'),
+    ('peak_intensity_max', False, 'PrepForecastPeakIntensityMax'),
+    ('fluences', False, 'PrepForecastFluences'),
+    ('event_lengths', False, 'PrepForecastEventLengths'),
+    ('threshold_crossings', False, 'PrepForecastThresholdCrossings'),
+    ('probabilities', False, 'PrepForecastProbabilities'),
+    ('all_clear', False, 'PrepForecastAllClear'),
+    ('sep_profile', False, None),
+    ('native_id', False, None),
+]
+FORECAST_LEAF_VALIDATORS = dict(zip([row[0] for row in FIELD_TABLES['forecasts'][1]], FIELD_VALIDATORS['forecasts']))
+#### END of FIELD TABLES ## #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
+
+
 #### CLASSES # #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
+class ConversionRequestHandler:
+    """ 
+    Description: The --serve protocol (see ServeConversions).  The methods of the http.server.BaseHTTPRequestHandler 
+        subclass CreateConversionServer builds.
+        POST /convert  body: one submission, in the --batch manifest line format (see ParseManifestLine), optionally with 
+                       "write_file": false to only get the JSON back.  Reply: the --batch report (see ConvertBatchItem) plus 
+                       'json' (the JSON text) if it worked.  Status 200 if it worked, 422 if it failed validation, 400 if the 
+                       body isn't JSON (or the Content-Length isn't a size), 411 if there is no Content-Length.
+        GET /health    reply: {"status": "ok"}
+
+    """
+
+    max_body_size = 64*1024*1024 # bytes
+    request_count = itertools.count(1) # the report's 'line' is the request number
+
+    def address_string(self):
+        """ 
+        Input: self: (ConversionRequestHandler object)
+        Output: (string) the client's address for the log messages ('unix' for Unix domain socket clients)
+
+        """
+
+        if isinstance(self.client_address, tuple): return self.client_address[0]
+        return 'unix'
+    # end address_string
+
+
+    def do_GET(self):
+        """ 
+        Input: self: (ConversionRequestHandler object)
+        Output: None
+        Description: Answer /health.
+
+        """
+
+        if self.path == '/health': self.Reply(200, {'status':'ok'})
+        else: self.Reply(404, {'status':'failed', 'error':'Unknown path \'{}\'. Use POST /convert or GET /health.'.format(self.path)})
+        return
+    # end do_GET
+
+
+    def do_POST(self):
+        """ 
+        Input: self: (ConversionRequestHandler object)
+        Output: None
+        Description: Convert the submission in the request body in a worker process and reply with the report.
+
+        """
+
+        if self.path != '/convert':
+            self.Reply(404, {'status':'failed', 'error':'Unknown path \'{}\'. Use POST /convert or GET /health.'.format(self.path)})
+            return
+        if self.headers.get('Content-Length') is None:
+            self.Reply(411, {'status':'failed', 'error':'The request needs a Content-Length header.'})
+            return
+        try:
+            size = int(self.headers['Content-Length'])
+            if size < 0: raise ValueError('it is negative')
+        except ValueError as e:
+            self.Reply(400, {'status':'failed', 'error':'Invalid Content-Length \'{}\': {}'.format(self.headers['Content-Length'], e)})
+            return
+        if size > self.max_body_size:
+            self.Reply(413, {'status':'failed', 'error':'The submission is too big ({} bytes).'.format(size)})
+            return
+        server = self.server
+        (output_dir, log_msgs, log_dir, log_starter, write_mode, json_format) = server.settings
+        try:
+            line = self.rfile.read(size).decode('utf-8')
+            (dataDict, output_filename) = ParseManifestLine(line)
+            write_file = json.loads(line).get('write_file', True) is not False
+        except (ValueError, AttributeError) as e:
+            self.Reply(400, {'status':'failed', 'error':'Not a JSON submission: {}'.format(e)})
+            return
+        job = (next(self.request_count), dataDict, output_filename, output_dir, log_msgs, log_dir, log_starter, write_mode, server.columns_db is not None, server.timer is not None, None, write_file, True, server.check_profiles, json_format)
+        report = server.executor.submit(ConvertBatchItem, job).result()
+        with server.lock:
+            if 'column_rows' in report: WriteSubmissionColumns(server.columns_db, {report['output_filename']:report.pop('column_rows')})
+            if 'timing' in report: server.timer.Merge(report.pop('timing'))
+        self.Reply(200 if report['status'] == 'ok' else 422, report)
+        return
+    # end do_POST
+
+
+    def log_message(self, format, *args):
+        """ 
+        Input:
+            self:   (ConversionRequestHandler object)
+            format: (string) message format
+            args:   message values
+        Output: None
+        Description: Request log lines go to stderr (as in http.server), with the client's address.
+
+        """
+
+        sys.stderr.write('{} - - [{}] {}\n'.format(self.address_string(), self.log_date_time_string(), format % args))
+        return
+    # end log_message
+
+
+    def Reply(self, status, replyD):
+        """ 
+        Input:
+            self:    (ConversionRequestHandler object)
+            status:  (integer) HTTP status code
+            replyD:  (dictionary) the reply, sent as JSON
+        Output: None
+
+        """
+
+        body = json.dumps(replyD).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return
+    # end Reply
+# end ConversionRequestHandler
+
+
 class ConvertToJSON:
-    def __init__(self, dataD, output_filename, output_dir, log_msgs, log_dir, log_starter):
+    def __init__(self, dataD, output_filename, output_dir, log_msgs, log_dir, log_starter, write_file=True, write_mode='overwrite', on_error='exit', columns_db=None, timer=None, now=None, profile_index=None, json_format='default', print_function=None, logger=None):
         """ 
         Input:
             self:            (ConvertToJSON object)
             dataD:           (dictionary) the data to write to the JSON-formatted output file
-            output_filename: (string) output filename to be written
+            output_filename: (string) output filename to be written.  None, or a directory name ending in os.sep, means the
+                             default filename (from the model, issue time and first prediction window), in that directory.
             output_dir:      (string) directory where the output file should be put
             log_msgs:        (boolean) whether or not to log the messages.
             log_dir:         (string) the directory the log should live in.
             log_starter:     (string) the beginning of the log filename.
+            write_file:      (boolean) whether or not to write the JSON file out.  The JSON is always kept in self.json_bytes.
+            write_mode:      (string) 'overwrite' (always write the file) or 'if_changed' (leave the file alone if it already 
+                             holds the same JSON, and fsync the files it does write).  Either way the file is replaced
+                             atomically.  self.write_status records what happened: 'written', 'unchanged' or None
+                             (not written).
+            on_error:        (string) what to do when the data fails validation:
+                             'exit'    - exit the program (the default)
+                             'raise'   - raise SEPValidationError
+                             'collect' - stop converting, but keep the error in self.errors (self.json_bytes stays None)
+            columns_db:      (string|None) if given, also put the validated submission in this columnar SQLite file
+                             (see WriteSubmissionColumns)
+            timer:           (StageTimer|None) if given, add the wall time, CPU time and call count of each WriteJSON
+                             stage and each field validator to it.  None (the default) means no timing at all.
+            now:             (datetime|None) reference UTC time the 'must be in the past' checks compare with (self.now).
+                             None means now.  Batch drivers pass one per batch so every submission is checked the same way.
+            profile_index:   (SEPProfileIndex|None) if given, every forecast's sep_profile file has to be next to the 
+                             output file, not empty, with readable first and last time stamps (see SEPProfileIndex)
+            json_format:     (string) how the JSON is written (see JSON_FORMATS): 'default' (what json.dumps writes), 
+                             'compact' (no whitespace) or 'compact.gz' (no whitespace, gzipped, '.gz' added to the 
+                             output filename).  Either way the numeric fields are JSON numbers (the validators make them 
+                             floats) and self.json_bytes holds the JSON itself.
+            print_function:  (function|None) what the messages are printed with (called like print).  None means print.
+            logger:          (logger|None) what the messages are logged with (a logging.Logger or LoggerAdapter).  None 
+                             means the shared logger for log_dir/log_starter (see InitLogger).
         Output: (automatically returned) ConvertToJSON object
         Description: Convert the data to the JSON format and write the JSON file out.
+            All of a conversion's state is in the object, and its messages only go to print_function and logger, so
+            conversions can run in several threads at once (give each its own timer, and use on_error 'raise' or 
+            'collect': 'exit' would only end the thread).
     
         """
 
         self.dataDict = dataD
+        self.print_function = print_function if print_function is not None else print
+        self.write_file = write_file
+        self.write_mode = write_mode
+        self.write_status = None
+        self.json_bytes = None
+        self.on_error = on_error
+        self.errors = [] # validation errors (only in 'collect' mode)
+        self.timer = timer
+        self.profile_index = profile_index
+        self.json_format = json_format
+        if on_error not in ['exit', 'raise', 'collect']:
+            raise ValueError('Unknown on_error \'{}\'. It has to be \'exit\', \'raise\' or \'collect\'.'.format(on_error))
+        if write_mode not in ['overwrite', 'if_changed']:
+            raise ValueError('Unknown write_mode \'{}\'. It has to be \'overwrite\' or \'if_changed\'.'.format(write_mode))
+        if json_format not in JSON_FORMATS:
+            raise ValueError('Unknown json_format \'{}\'. It has to be one of {}.'.format(json_format, ', '.join(["'{}'".format(f) for f in JSON_FORMATS])))
         self.forecast_or_historical_mode = 'forecast' # default data mode
-        self.orderedDict = collections.OrderedDict()
-        self.noneList = [None, 'None', '0', 0]
-        self.now = n = datetime.datetime.utcnow() # datetime obj # used for log basename
+        self.orderedDict = {} # the validated submission, in JSON order (plain dicts keep insertion order)
+        self.noneList = stubNoneList
+        self.now = n = now if now is not None else datetime.datetime.utcnow() # datetime obj # used for log basename and the 'in the past' checks
         self.now_ts = '{}{:02d}{:02d}{:02d}{:02d}{:02d}'.format(n.year, n.month, n.day, n.hour, n.minute, n.second) # string created from datetime obj
 
-        if output_filename in self.noneList:
+        if output_filename in self.noneList or output_filename.endswith(os.sep):
+            directory = '' if output_filename in self.noneList else output_filename
             # prep model short_name to be used in default output_filename value
             msn = self.dataDict['model']['short_name']
             for (a, b) in [(' ', '_'), ('-', '_')]:
@@ -1171,7 +2584,7 @@ class ConvertToJSON:
             pw_start_ = self.GetFirstPredictionWindowStartTime()
 
             self.output_filename = '{0}.{1}.{2}.json'.format(msn, pw_start_, t)
-            self.output_filename = self.output_filename.replace(':', '')
+            self.output_filename = os.path.join(directory, self.output_filename.replace(':', ''))
         else:
             # make sure output filename has a lowercase .json extension
             if output_filename[-5:] == '.JSON':
@@ -1179,29 +2592,60 @@ class ConvertToJSON:
             elif output_filename[-5:] == '.json':
                 self.output_filename = output_filename
             else:
-                print('The output filename must have a .json extension.  Adding it.')
+                self.print_function('The output filename must have a .json extension.  Adding it.')
                 self.output_filename = f'{output_filename}.json'
             if ':' in self.output_filename:
                 self.output_filename = self.output_filename.replace(':', '')
-                print('WARNING!  A colon \':\' was found in the JSON output filename.  It has been removed because multiple operating systems do not handle that correctly.')
+                self.print_function('WARNING!  A colon \':\' was found in the JSON output filename.  It has been removed because multiple operating systems do not handle that correctly.')
+        if JSON_FORMATS[json_format][1]: self.output_filename += '.gz'
         self.output_dir = output_dir
         self.log_msgs = log_msgs
         self.log_dir = log_dir
         self.log_starter = log_starter
+        self.logger = logger if logger is not None else self.InitLogger()
 
-        self.WriteJSON()
+        try:
+            self.Timed('WriteJSON', self.WriteJSON)
+        except SEPValidationError as e:
+            if self.on_error != 'collect': raise
+            self.errors.append(e.AsDict())
+        if columns_db is not None and self.json_bytes is not None:
+            WriteSubmissionColumns(columns_db, {self.output_filename:SubmissionColumnRows(self.orderedDict, self.output_filename)})
 
         # Make sure run was successful.  So make sure self.output_filename exists and that the file is not empty
         # make sure file exists
-        if os.path.exists(self.output_filename):
+        if self.write_status is not None and os.path.exists(self.output_filename): # this conversion wrote (or kept) it
             # make sure filesize is != 0
             if os.stat(self.output_filename).st_size != 0:
                 # give success message.
-                print('Success!  Here is our definition of success: the output JSON file exists and is not empty.')
+                self.print_function('Success!  Here is our definition of success: the output JSON file exists and is not empty.')
         return
     # end __init__ from ConvertToJSON class
 
 
+    def ApplyFieldValidators(self, table_name, d, toD=None):
+        """ 
+        Input:
+            self:       (ConvertToJSON object)
+            table_name: (string) name of the field table in FIELD_VALIDATORS (e.g., 'forecasts/all_clear')
+            d:          (dictionary) data
+            toD:        (dictionary) dictionary to put the validated values in (default: a new one)
+        Output: the (insertion ordered) dictionary of data to be written to the JSON file
+        Description: Run the precompiled validators of a field table (see CompileFieldValidator) on the data.
+    
+        """
+
+        if toD is None: toD = {} # plain dicts keep insertion order and are smaller than OrderedDicts
+        if self.timer is None:
+            for validator in FIELD_VALIDATORS[table_name]:
+                validator(self, d, toD)
+        else:
+            for validator in FIELD_VALIDATORS[table_name]:
+                self.timer.Time('validate ' + validator.field_name, validator, self, d, toD)
+        return toD
+    # end ApplyFieldValidators
+
+
     def ConvertDTString2DTO(self, dts):
         """ 
         Input:
@@ -1214,21 +2658,32 @@ class ConvertToJSON:
         """
 
         try:
-            y = int(dts[0:4])
-            m = int(dts[5:7])
-            d = int(dts[8:10])
-            h = int(dts[11:13])
-            n = int(dts[14:16]) # n --> thinking m for minute, but it's already used so bumped it to 'n'
+            (y, m, d, h, n, _) = DateTimeStampFields(dts[0:16]) # cached; n --> minute.  Seconds are dropped.
         except: 
-            logging.critical(f'\tError Type: {sys.exc_info()[0]}\n\tError Details: {sys.exc_info()[1]}\n\t{traceback.print_tb(sys.exc_info()[2])}')
-            logging.critical(f'Converting the date/time string to a datetime object failed. The date/time string is {dts}')
-            sys.exit()
+            self.logger.critical(f'\tError Type: {sys.exc_info()[0]}\n\tError Details: {sys.exc_info()[1]}\n\t{"".join(traceback.format_tb(sys.exc_info()[2]))}')
+            self.logger.critical(f'Converting the date/time string to a datetime object failed. The date/time string is {dts}')
+            self.FailValidation(f'Converting the date/time string to a datetime object failed. The date/time string is {dts}')
         
 
         return datetime.datetime(y, m, d, h, n, 0)
     # end ConvertDTString2DTO
 
 
+    def FailValidation(self, m, field_name=None):
+        """ 
+        Input:
+            self:       (ConvertToJSON object)
+            m:          (string) the error message (it has already been printed)
+            field_name: (string|None) the field that failed validation, if known
+        Output: None (it does not return)
+        Description: Exit, or raise SEPValidationError, depending on self.on_error (see the module level FailValidation).
+
+        """
+
+        FailValidation(m, self.on_error, field_name, self.output_filename)
+    # end FailValidation
+
+
     def GetFirstPredictionWindowStartTime(self):
         """ 
         Input: self: (ConvertToJSON object)
@@ -1261,16 +2716,16 @@ class ConvertToJSON:
 
         """
 
-        print("{0}: {1}".format(os.path.basename(__file__), m))
+        self.print_function("{0}: {1}".format(os.path.basename(__file__), m))
         if log and exit:
-            logging.critical("{0}: {1}".format(os.path.basename(__file__), m))
-            logging.critical("{0}: Exiting.".format(os.path.basename(__file__)))
-            sys.exit()
+            self.logger.critical("{0}: {1}".format(os.path.basename(__file__), m))
+            self.logger.critical("{0}: Exiting.".format(os.path.basename(__file__)))
+            self.FailValidation(m)
         elif log:
-            logging.error("{0}: {1}".format(os.path.basename(__file__), m))
+            self.logger.error("{0}: {1}".format(os.path.basename(__file__), m))
         elif exit:
-            logging.critical("{0}: Exiting".format(os.path.basename(__file__)))
-            sys.exit()
+            self.logger.critical("{0}: Exiting".format(os.path.basename(__file__)))
+            self.FailValidation(m)
 
         return
     # end IJWError
@@ -1289,8 +2744,8 @@ class ConvertToJSON:
         """
 
         # in the style of argparse.error output
-        print("{0}: {1}".format(os.path.basename(__file__), m))
-        if log: logging.warning("{0}: {1}".format(os.path.basename(__file__), m))
+        self.print_function("{0}: {1}".format(os.path.basename(__file__), m))
+        if log: self.logger.warning("{0}: {1}".format(os.path.basename(__file__), m))
 
         return
     # end IJWWarning
@@ -1310,28 +2765,19 @@ class ConvertToJSON:
     def InitLogger(self):
         """ 
         Input: self: (ConvertToJSON object)
-        Output: Python logging object
-        Description: Initialize logger for logging messages.
+        Output: Python logging object (a LoggerAdapter that tags every record with self.output_filename)
+        Description: Get the process's shared logger for self.log_dir/self.log_starter (see GetSharedLogger).
+            If logging is turned off, the messages go nowhere.
 
         """
 
-        logger = logging.getLogger(__name__)
-        # need to add a temp aspect to this...
-        n = datetime.datetime.utcnow()
-        if os.path.exists(self.log_dir): pass
-        else:  
-                try:   os.mkdir(self.log_dir)
-                except:
-                        print('ERROR: can\'t make logs directory. Using current directory.')
-                        self.log_dir= './'
-        log_file = os.path.join(self.log_dir, '{}.{}.log'.format(self.log_starter, self.now_ts))
-        hdlr = logging.FileHandler(log_file)
-        formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-        hdlr.setFormatter(formatter)
-        logger.addHandler(hdlr)
-        logger.setLevel(logging.INFO) # replace INFO with DEBUG, WARNING, ERROR, or CRITICAL, as desired
-
-        return logger
+        if self.log_msgs: logger = GetSharedLogger(self.log_dir, self.log_starter)
+        else:
+            logger = logging.getLogger('{}.no_logging'.format(__name__))
+            with sharedLoggersLock:
+                if not logger.handlers: logger.addHandler(logging.NullHandler())
+                logger.propagate = False
+        return logging.LoggerAdapter(logger, {'output_filename':self.output_filename})
     # end InitLogger
 
     
@@ -1345,30 +2791,7 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        pfn = 'forecasts/all_clear' # parent field name
-        toD = collections.OrderedDict()
-        L = [
-            ('all_clear_boolean', False, True, None, None, None, True),
-            ('threshold', 0, True, False, False, None, False),
-            ('threshold_units', 'pfu', True, None, None, None, True), 
-            ('probability_threshold', 0, False, False, False, None, True),
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if k == 'all_clear_boolean':
-                        self.ValidateBoolean(value, '{}/{}'.format(pfn, k))
-                    elif s == 0:
-                        # 'threshold' Can be 10 pfu, 1 pfu, or custom 
-                        value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), neg_allowed=allow_neg, neg_one_allowed=allow_neg_one)
-                    elif k == 'threshold_units':
-                        self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars=' -_+*^()/')
-                    toD[k] = value
-        return toD
+        return self.ApplyFieldValidators('forecasts/all_clear', d)
     # end PrepForecastAllClear
 
 
@@ -1382,26 +2805,7 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        pfn = 'forecasts/energy_channel' # parent field name
-        toD = collections.OrderedDict()
-        L = [
-            ('min', 0, True, False, False, None, False), # is allow_stub_value correct?
-            ('max', 0, True, False, True, None, False), # is allow_stub_value correct?
-            ('units', 'pfu', True, None, None, None, True), 
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if k in ['min', 'max']:
-                        value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), neg_allowed=allow_neg, neg_one_allowed=allow_neg_one)
-                    elif k == 'units':
-                        self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars=' -_+*^()/')
-                    toD[k] = value
-        return toD
+        return self.ApplyFieldValidators('forecasts/energy_channel', d)
     # end PrepForecastEnergyChannel
 
 
@@ -1414,39 +2818,10 @@ class ConvertToJSON:
         Description: Prep the Forecast's event_lengths data for the ordered dictionary, from which the JSON is written.
     
         """
-        
-        stub_found = False
-        pfn = 'forecasts/event_lengths' # parent field name
-        toD = collections.OrderedDict()
-        L = [
-            ('start_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False), 
-            ('end_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False), 
-            ('threshold', 0, True, False, False, None, False),
-            ('threshold_units', 'pfu', True, None, None, None, True), 
-        ]
-
-        #for d in lod:
-        #    print(d)
-        #    print(type(d))
-        #    print(d.keys())
-        #    print('exiting prematurely from PrepForecastEventLength. --Joycelyn')
-        #    sys.exit()
+
         newL = []
         for d in lod:
-            toD = collections.OrderedDict()
-            for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-                if self.VerifyKeyInDict(k, d, required=r):
-                    value = d[k]
-                    if not allow_stub_value:
-                        stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                    if allow_stub_value or not stub_found:
-                        if s == 'YYYY-MM-DDTHH:MMZ':
-                            self.ValidateDateTimeStamp(value, '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                        elif k  == 'threshold':
-                            value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), neg_allowed=allow_neg, neg_one_allowed=allow_neg_one)
-                        elif k == 'threshold_units':
-                            self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars=' -_+*^()/')
-                        toD[k] = value
+            toD = self.ApplyFieldValidators('forecasts/event_lengths', d)
             s = d['start_time']
             e = None
             if 'end_time' in d.keys():
@@ -1466,32 +2841,8 @@ class ConvertToJSON:
         Description: Prep the Forecast's fluence data for the ordered dictionary, from which the JSON is written.
     
         """
-        
-        stub_found = False
-        pfn = 'forecasts/fluences' # parent field name
-        toD = collections.OrderedDict()
-        L = [
-            ('fluence', '0', True, False, False, None, True),
-            ('units', 'pfu', True, None, None, None, True), 
-            ('uncertainty_low', 0, False, False, False, None, True),
-            ('uncertainty_high', 0, False, False, False, None, True),
-        ]
-        newL = []
-        for d in lod:
-            toD = collections.OrderedDict()
-            for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-                if self.VerifyKeyInDict(k, d, required=r):
-                    value = d[k]
-                    if not allow_stub_value:
-                        stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                    if allow_stub_value or not stub_found:
-                        if k == 'units':
-                            self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars=' -_+*^()/')
-                        else:
-                            value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), neg_allowed=allow_neg, neg_one_allowed=allow_neg_one)
-                        toD[k] = value
-            newL.append(toD)
-        return newL
+
+        return [self.ApplyFieldValidators('forecasts/fluences', d) for d in lod]
     # end PrepForecastFluences
 
 
@@ -1551,31 +2902,8 @@ class ConvertToJSON:
         Notes:  peak_intensity, peak_intensity_esp, and peak_intensity_max are supposed to have the exact same fields.
 
         """
-        
-        stub_found = False
-        toD = collections.OrderedDict()
-        L = [
-            ('intensity', '0', True, False, False, None, False),
-            ('units', 'pfu', True, None, None, None, True), 
-            ('uncertainty', 0, False, False, False, None, True),
-            ('uncertainty_low', 0, False, False, False, None, True),
-            ('uncertainty_high', 0, False, False, False, None, True),
-            ('time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False),
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if k in ['intensity', 'uncertainty', 'uncertainty_low', 'uncertainty_high']:
-                        value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), neg_allowed=allow_neg, neg_one_allowed=allow_neg_one)
-                    elif k == 'units':
-                        self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars=' -_+*^()/')
-                    elif k == 'time':
-                        self.ValidateDateTimeStamp(value, '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                    toD[k] = value
 
+        toD = self.ApplyFieldValidators(pfn, d)
 
         # make sure that if there is an 'uncertainty' value that there is not an 'uncertainty_low' or 'uncertainty_high' value
         if 'uncertainty' in d.keys():
@@ -1601,25 +2929,7 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        pfn = 'forecasts/prediction_window' # parent field name
-        toD = collections.OrderedDict()
-        L = [
-            ('start_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False),
-            ('end_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False),
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    self.ValidateDateTimeStamp(value, '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                    #if k == 'start_time':
-                    #    pass # TODO start of forecast prediction window (must be within one hour of forecast issue time for "forecast" mode)
-                    toD[k] = value
-
-        return toD
+        return self.ApplyFieldValidators('forecasts/prediction_window', d)
     # end PrepForecastPredictionWindow
 
 
@@ -1632,33 +2942,8 @@ class ConvertToJSON:
         Description: prepare the forecast's probabilities (a list of probability values)
     
         """
-        
-        stub_found = False
-        pfn = 'forecasts/probabilities' # parent field name
-        L = [
-            ('probability_value', 0, True, False, False, None, False),
-            ('uncertainty', 0, False, False, False, None, True),
-            ('threshold', 0, True, False, False, None, False),
-            ('threshold_units', 'pfu', True, None, None, None, True), 
-        ]
-        newL = []
-        for d in lod:
-            toD = collections.OrderedDict()
-            for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-                if self.VerifyKeyInDict(k, d, required=r):
-                    value = d[k]
-                    if not allow_stub_value:
-                        stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                    if allow_stub_value or not stub_found:
-                        if s == 0:
-                            value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), neg_allowed=allow_neg, neg_one_allowed=allow_neg_one)
-                            if k == 'probability_value': self.ValidateForecastProbabilityValue(value)
-                        elif k == 'units':
-                            self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars=' -_+*^()/')
-                        toD[k] = value
-            newL.append(toD)
 
-        return newL
+        return [self.ApplyFieldValidators('forecasts/probabilities', d) for d in lod]
     # end PrepForecastProbabilities
 
 
@@ -1671,37 +2956,8 @@ class ConvertToJSON:
         Description: prepare the forecast's threshold crossings (a list of threshold crossing values)
     
         """
-        
-        stub_found = False
-        pfn = 'forecasts/threshold_crossings' # parent field name
-        L = [
-            ('crossing_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False),
-            ('uncertainty', 0, False, False, False, None, True),
-            ('threshold', 0, True, False, False, None, False),
-            ('threshold_units', 'pfu', True, None, None, None, True), 
-        ]
-        #for d in lod:
-        #    print(d)
-        #print('Exiting prematurely from PrepForecastThresholdCrossings. --Joycelyn')
-        #sys.exit()
-        newL = []
-        for d in lod:
-            toD = collections.OrderedDict()
-            for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-                if self.VerifyKeyInDict(k, d, required=r):
-                    value = d[k]
-                    if not allow_stub_value:
-                        stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                    if allow_stub_value or not stub_found:
-                        if s == 'YYYY-MM-DDTHH:MMZ':
-                            self.ValidateDateTimeStamp(value, '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                        elif s == 0:
-                            value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), neg_allowed=allow_neg, neg_one_allowed=allow_neg_one)
-                        elif k == 'units':
-                            self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars=' -_+*^()/')
-                        toD[k] = value
-            newL.append(toD)
-        return newL
+
+        return [self.ApplyFieldValidators('forecasts/threshold_crossings', d) for d in lod]
     # end PrepForecastThresholdCrossings
 
 
@@ -1715,45 +2971,16 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        pfn = 'forecasts' # parent field name
-        toD = collections.OrderedDict() # temp ordered dictionary
-        leafD = {
-            'species': (self.noneList, True, self.ValidateForecastSpecies),
-            'location': (self.noneList, True, self.ValidateForecastLocation),
-            'sep_profile': ("filename_energychannel.txt", False, self.ValidateForecastSEPProfile),
-            'native_id': (self.noneList, False, self.ValidateForecastNativeID),
-        }
-        L = [
-            ('energy_channel', True, self.PrepForecastEnergyChannel),
-            ('species', True, None),
-            ('location', True, None),
-            ('prediction_window', True, self.PrepForecastPredictionWindow),
-            ('peak_intensity', False, self.PrepForecastPeakIntensity),
-            ('peak_intensity_esp', False, self.PrepForecastPeakIntensityEsp),
-            ('peak_intensity_max', False, self.PrepForecastPeakIntensityMax),
-            ('fluences', False, self.PrepForecastFluences),
-            ('event_lengths', False, self.PrepForecastEventLengths),
-            ('threshold_crossings', False, self.PrepForecastThresholdCrossings),
-            ('probabilities', False, self.PrepForecastProbabilities),
-            ('all_clear', False, self.PrepForecastAllClear),
-            ('sep_profile', False, None),
-            ('native_id', False, None),
-        ]
-        for (k, r, meth) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                if meth is None:
-                    if k in leafD.keys():
-                        value = d[k]
-                        (s, r, val_meth) = leafD[k]
-                        stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r)
-                        if not stub_found: 
-                            val_meth(value)
-                            toD[k] = value
-                else: 
-                    #print('about to call {} with arg *{}*.'.format(str(meth), d[k]))
-                    if k == 'event_lengths': toD[k] = meth(d[k], d['prediction_window'])
-                    else: toD[k] = meth(d[k])
+        toD = {} # temp (insertion ordered) dictionary
+        for (k, r, meth_name) in FORECAST_FIELDS:
+            if meth_name is None:
+                validator = FORECAST_LEAF_VALIDATORS[k] # leaf values (species, location, sep_profile, native_id)
+                if self.timer is None: validator(self, d, toD)
+                else: self.timer.Time('validate ' + validator.field_name, validator, self, d, toD)
+            elif self.VerifyKeyInDict(k, d, required=r):
+                meth = getattr(self, meth_name)
+                if k == 'event_lengths': toD[k] = meth(d[k], d['prediction_window'])
+                else: toD[k] = meth(d[k])
         return toD
     # end PrepForecast (NOT PrepForecasts !!!)
 
@@ -1794,17 +3021,7 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        k = pfn = 'issue_time' # parent field name
-        if self.VerifyKeyInDict(k, required=True): # make sure the key exists
-            L = [ ('issue_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, True, False), ]
-            for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-                value = self.dataDict[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}'.format(k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    self.ValidateDateTimeStamp(value, '{}'.format(k), ensure_in_past=must_be_in_past) # ensure proper format 'YYYY-MM-DDTHH:MMZ'
-                    self.orderedDict[k] = value
+        self.ApplyFieldValidators('issue_time', self.dataDict, self.orderedDict)
 
         return
     # end PrepIssueTime
@@ -1839,25 +3056,9 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        k = pfn = 'model' # parent field name
-        if self.VerifyKeyInDict(k, required=True):
-            d = self.dataDict[k]
-            toD = collections.OrderedDict()
-            L = [
-                ('short_name', 'Short name for your model', True, None, None, None, False),
-                ('spase_id', 'spase://CCMC/SimulationModel/MODEL_NAME/VERSION', True, None, None, None, False),
-            ]
-            for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-                if self.VerifyKeyInDict(k, d, required=r):
-                    value = d[k]
-                    if not allow_stub_value:
-                        stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                    if allow_stub_value or not stub_found:
-                        if k == 'short_name': self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars=' -_+().') # should I allow other characters?
-                        elif k == 'spase_id': self.ValidateURL(value, '{}/{}'.format(pfn, k), spase_id=True) # Validate single url value
-                        toD[k] = value
-        self.orderedDict[pfn] = toD
+        pfn = 'model' # parent field name
+        if self.VerifyKeyInDict(pfn, required=True):
+            self.orderedDict[pfn] = self.ApplyFieldValidators(pfn, self.dataDict[pfn])
 
         return
     # end PrepModel
@@ -1872,16 +3073,16 @@ class ConvertToJSON:
 
         newL = list()
         if self.VerifyKeyInDict('inputs', required=False):
-            print('[PrepModelInputs:L1414] type(self.dataDict[\'inputs\']) is {1} self.dataDict[\'inputs\'] is {0}'.format(self.dataDict['inputs'], type(self.dataDict['inputs'])))
+            self.print_function('[PrepModelInputs:L1414] type(self.dataDict[\'inputs\']) is {1} self.dataDict[\'inputs\'] is {0}'.format(self.dataDict['inputs'], type(self.dataDict['inputs'])))
             for d in self.dataDict['inputs']:
-                print('[PrepModelInputs:L1416] type(d) is {1} d is {0}'.format(d, type(d)))
+                self.print_function('[PrepModelInputs:L1416] type(d) is {1} d is {0}'.format(d, type(d)))
                 newD = {}
                 if self.VerifyKeyInDict('magnetic_connectivity', d, required=False):
                     # d['magnetic_connectivity'] is a list of dictionaries
-                    print("[PrepModelInputs:L1437] type(d['magnetic_connectivity']) is {1} d['magnetic_connectivity'] is {0}".format(d['magnetic_connectivity'], type(d['magnetic_connectivity'])))
+                    self.print_function("[PrepModelInputs:L1437] type(d['magnetic_connectivity']) is {1} d['magnetic_connectivity'] is {0}".format(d['magnetic_connectivity'], type(d['magnetic_connectivity'])))
                     for d2 in d['magnetic_connectivity']:
-                        print('the dictionary is for magnetic_connectivity. about to go to PrepModelInputsMagneticConnectivity.')
-                        print('type(d2): {0}; d2: {1}'.format(type(d2), d2))
+                        self.print_function('the dictionary is for magnetic_connectivity. about to go to PrepModelInputsMagneticConnectivity.')
+                        self.print_function('type(d2): {0}; d2: {1}'.format(type(d2), d2))
                         newD = {'magnetic_connectivity': self.PrepModelInputsMagneticConnectivity(d2)}
                         if newD != {}: newL.append(newD)
                 elif self.VerifyKeyInDict('magnetogram', d, required=False):
@@ -1905,29 +3106,7 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        pfn = 'inputs/magnetic_connectivity' # parent field names
-        toD = collections.OrderedDict() # temp ordered dictionary
-
-        # define values for validating the following magnetic_connectivity values 
-        L = [
-            # key name, stub value, req'd, allow_neg values, allow_neg_one values, must_be_in_past, allow_stub_value, min_value, max_value
-            ('method', None, True, None, None, False, False, None, None), # allowed values: Parker Spiral, PFSS-Parker Spiral, WSA, WSA-ENLIL, ADAPT-WSA-ENLIL  (& maybe: Parker_Spiral_2.5Rs)
-            ('lat', 0, False, True, True, None, True, -90, 90),
-            ('lon', 0, True, True, True, None, True, -180, 180),
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value, min_v, max_v) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if s == 0:
-                        value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), allow_neg, allow_neg_one, min_v, max_v)
-                if k == 'method':
-                    # check that the method value is one of the allowed values
-                    self.ValidateModelInputsMagneticConnectivityMethod(value, '{}/{}'.format(pfn, k))
-                toD[k] = value
+        toD = self.ApplyFieldValidators('inputs/magnetic_connectivity', d)
         # process the connection_angle values, if they exist
         k = 'connection_angle'
         if self.VerifyKeyInDict(k, d, required=False):
@@ -1951,27 +3130,7 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        pfn = 'inputs/magnetic_connectivity/connection_angle' # parent field names
-        toD = collections.OrderedDict() # temp ordered dictionary
-
-        # define values for validating the following magnetic_connectivity values 
-        L = [
-            # key name, stub value, req'd, allow_neg values, allow_neg_one values, must_be_in_past, allow_stub_value, min_value, max_value
-            ('great_circle', 0, False, False, False, None, True, 0, 360),
-            ('lat', 0, False, True, True, None, True, -90, 90),
-            ('lon', 0, True, True, True, None, True, -180, 180),
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value, min_v, max_v) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if s == 0:
-                        value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), allow_neg, allow_neg_one, min_v, max_v)
-                toD[k] = value
-        return toD
+        return self.ApplyFieldValidators('inputs/magnetic_connectivity/connection_angle', d)
     # end PrepModelInputsMagneticConnectivityConnectionAngle
 
 
@@ -1985,31 +3144,7 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        pfn = 'inputs/magnetic_connectivity/connection_angle' # parent field names
-        toD = collections.OrderedDict() # temp ordered dictionary
-
-        # define values for validating the following magnetic_connectivity values 
-        L = [
-            # key name, stub value, req'd, allow_neg values, allow_neg_one values, must_be_in_past, allow_stub_value, min_value, max_value
-            ('observatory', None, False, None, None, None, True, None, None),
-            ('speed', 0, True, False, False, None, True, 0, None),
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value, min_v, max_v) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if s == 0:
-                        value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), allow_neg, allow_neg_one, min_v, max_v)
-                    if k == 'observatory': # Validate observatory (alphanumeric + some special characters?)
-                        self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars='-_')
-                # do not bother to save the observatory value if it is None
-                if k == 'observatory' and value in noneList: pass
-                else: toD[k] = value
-
-        return toD
+        return self.ApplyFieldValidators('inputs/magnetic_connectivity/solar_wind', d)
     # end PrepModelInputsMagneticConnectivitySolarWind
 
 
@@ -2023,23 +3158,7 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        pfn = 'inputs/magnetogram' # parent field names
-        toD = collections.OrderedDict() # temp ordered dictionary
-
-        # define values for validating the following magnetic_connectivity values 
-        L = [
-            # key name, stub value, req'd, allow_neg values, allow_neg_one values, must_be_in_past, allow_stub_value, min_value, max_value
-            ('observatory', None, True, None, None, False, False, None, None),
-            ('instrument', None, True, None, None, False, False, None, None),
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value, min_v, max_v) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars='-_')
-                toD[k] = value
+        toD = self.ApplyFieldValidators('inputs/magnetogram', d)
         # process the products values, if they exist
         k = 'products'
         if self.VerifyKeyInDict(k, d, required=False):
@@ -2062,30 +3181,7 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
-        pfn = 'inputs/magnetogram/products' # parent field names
-        toD = collections.OrderedDict() # temp ordered dictionary
-
-        # define values for validating the following magnetic_connectivity values 
-        L = [
-            # key name, stub value, req'd, allow_neg values, allow_neg_one values, must_be_in_past, allow_stub_value, min_value, max_value
-            ('product',        None,                False, None, None, False, False, None, None),
-            ('last_data_time', 'YYYY-MM-DDTHH:MMZ', True,  None, None, False, False, None, None), 
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value, min_v, max_v) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if s == 'YYYY-MM-DDTHH:MMZ':
-                        self.ValidateDateTimeStamp(value, '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                if k == 'product': self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars='-_')
-                # do not bother to save the product value if it is None
-                if k == 'product' and value in noneList: pass
-                else: toD[k] = value
-
-        return toD
+        return self.ApplyFieldValidators('inputs/magnetogram/products', d)
     # end PrepModelInputsMagnetogramProducts
 
  
@@ -2126,60 +3222,20 @@ class ConvertToJSON:
     
         """
 
-        stub_found = False
         pfn = 'triggers/cme' # parent field names
-        toD = collections.OrderedDict() # temp ordered dictionary
-        L = [
-            ('start_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False, None, None),
-            ('liftoff_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False, None, None),
-            ('lat', 0, False, True, True, None, True, -90, 90),
-            ('lon', 0, False, True, True, None, True, -180, 180),
-            ('pa', 0, False, True, True, None, True, 0, 360),
-            ('half_width', 0, False, True, True, None, True, 0, 180),
-            ('speed', 0, False, True, True, None, True, 0, 5000),
-            ('acceleration', 0, False, False, False, None, True, None, None),
-            ('height', 0, False, True, True, None, False, 1, 250),
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value, min_v, max_v) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if s == 'YYYY-MM-DDTHH:MMZ':
-                        self.ValidateDateTimeStamp(value, '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                    elif s == 0:
-                        value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), allow_neg, allow_neg_one, min_v, max_v)
-                    toD[k] = value
-                # If 'lat' is a non-zero/non-stub value given, make sure 'lon' is there too.
-                if k == 'lat' and not self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=False): 
-                    self.VerifyKeyInDict('lon', d, required=True)
-                # If 'lon' is a non-zero/non-stub value given, make sure 'lat' is there too.
-                if k == 'lon' and not self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=False): 
-                    self.VerifyKeyInDict('lat', d, required=True)
+        toD = self.ApplyFieldValidators(pfn, d)
         k = 'time_at_height'
         if self.VerifyKeyInDict(k, d, required=False):
             toD[k] = self.PrepTriggersCMETimeAtHeight(d[k])
         # coordinates and catalog
-        stub_found = False
         if self.VerifyKeyInDict('lat', d, required=False) or self.VerifyKeyInDict('lon', d, required=False):
-            L = [('coordinates', self.noneList, True, None, None, None, False)]
-        else: L = [('coordinates', self.noneList, False, None, None, None, False)]
-        L.append(('catalog', self.noneList, False, None, None, None, False))
+            self.ApplyFieldValidators('triggers/cme/coordinates/required', d, toD)
+        else: self.ApplyFieldValidators('triggers/cme/coordinates/optional', d, toD)
+        self.ApplyFieldValidators('triggers/cme/catalog', d, toD)
         if 'catalog' in d and d['catalog'] == 'DONKI': 
-            L.append(('catalog_id', self.noneList, True, None, None, None, True))
+            self.ApplyFieldValidators('triggers/cme/catalog_id/required', d, toD)
         else:
-            L.append(('catalog_id', self.noneList, False, None, None, None, True))
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if k == 'coordinates': self.ValidateCoordinates(value)
-                    elif k == 'catalog': self.ValidateCatalog(value)
-                    elif k == 'catalog_id': self.ValidateCatalogID(value, d['catalog'])
-                toD[k] = value
+            self.ApplyFieldValidators('triggers/cme/catalog_id/optional', d, toD)
         # urls
         k = 'urls'
         if self.VerifyKeyInDict(k, d, required=False):
@@ -2199,31 +3255,8 @@ class ConvertToJSON:
         Description: Prep the triggers/CME Simuation data (if it exists) for the ordered dictionary, from which the JSON is written.
     
         """
-        
-        stub_found = False
-        pfn = 'triggers/cme_simulation' # parent field name
-        toD = collections.OrderedDict() # temp ordered dictionary
-        L = [
-            ('model', self.noneList, True, None, None, None, False),
-            ('simulation_completion_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, True, False),
-            ('urls', [], False, None, None, None, True), 
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if k == 'model':
-                        self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars=' -_+')
-                        toD[k] = value
-                    elif s == 'YYYY-MM-DDTHH:MMZ':
-                        self.ValidateDateTimeStamp(value, '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                        toD[k] = value
-                    elif k == 'urls': 
-                        toD[k] = self.PrepTriggersURLs(value, '{}/{}'.format(pfn, k))
 
-        return toD
+        return self.ApplyFieldValidators('triggers/cme_simulation', d)
     # end PrepTriggersCMESimulation
 
 
@@ -2236,26 +3269,8 @@ class ConvertToJSON:
         Description: Prep the trigger CME's time at height data
     
         """
-        
-        stub_found = False
-        pfn = 'triggers/cme/time_at_height' # parent field name
-        toD = collections.OrderedDict() # temp ordered dictionary
-        L = [
-            ('time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False, None, None),
-            ('height', 0, True, False, False, None, False, 1, 9000),
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value, min_v, max_v) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if s == 'YYYY-MM-DDTHH:MMZ':
-                        self.ValidateDateTimeStamp(value, '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                    elif s == 0:
-                        value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), allow_neg, allow_neg_one, min_v, max_v)
-                    toD[k] = value
-        return toD
+
+        return self.ApplyFieldValidators('triggers/cme/time_at_height', d)
     # end PrepTriggersCMETimeAtHeight
 
 
@@ -2268,42 +3283,8 @@ class ConvertToJSON:
         Description: Prep the trigger CME's time at height data
     
         """
-        """ """
-        stub_found = False
-        pfn = 'triggers/flare' # parent field name
-        toD = collections.OrderedDict() # temp ordered dictionary
-        L = [
-            ('last_data_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False), 
-            ('start_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False), 
-            ('peak_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False), 
-            ('end_time', 'YYYY-MM-DDTHH:MMZ', False, None, None, False, False),
-            ('location', self.noneList, False, None, None, None, False), 
-            ('intensity', 0, False, None, None, None, False),
-            ('integrated_intensity', 0, False, None, None, None, False),
-            ('noaa_region', self.noneList, False, None, None, None, False), 
-            ('urls', [], False, None, None, None, True), 
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if s == 'YYYY-MM-DDTHH:MMZ':
-                        self.ValidateDateTimeStamp(d[k], '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                        toD[k] = value
-                    elif k == 'location': 
-                        self.ValidateStonyhurstCoordinates(value, '{}/{}'.format(pfn, k)) # Validate Stonyhurst coordinates (N00W00/S00E00 format)
-                        toD[k] = value
-                    elif s == 0:
-                        value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), neg_allowed=allow_neg, neg_one_allowed=allow_neg_one)
-                        toD[k] = value
-                    elif k == 'noaa_region': 
-                        self.ValidateNOAARegion(value) # Validate noaa_region (include the preceding 1) 
-                        toD[k] = value
-                    elif k == 'urls': 
-                        toD[k] = self.PrepTriggersURLs(value, '{}/{}'.format(pfn, k))
-        return toD
+
+        return self.ApplyFieldValidators('triggers/flare', d)
     # end PrepTriggersFlare
 
 
@@ -2316,27 +3297,8 @@ class ConvertToJSON:
         Description:
     
         """
-        """ """
-        stub_found = False
-        toD = collections.OrderedDict() # temp ordered dictionary
-        pfn = 'triggers/particle_intensity' # parent field name
-        L = [
-            ('observatory', self.noneList, True, None, None, None, False), 
-            ('instrument', self.noneList, True, None, None, None, False),
-            ('last_data_time', 'YYYY-MM-DDTHH:MMZ', True, None, None, False, False),
-        ]
-        for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-            if self.VerifyKeyInDict(k, d, required=r):
-                value = d[k]
-                if not allow_stub_value:
-                    stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                if allow_stub_value or not stub_found:
-                    if s == 'YYYY-MM-DDTHH:MMZ':
-                        self.ValidateDateTimeStamp(value, '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                    else:
-                        # Validate observatory and instrument values (is that even possible?  alphanumeric + some special characters?)
-                        self.ValidateAlphaNumeric(value, '{}/{}'.format(pfn, k), allow_addtl_chars='-_')
-                    toD[k] = value
+
+        toD = self.ApplyFieldValidators('triggers/particle_intensity', d)
         k = 'ongoing_events'
         if self.VerifyKeyInDict(k, d, required=False):
              toD[k] = self.PrepTriggersParticleIntensityOngoingEvents(d[k])
@@ -2352,32 +3314,8 @@ class ConvertToJSON:
         Description:
     
         """
-        """ """
-        stub_found = False
-        pfn = 'triggers/particle_intensity/ongoing_events' # parent field name
-        newL = []
-        L = [
-            ("start_time", "YYYY-MM-DDTHH:MMZ", True, None, None, False, False),
-            ("threshold", 0, True, False, False, None, True), 
-            ("energy_min", 0, True, False, False, None, True), 
-            ("energy_max", 0, True, False, True, None, True), # -1 ok. o/w float
-        ]
-        #print('received List: {} which is of type({}).'.format(List, type(List)))
-        for d in List:
-            toD = collections.OrderedDict() # temp ordered dictionary
-            for (k, s, r, allow_neg, allow_neg_one, must_be_in_past, allow_stub_value) in L:
-                if self.VerifyKeyInDict(k, d, required=r):
-                    value = d[k]
-                    if not allow_stub_value:
-                        stub_found = self.VerifyNonStubValue(value, s, '{}/{}'.format(pfn, k), required=r) # check for non-stub value
-                    if allow_stub_value or not stub_found:
-                        if s == 'YYYY-MM-DDTHH:MMZ':
-                            self.ValidateDateTimeStamp(value, '{}/{}'.format(pfn, k), ensure_in_past=must_be_in_past)
-                        else:
-                            value = self.ValidateFloat(value, '{}/{}'.format(pfn, k), neg_allowed=allow_neg, neg_one_allowed=allow_neg_one)
-                        toD[k] = value
-            newL.append(toD)
-        return newL
+
+        return [self.ApplyFieldValidators('triggers/particle_intensity/ongoing_events', d) for d in List]
     # end PrepTriggersParticleIntensityOngoingEvents
 
     def PrepTriggersURLs(self, value, field_name):
@@ -2420,17 +3358,34 @@ class ConvertToJSON:
                 #print("{0}: {1}".format(mode, msg))
                 logger.info(msg)
         elif mode == 'warning':
-                print("{0}: {1}".format(mode, msg))
+                self.print_function("{0}: {1}".format(mode, msg))
                 logger.warning(msg)
         elif mode == 'error':
-                print("{0}: {1}".format(mode, msg))
+                self.print_function("{0}: {1}".format(mode, msg))
                 logger.error(msg)
         elif mode == 'critical':
-                print("{0}: {1}".format(mode, msg))
+                self.print_function("{0}: {1}".format(mode, msg))
                 logger.critical(msg)
         return
     # end PrintLogMessage
 
+    def Timed(self, name, func, *args):
+        """ 
+        Input:
+            self: (ConvertToJSON object)
+            name: (string) stage name for the timer
+            func: (function) the stage to run
+            args: the stage's arguments
+        Output: whatever func returns
+        Description: Run a stage, timing it if there is a timer (see StageTimer).
+    
+        """
+
+        if self.timer is None: return func(*args)
+        return self.timer.Time(name, func, *args)
+    # end Timed
+
+
     def VerifyNonStubValue(self, value, stub_value, field_name, required=True):
         """ 
         Doc String TODO
@@ -2525,7 +3480,7 @@ class ConvertToJSON:
     
         """
         """ The catalog ID value can be anything, however, it must not be None if catalog_value == 'DONKI'.  """
-        print('entered ValidateCatalogID.')
+        self.print_function('entered ValidateCatalogID.')
         pfn = 'triggers/cme/catalog_id'
         if catalog_value == 'DONKI' and value in noneList:
             m = 'ERROR: the value given in \'{}\' cannot be None if the catalog is DONKI. Exiting.'.format(pfn)
@@ -2561,40 +3516,17 @@ class ConvertToJSON:
             or no seconds (e.g., '2000-07-14T10:03Z').
 
         """
-        #print('In ValidateDateTimeStamp.  dts_value is {}'.format(dts_value))
-        c_typeDict = {}
-        for i in [0,1,2,3,5,6,8,9,11,12,14,15]: c_typeDict[i] = string.digits
-        for i in [4,7]: c_typeDict[i] = '-'
-        c_typeDict[10] = 'T'
-        c_typeDict[13] = ':'
-        #for (k, v) in c_typeDict.items():
-        #    print("{} : {}".format(k, v))
-
-        if len(dts_value) not in [17, 20]: # ensure you have exactly the correct length of date time string
+        if isinstance(dts_value, str): problem = DateTimeStampProblem(dts_value) # cached
+        else: problem = DateTimeStampProblem.__wrapped__(dts_value)
+        if problem == 'length': # ensure you have exactly the correct length of date time string
             m = 'ERROR: the date time string given in \'{}\' is the wrong length. It is \'{}\'.  Exiting.'.format(field_name, dts_value)
             self.IJWError(m, self.log_msgs, True) # (msg, log, exit)
-        elif len(dts_value) == 17:
-            c_typeDict[16] = 'Z'
-        elif len(dts_value) == 20:
-            c_typeDict[16] = ':'
-            for i in [17,18]: c_typeDict[i] = string.digits
-            c_typeDict[19] = 'Z'
-        for i in range(0, len(dts_value)):
-            #print("dts_value[{0}] is {1} and is of type {2}.".format(i, dts_value[i], type(dts_value[i])))
-            if dts_value[i] not in c_typeDict[i]: # the character I got in this position is not the correct type, throw an error
-                m = 'ERROR: the character in the {0} index of the date time string given in \'{1}\' is not the correct type.  It needs to be one of these characters [{2}]. Exiting.'.format(i, field_name, c_typeDict[i])
-                self.IJWError(m, self.log_msgs, True) # (msg, log, exit)
+        elif problem is not None: # the character I got in this position is not the correct type, throw an error
+            m = 'ERROR: the character in the {0} index of the date time string given in \'{1}\' is not the correct type.  It needs to be one of these characters [{2}]. Exiting.'.format(problem, field_name, DATETIME_STAMP_CHARS[len(dts_value)][problem])
+            self.IJWError(m, self.log_msgs, True) # (msg, log, exit)
         if ensure_in_past:
-            # make sure the date value is in the past
-            y = int(dts_value[0:4])
-            m = int(dts_value[5:7])
-            d = int(dts_value[8:10])
-            h = int(dts_value[11:13])
-            n = int(dts_value[14:16]) # n --> thinking m for minute, but it's already used so bumped it to 'n'
-            s = 0
-            if len(dts_value) == 20:
-                s = int(dts_value[17:19]) 
-            if datetime.datetime(y, m, d, h, n, s) > datetime.datetime.utcnow(): # throw error
+            # make sure the date value is in the past (compared with the reference time, self.now)
+            if datetime.datetime(*DateTimeStampFields(dts_value)) > self.now: # throw error
                 m = 'ERROR: the date time string given in \'{}\' is not in the past. Exiting.'.format(field_name)
                 self.IJWError(m, self.log_msgs, True) # (msg, log, exit)
         return True
@@ -2680,7 +3612,7 @@ class ConvertToJSON:
             # convert the value from a string to a float, if needed.
             try: value = float(value)
             except TypeError as ex:
-                print('TypeError Exception: {}'.format(ex))
+                self.print_function('TypeError Exception: {}'.format(ex))
 
 
         #print('type({}) is {}'.format(field_name, type(value)))
@@ -2791,6 +3723,9 @@ class ConvertToJSON:
         """2019.12.11, Per Leila, we do not want colons in filenames (bad for windows and macs, not great for linux). """
         # make sure there are no wacko characters/scripting hacks
         self.ValidateAlphaNumeric(v, 'sep_profile', allow_addtl_chars='-_.')
+        if self.profile_index is not None: # the profile file has to be next to the JSON file
+            m = self.profile_index.Check(os.path.dirname(os.path.abspath(self.output_filename)), v)
+            if m is not None: self.IJWError(m, self.log_msgs, True) # (msg, log, exit)
         return
     # end ValidateForecastSEPProfile
 
@@ -2905,7 +3840,7 @@ class ConvertToJSON:
         if isinstance(value, str):
             try: value = int(value)
             except TypeError as ex:
-                print('TypeError Exception: {}'.format(ex))
+                self.print_function('TypeError Exception: {}'.format(ex))
         # make sure value is > 10000.
         if value < 10000:
             m = 'ERROR: \'noaa_region\' has to include the leading 1 in the number.  Exiting.'
@@ -2978,7 +3913,7 @@ class ConvertToJSON:
         c_typeDict[0] = 'NS'
         c_typeDict[3] = 'EW'
         #for (k, v) in c_typeDict.items():
-        #    print("{} : {}".format(k, v))
+        #    self.print_function("{} : {}".format(k, v))
         if len(value) != 6: # ensure you have exactly the correct length of coordinates
             m = 'ERROR: the Stonyhurst coordinate string given in \'{}\' is the wrong length. Exiting.'.format(field_name)
             self.IJWError(m, self.log_msgs, True) # (msg, log, exit)
@@ -3029,9 +3964,9 @@ class ConvertToJSON:
         # if both values were given and both values are not None, then throw an error
         if key1 in local_dataDict.keys() and key2 in local_dataDict.keys():
             if local_dataDict[key1] != None and  local_dataDict[key2] != None:
-                print("===========================================================")
-                print("ERROR: cannot have non-None values for both {} and {}.".format(key1, key2))
-                sys.exit()
+                self.print_function("===========================================================")
+                self.print_function("ERROR: cannot have non-None values for both {} and {}.".format(key1, key2))
+                self.FailValidation("ERROR: cannot have non-None values for both {} and {}.".format(key1, key2), key1)
         return
     # end VerifyExclusive
         
@@ -3067,16 +4002,16 @@ class ConvertToJSON:
         """
         if local_dataDict == None: local_dataDict = self.dataDict
         #if not isinstance(local_dataDict, dict):
-        #    print("ERROR: expecting a dictionary.  Got something else in \'{}\'. Exiting.".format(key))
+        #    self.print_function("ERROR: expecting a dictionary.  Got something else in \'{}\'. Exiting.".format(key))
         #    sys.exit()
         keyexists = key in local_dataDict.keys()
         if required and not keyexists: # issue error
-            print("===========================================================")
-            print("ERROR: missing key \'{}\' in dictionary. Exiting.".format(key))
-            print("       dictionary does have the following keys:  ".format(key))
+            self.print_function("===========================================================")
+            self.print_function("ERROR: missing key \'{}\' in dictionary. Exiting.".format(key))
+            self.print_function("       dictionary does have the following keys:  ".format(key))
             for k in local_dataDict.keys():
-               print('       {}: {}'.format(k, local_dataDict[k]))
-            sys.exit()
+               self.print_function('       {}: {}'.format(k, local_dataDict[k]))
+            self.FailValidation("ERROR: missing key \'{}\' in dictionary. Exiting.".format(key), key)
         return keyexists
     # end VerifyKeyInDict
 
@@ -3097,34 +4032,374 @@ class ConvertToJSON:
             3) validate the data that is there.
 
         """
-        self.PrepModel()
-        self.PrepIssueTime()
-        self.PrepMode()
-        self.PrepTriggers()
-        self.PrepModelInputs()
-        self.PrepForecasts()
+        for prep in [self.PrepModel, self.PrepIssueTime, self.PrepMode, self.PrepTriggers, self.PrepModelInputs, self.PrepForecasts]:
+            self.Timed(prep.__name__, prep)
 
         # now for the actual writing
         d = {'sep_forecast_submission' : self.orderedDict}
-        with open(self.output_filename, 'w') as outfile:
-            json.dump(d, outfile)
-        print('\nPlease send the following file to the CCMC: {0}\n'.format(self.output_filename))
+        (encoder, gzip_file) = JSON_FORMATS[self.json_format]
+        self.json_bytes = self.Timed('serialize', encoder.encode, d).encode('utf-8')
+        if self.write_file:
+            content = self.json_bytes
+            if gzip_file:
+                import gzip
+                content = self.Timed('compress', functools.partial(gzip.compress, mtime=0), content) # mtime=0: the same JSON always gives the same file
+            if self.write_mode == 'if_changed' and self.Timed('compare', FileContentUnchanged, self.output_filename, content):
+                self.write_status = 'unchanged'
+                self.print_function('\nThe following file is unchanged, so it was not rewritten: {0}\n'.format(self.output_filename))
+            else:
+                self.Timed('write', WriteFileAtomically, self.output_filename, content, self.write_mode == 'if_changed')
+                self.write_status = 'written'
+                self.print_function('\nPlease send the following file to the CCMC: {0}\n'.format(self.output_filename))
 
         return 
 
 
+class SEPProfileIndex:
+    """ 
+    Description: Checks the sep_profile files forecasts reference (ConvertToJSON(profile_index=...)): the file has to be in
+        the directory of the JSON file, not be empty, and have parseable first and last time stamps (SEPProfileTimeRange).
+        Each directory is listed once (os.scandir), so the batch's lookups don't stat the files one by one, and each file
+        is only read once.  A file that isn't in the listing is looked for once more on disk, in case it was written since.
+
+    """
+
+    def __init__(self):
+        """ 
+        Input: self: (SEPProfileIndex object)
+        Output: (automatically returned) SEPProfileIndex object
+
+        """
+
+        self.directories = {} # directory -> {filename: size}
+        self.results = {} # (directory, filename) -> error message or None
+    # end __init__ from SEPProfileIndex class
+
+
+    def Check(self, directory, filename):
+        """ 
+        Input:
+            self:      (SEPProfileIndex object)
+            directory: (string) the directory the profile should be in
+            filename:  (string) the sep_profile filename
+        Output: (string|None) an error message, or None if the profile is fine
+
+        """
+
+        key = (directory, filename)
+        if key in self.results: return self.results[key]
+        entryD = self.Directory(directory)
+        size = entryD.get(filename)
+        if size is None and os.path.isfile(os.path.join(directory, filename)): # written after the directory was listed
+            size = entryD[filename] = os.path.getsize(os.path.join(directory, filename))
+        m = None
+        if size is None:
+            m = 'ERROR: the sep_profile file \'{}\' is not in \'{}\' (it has to be next to the JSON file). Exiting.'.format(filename, directory)
+        elif size == 0:
+            m = 'ERROR: the sep_profile file \'{}\' is empty. Exiting.'.format(os.path.join(directory, filename))
+        else:
+            try:
+                (first, last) = SEPProfileTimeRange(os.path.join(directory, filename))
+                if last < first: m = 'ERROR: the sep_profile file \'{}\' ends ({}) before it starts ({}). Exiting.'.format(os.path.join(directory, filename), last, first)
+            except (OSError, ValueError) as e:
+                m = 'ERROR: the sep_profile file \'{}\' could not be read: {}. Exiting.'.format(os.path.join(directory, filename), e)
+        self.results[key] = m
+        return m
+    # end Check
+
+
+    def Directory(self, directory):
+        """ 
+        Input:
+            self:      (SEPProfileIndex object)
+            directory: (string) a directory
+        Output: (dictionary) filename -> size of the files in the directory (empty if there is no such directory)
+        Description: List the directory the first time it comes up.
+
+        """
+
+        entryD = self.directories.get(directory)
+        if entryD is None:
+            entryD = self.directories[directory] = {}
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_file(): entryD[entry.name] = entry.stat().st_size
+            except OSError:
+                pass
+        return entryD
+    # end Directory
+# end SEPProfileIndex
+
+
+class SEPValidationError(Exception):
+    """ 
+    Description: Raised when a submission fails validation and on_error is 'raise' or 'collect' (see FailValidation).
+        message is the same message sep_json_writer prints; field_name and output_filename are filled in when known.
+
+    """
+
+    def __init__(self, message, field_name=None, output_filename=None):
+        """ 
+        Input:
+            self:            (SEPValidationError object)
+            message:         (string) the error message
+            field_name:      (string|None) the field that failed validation
+            output_filename: (string|None) the JSON file the submission was going to be written to
+        Output: (automatically returned) SEPValidationError object
+
+        """
+
+        Exception.__init__(self, message)
+        self.message = message
+        self.field_name = field_name
+        self.output_filename = output_filename
+    # end __init__ from SEPValidationError class
+
+
+    def AsDict(self):
+        """ 
+        Input: self: (SEPValidationError object)
+        Output: (dictionary) the error's 'message', 'field_name' and 'output_filename'
+        Description: Structured form of the error, for reports.
+
+        """
+
+        return {'message':self.message, 'field_name':self.field_name, 'output_filename':self.output_filename}
+    # end AsDict
+# end SEPValidationError
+
+
+class StageTimer:
+    """ 
+    Description: Wall time, CPU time and call counts for the conversion stages and field validators.  Pass one to 
+        ConvertToJSON, ConvertDataDicts or ConvertBatch (timer=...) to add up the timings of every submission they convert.
+        The stages are 'WriteJSON' (everything), its Prep* steps, 'serialize' (json.dumps), 'compare' (write_mode='if_changed')
+        and 'write'; each field validator is named 'validate <field name>'.  The Prep* times include their validators.
+        CPU time is process CPU time, so the timings are only meaningful when one conversion runs at a time per process.
+
+    """
+
+    def __init__(self):
+        """ 
+        Input: self: (StageTimer object)
+        Output: (automatically returned) StageTimer object
+
+        """
+
+        self.stats = collections.OrderedDict() # name -> [calls, wall seconds, cpu seconds]
+    # end __init__ from StageTimer class
+
+
+    def AsDict(self):
+        """ 
+        Input: self: (StageTimer object)
+        Output: (ordered dictionary) name -> {'calls', 'wall', 'cpu'} (seconds)
+        Description: Plain form of the timings, for JSON and for sending them back from worker processes.
+
+        """
+
+        return collections.OrderedDict([(name, {'calls':c, 'wall':w, 'cpu':p}) for (name, (c, w, p)) in self.stats.items()])
+    # end AsDict
+
+
+    def Merge(self, timingD):
+        """ 
+        Input:
+            self:    (StageTimer object)
+            timingD: (dictionary) timings from AsDict (e.g., from a worker process)
+        Output: None
+        Description: Add another timer's timings to this one.
+
+        """
+
+        for (name, t) in timingD.items():
+            stat = self.stats.setdefault(name, [0, 0.0, 0.0])
+            stat[0] += t['calls']
+            stat[1] += t['wall']
+            stat[2] += t['cpu']
+        return
+    # end Merge
+
+
+    def Summary(self, max_validators=None):
+        """ 
+        Input:
+            self:           (StageTimer object)
+            max_validators: (integer|None) only list this many validators (the slowest ones).  None lists them all.
+        Output: (string) a table of the timings: the stages first, then the validators, slowest first
+        Description: Human readable form of the timings.
+
+        """
+
+        stageL = [name for name in self.stats if not name.startswith('validate ')]
+        validatorL = sorted([name for name in self.stats if name.startswith('validate ')], key=lambda name: -self.stats[name][1])
+        if max_validators is not None: validatorL = validatorL[:max_validators]
+        width = max([len(name) for name in stageL + validatorL] + [len('stage/validator')])
+        lineL = ['{:<{}} {:>9} {:>12} {:>12} {:>14}'.format('stage/validator', width, 'calls', 'wall (s)', 'cpu (s)', 'wall/call (us)')]
+        for name in stageL + validatorL:
+            (c, w, p) = self.stats[name]
+            lineL.append('{:<{}} {:>9d} {:>12.6f} {:>12.6f} {:>14.1f}'.format(name, width, c, w, p, w / c * 1e6 if c else 0.0))
+        return '\n'.join(lineL)
+    # end Summary
+
+
+    def Time(self, name, func, *args):
+        """ 
+        Input:
+            self: (StageTimer object)
+            name: (string) stage or validator name
+            func: (function) what to run
+            args: func's arguments
+        Output: whatever func returns
+        Description: Run func(*args) and add its wall time, CPU time and call to name's timings, even if it fails.
+
+        """
+
+        (w0, p0) = (time.perf_counter(), time.process_time())
+        try:
+            return func(*args)
+        finally:
+            stat = self.stats.get(name)
+            if stat is None: stat = self.stats[name] = [0, 0.0, 0.0]
+            stat[0] += 1
+            stat[1] += time.perf_counter() - w0
+            stat[2] += time.process_time() - p0
+    # end Time
+# end StageTimer
+
+
+class SubmissionHashIndex:
+    """ 
+    Description: The submissions already converted, so a re-run (e.g., over overlapping months) can skip them.  A SQLite 
+        index of submission hash (see SubmissionHash) -> output file, with the file's size and modification time when it 
+        was written.  An entry only counts while the file still has that size and modification time, so a file that was 
+        deleted or changed since is converted again.  The index is kept out of the output directories (they are what 
+        gets sent on), by default in the log directory.
+
+    """
+
+    def __init__(self, filename):
+        """ 
+        Input:
+            self:     (SubmissionHashIndex object)
+            filename: (string) the SQLite index file.  It is created (when it is first needed) if it isn't there.
+        Output: (automatically returned) SubmissionHashIndex object
+
+        """
+
+        self.filename = filename
+        self.connection = None
+    # end __init__ from SubmissionHashIndex class
+
+
+    def Close(self):
+        """ 
+        Input: self: (SubmissionHashIndex object)
+        Output: None
+        Description: Commit the new entries and close the index file.
+
+        """
+
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+        self.connection = None
+        return
+    # end Close
+
+
+    def Connection(self):
+        """ 
+        Input: self: (SubmissionHashIndex object)
+        Output: the sqlite3 connection to the index
+        Description: Open (and create, if needed) the index the first time it is used.
+
+        """
+
+        if self.connection is None:
+            import sqlite3
+            directory = os.path.dirname(os.path.abspath(self.filename))
+            if not os.path.isdir(directory): os.makedirs(directory)
+            self.connection = sqlite3.connect(self.filename, timeout=60)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS submission_hashes (submission_hash TEXT PRIMARY KEY, output_filename TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL)')
+        return self.connection
+    # end Connection
+
+
+    def Lookup(self, submission_hash):
+        """ 
+        Input:
+            self:            (SubmissionHashIndex object)
+            submission_hash: (string) see SubmissionHash (the output filename the submission was given is part of it)
+        Output: (string|None) the output file an earlier run wrote the submission to, if it is still there unchanged
+        Description: Look a submission up in the index.
+
+        """
+
+        row = self.Connection().execute('SELECT output_filename, size, mtime_ns FROM submission_hashes WHERE submission_hash = ?', (submission_hash,)).fetchone()
+        if row is None: return None
+        (filename, size, mtime_ns) = row
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        if (st.st_size, st.st_mtime_ns) != (size, mtime_ns): return None
+        return filename
+    # end Lookup
+
+
+    def Record(self, submission_hash, output_filename):
+        """ 
+        Input:
+            self:            (SubmissionHashIndex object)
+            submission_hash: (string) see SubmissionHash
+            output_filename: (string) the file the submission was written to
+        Output: None
+        Description: Remember that the submission is in output_filename (as it is now).
+
+        """
+
+        st = os.stat(output_filename)
+        self.Connection().execute('INSERT OR REPLACE INTO submission_hashes VALUES (?, ?, ?, ?)', (submission_hash, output_filename, st.st_size, st.st_mtime_ns))
+        return
+    # end Record
+# end SubmissionHashIndex
+
+
 #### END of CLASSES #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
 
 	
 #### MAIN #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
 if __name__ == '__main__':
 
-    noneList = [None, 'None', 'none', ['none'], ['None'], [None]] # NOTE: 0 is not included because it is valid/needed in many fields
     program_desc = "This program is supposed to help the modeler to provide their model data in to the CCMC in JSON format.  Contact Joycelyn Jones at joycelyn.t.jones@nasa.gov for additional assistance."
     parser = InitParser(program_desc)
+    args = parser.parse_args()
+    timer = StageTimer() if (args.timing or args.timing_json is not None) else None
+    def ReportTiming(outfile=sys.stdout):
+        if timer is None: return
+        print(timer.Summary(), file=outfile)
+        if args.timing_json is not None:
+            WriteFileAtomically(args.timing_json, json.dumps(timer.AsDict(), indent=1).encode('utf-8'))
+    if args.batch_manifest is not None:
+        reportL = ConvertBatch(args.batch_manifest, args.workers, args.output_dir, args.log_msgs, args.log_dir, args.log_starter, args.write_mode, args.batch_report, args.columns_db, timer, dedupe=args.dedupe, check_profiles=args.check_profiles, group=args.group, json_format=args.json_format, hash_index=args.hash_index)
+        ReportTiming()
+        sys.exit(0 if all([r['status'] == 'ok' for r in reportL]) else 1)
+    if args.serve is not None:
+        ServeConversions(args.serve, args.workers, args.output_dir, args.log_msgs, args.log_dir, args.log_starter, args.write_mode, args.columns_db, timer, args.check_profiles, args.json_format)
+        ReportTiming(sys.stderr)
+        sys.exit(0)
+    if args.stream is not None:
+        with (contextlib.nullcontext(sys.stdin) if args.stream == '-' else open(args.stream)) as infile:
+            (n_ok, n_failed) = ConvertStream(infile, sys.stdout, args.output_dir, args.log_msgs, args.log_dir, args.log_starter, args.write_mode, args.columns_db, timer, args.check_profiles, args.json_format)
+        print('{} submission(s) converted, {} failed.'.format(n_ok, n_failed), file=sys.stderr)
+        ReportTiming(sys.stderr)
+        sys.exit(0 if n_failed == 0 else 1)
     (output_filename, output_dir, log_msgs, log_dir, log_starter, dataDict) = ParseArguments(parser)
 
-    ConvertToJSON(dataDict, output_filename, output_dir, log_msgs, log_dir, log_starter)
+    ConvertToJSON(dataDict, output_filename, output_dir, log_msgs, log_dir, log_starter, write_mode=args.write_mode, columns_db=args.columns_db, timer=timer, profile_index=SEPProfileIndex() if args.check_profiles else None, json_format=args.json_format)
+    ReportTiming()
 
 
 #### END of MAIN ## #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
@@ -3163,6 +4438,49 @@ if __name__ == '__main__':
 # 2022.08.29,JTJones: Added a new InitLogger.  The original InitLogger was renamed to InitLoggerOld
 # 2022.12.08,JTJones: <PLANNED> The keep numerical values (floats, integers) from being put in quotation marks.
 # 2025.01.19,LAStegeman: Added human_evaluation trigger.
+# 2026.10.17,LAStegeman: Added ConvertDataDicts, an in-process batch entry point that takes submission dictionaries (no argparse).
+#                        ConvertToJSON can keep the JSON in memory (write_file=False); the JSON is always in self.json_bytes.
+# 2026.10.17,LAStegeman: Moved the Prep* field tables into FIELD_TABLES, compiled once at module load (CompileFieldValidator).
+#                        noneList is now defined at module level (it was only defined under __main__).
+# 2026.10.17,LAStegeman: JSON files are written atomically (temp file + os.replace).  write_mode='if_changed' skips
+#                        files that already hold the same JSON (and fsyncs the ones it writes); ConvertDataDicts reports
+#                        written vs unchanged counts.
+# 2026.10.17,LAStegeman: Added --batch (JSON Lines manifest), --workers and --batch-report: ConvertBatch converts the
+#                        submissions across a process pool, in manifest order, with a per-submission report.
+# 2026.10.17,LAStegeman: Logging goes through one shared QueueHandler/QueueListener per process and log file 
+#                        (GetSharedLogger); ConvertToJSON tags its records with the output filename.  Fixed ThrowArgError,
+#                        which used the (logger, handler) tuple returned by InitLogger as a logger.
+# 2026.10.17,LAStegeman: Added on_error ('exit', 'raise', 'collect') and SEPValidationError.  Every validation failure
+#                        goes through FailValidation, so batch drivers can skip bad submissions instead of exiting.
+# 2026.10.17,LAStegeman: Added columns_db/--columns-db: a columnar SQLite 'submissions' table (model, issue time, energy 
+#                        channel, prediction window, probability, all clear) next to the JSON files.
+# 2026.10.17,LAStegeman: Added StageTimer and --timing/--timing-json: optional wall/CPU time and call counts per WriteJSON
+#                        stage and per field validator, added up across a batch (the workers send theirs back).
+# 2026.10.17,LAStegeman: Date time stamp format checks and parsing are cached (DateTimeStampProblem, DateTimeStampFields).
+#                        The 'in the past' checks compare with self.now, which ConvertDataDicts and ConvertBatch set
+#                        once per batch (now=...), instead of calling utcnow() for every field.
+# 2026.10.17,LAStegeman: Added --stream (ConvertStream): convert JSON Lines submissions from a file or stdin in one
+#                        long-lived process, with one JSON result line per submission on stdout.
+# 2026.10.17,LAStegeman: Added --serve (ServeConversions): a conversion service on a Unix domain socket or localhost port
+#                        that converts POSTed submissions in a pool of worker processes and replies with the JSON or the errors.
+# 2026.10.17,LAStegeman: Added dedupe (ConvertDataDicts, ConvertBatch, --dedupe): repeated submissions (SubmissionHash) are
+#                        skipped, within a batch and across runs (SubmissionHashIndex, kept in the log directory or
+#                        --hash-index, not in the output directories).
+# 2026.10.17,LAStegeman: ConvertToJSON builds the validated submission out of plain (insertion ordered) dicts instead of
+#                        OrderedDicts, and the field validators intern the repeated vocabulary strings (INTERNED_FIELDS).
+# 2026.10.17,LAStegeman: Added --check-profiles (SEPProfileIndex): the sep_profile files have to be next to the JSON file, 
+#                        not empty, with readable first/last time stamps.  Directories are listed once per batch.
+# 2026.10.17,LAStegeman: Faster start up: the slow-to-import modules (http.server, argparse, ...) are imported where they 
+#                        are used, and argsL is a module constant.  bench_sep_json_writer.py --startup-budget checks it.
+# 2026.10.17,LAStegeman: Added GroupSubmissions and --group (with --batch, and group= in ConvertDataDicts): submissions that 
+#                        only differ in their forecasts (e.g., one per energy channel) become one multi-forecast submission,
+#                        written in the directory the submissions' output filenames have in common.
+# 2026.10.17,LAStegeman: Added --json-format (JSON_FORMATS): 'compact' (no whitespace) and 'compact.gz' (also gzipped) output.
+#                        The numeric fields were already written as numbers (see 2022.12.08); 'default' output is unchanged.
+# 2026.10.17,LAStegeman: Added CheckForecastCrossFields: the cross-field rules (CROSS_FIELD_RULES) checked with NumPy arrays 
+#                        for a whole batch of forecasts at once, reporting the indices of the forecasts that break them.
+# 2026.10.17,LAStegeman: ConvertToJSON can run in several threads at once: print_function and logger can be passed in, the shared 
+#                        loggers are made under a lock, and WriteFileAtomically's temporary file names include the thread.
 #
 #### END OF MODIFICATIONS  ## #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### #### ####
 
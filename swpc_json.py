@@ -14,6 +14,12 @@ parser = argparse.ArgumentParser(
 parser.add_argument('yearmonth', nargs='?', default=current_yearmonth(),
                     help='month in YYYY/MM format')
 parser.add_argument('--all', action='store_true')
+parser.add_argument('--columns-db', default=None,
+                    help='also put the submissions in this columnar SQLite file')
+parser.add_argument('--workers', type=int, default=None,
+                    help='parse the forecast files with this many worker processes')
+parser.add_argument('--no-parse-cache', action='store_true',
+                    help='parse every forecast file again instead of only the new or changed ones')
 args = parser.parse_args()
 # TODO: implemnt --clobber argument, default is not to clobber
 
@@ -34,31 +40,26 @@ dbo = None
 verbose = True
 logger = logging.getLogger()
 lfh = None
-cfg = dict(archive_dir=model_info.model_root['SWPC'])
+cfg = dict(archive_dir=model_info.model_root['SWPC'], reload_all=args.all)
+if not args.no_parse_cache:
+    cfg['parse_cache'] = os.path.join(cfg['archive_dir'], swpc_proton.RSGA_PARSE_CACHE_FILENAME)
 p = swpc_proton.Proton(start, end, mode, dbo, verbose, logger, lfh, cfg)
-forecasts = p.ParseAll(datefilter=(not args.all))
+forecasts = p.ParseAll(datefilter=(not args.all), workers=args.workers)
+for filepath, error in p.parse_failures.items():
+    print('NOT PARSED', filepath, '-', error)
 
-# Constant list of JSON data for this type of forecast
+# Constant JSON data for this type of forecast
 all_clear_probability_threshold = 0.01
-json_args = ['--model-short-name', 'SWPC Day 1',
-             '--spase-id', 'spase://CCMC/SimulationModel/SWPC/v20090103',
-             '--mode', 'forecast', 
-             '--energy-min', '10',
-             '--energy-max', '-1',
-             '--energy-units', 'MeV',
-             '--species', 'proton',
-             '--location', 'earth',
-             '--prob-thresholds', '10',
-             '--prob-threshold-units', 'pfu',
-             '--all-clear-threshold', '10', 
-             '--all-clear-threshold-units', 'pfu',
-             '--all-clear-probability-threshold', str(all_clear_probability_threshold)
-]
+json_model = {'short_name': 'SWPC Day 1',
+              'spase_id': 'spase://CCMC/SimulationModel/SWPC/v20090103'}
+json_mode = 'forecast'
+json_energy_channel = {'min': 10.0, 'max': -1.0, 'units': 'MeV'}
+json_threshold = 10.0
+json_threshold_units = 'pfu'
 
 # To fill: issue_time, prediction_window, probabilities, all_clear
-program_desc = "Convert directory of SWPC RSGA.txt files to CCMC JSON"
-json_parser = sep_json_writer.InitParser(program_desc)
-
+data_dicts = []
+output_filenames = []
 for filepath, (issue, day1, day2, day3) in forecasts.items():
     filedir, filename = os.path.split(filepath)
     # The Day-1 prediction window begins at 00:00 UTC on the 
@@ -71,17 +72,27 @@ for filepath, (issue, day1, day2, day3) in forecasts.items():
     # Evaluate all clear boolean
     all_clear = day1 <= all_clear_probability_threshold
 
-    # Make the JSON by calling sep_json_writer and providing a list of 
-    # command-line arguments. Merge constant arguments from list above with
-    # the forecast-specific arguments we iterate through here
+    # Build the submission dictionary sep_json_writer would have built
+    # from command-line arguments. Merge constant data from above with
+    # the forecast-specific data we iterate through here
     print('===')
     print('Making JSON from', filename)
-    useargs = [*json_args,
-               '--output', filepath.replace('.txt', '.json'),
-               '--issue-time', issue.isoformat()+'Z',
-               '--prediction-window', window[0].isoformat()+'Z',
-                                      window[1].isoformat()+'Z',
-               '--probabilities', str(day1),
-               '--all-clear', str(all_clear).lower()]
-    (output_filename, output_dir, log_msgs, log_dir, log_starter, dataDict) = sep_json_writer.ParseArguments(json_parser, useargs)
-    sep_json_writer.ConvertToJSON(dataDict, output_filename, output_dir, log_msgs, log_dir, log_starter)
+    forecast = {'energy_channel': dict(json_energy_channel),
+                'species': 'proton',
+                'location': 'earth',
+                'prediction_window': {'start_time': window[0].isoformat()+'Z',
+                                      'end_time': window[1].isoformat()+'Z'},
+                'probabilities': [{'probability_value': day1,
+                                   'threshold': json_threshold,
+                                   'threshold_units': json_threshold_units}],
+                'all_clear': {'all_clear_boolean': all_clear,
+                              'threshold': json_threshold,
+                              'threshold_units': json_threshold_units,
+                              'probability_threshold': all_clear_probability_threshold}}
+    data_dicts.append({'model': dict(json_model),
+                       'issue_time': issue.isoformat()+'Z',
+                       'mode': json_mode,
+                       'forecasts': [forecast]})
+    output_filenames.append(filepath.replace('.txt', '.json'))
+
+sep_json_writer.ConvertDataDicts(data_dicts, output_filenames, write_mode='if_changed', columns_db=args.columns_db, dedupe=True, group=True) # re-runs skip forecasts they already converted; forecasts issued together share a file
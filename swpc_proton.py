@@ -4,12 +4,142 @@ import datetime
 import glob
 import re
 import collections
+import itertools
+import ftplib
+import threading
+import time
+
+# One pattern for everything ParseRSGAFiles needs from a buffer of RSGA files:
+# the file markers it puts in front of each file, the ':Issued:' lines and the 'Proton' lines
+RSGA_PATTERN = re.compile(r'^(?:\x00(\d+)'
+                          r'|[ \t]*:Issued:[ \t]*(\d{4})[ \t]+([A-Za-z]{3})[ \t]+(\d{1,2})[ \t]+(\d{1,4})\b'
+                          r'|[ \t]*(?:Proton|PROTON)[ \t]+(\d+)/(\d+)/(\d+)[ \t\r]*$)', re.M)
+# ParseRSGAFiles' structured array: one record per file that has both an issue time and proton probabilities
+RSGA_DTYPE = [('issue_time', 'datetime64[m]'), ('day1', 'float32'), ('day2', 'float32'), ('day3', 'float32'),
+              ('path_index', 'int32')]
+# The date in the name of an archived RSGA file: RSGA/YYYY/MM/YYYYMMDDRSGA.txt (and the older RSGA/YYYY/noaa.swpc.rsga.10mev.YYYYMMDD.txt)
+RSGA_FILENAME_PATTERN = re.compile(r'(\d{4})(\d{2})(\d{2})(?:RSGA)?\.txt$')
+# cfg['parse_cache'] names the SQLite file ParseAll keeps parsed files in; this is the usual name (in the archive_dir)
+RSGA_PARSE_CACHE_FILENAME = 'rsga_parse_cache.sqlite'
+poolParser = None # the Proton object a ParseAll worker process parses with (see InitParsePool)
+
+def ArchiveDate(filepath):
+    """
+    Input: filepath: (string) an archived RSGA file
+    Output: (datetime object|None) midnight of the day in the file name (None if the name has no valid date)
+
+    """
+    match = RSGA_FILENAME_PATTERN.search(os.path.basename(filepath))
+    if match is None: return None
+    try:
+        return datetime.datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+# end ArchiveDate
+
+
+def ArchivePath(archive_dir, date):
+    """
+    Input:
+        archive_dir: (string) the data archive (cfg['archive_dir'])
+        date:        (datetime or date object) the day the RSGA file is for
+    Output: (string) where Download puts the RSGA file for that day and Reload looks for it:
+        <archive_dir>/RSGA/YYYY/MM/YYYYMMDDRSGA.txt
+
+    """
+    return os.path.join(archive_dir, 'RSGA', f'{date.year:04d}', f'{date.month:02d}', f'{date.year:04d}{date.month:02d}{date.day:02d}RSGA.txt')
+# end ArchivePath
+
 
 def CreateMonToIntDict():
     return dict(zip(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
                      'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'],
                     [x for x in range(1, 12+1)]))
-                     
+
+
+def InitParsePool(parser):
+    """
+    Input: parser: (object) the Proton object ParseAll fans out from
+    Output: None
+    Description: Runs once in each ParseAll worker process, so the parser is sent to each worker once
+        instead of with every chunk of files (see ParseFilesInPool).
+
+    """
+    global poolParser
+    poolParser = parser
+# end InitParsePool
+
+
+def ParseFilesInPool(filepaths):
+    """
+    Input: filepaths: (list) a chunk of RSGA file paths
+    Output: (list) see Proton.ParseFiles
+    Description: Parse a chunk of files in a ParseAll worker process.
+
+    """
+    return poolParser.ParseFiles(filepaths)
+# end ParseFilesInPool
+
+
+def ParseRSGAFiles(filepaths):
+    """
+    Input:
+        filepaths: (list) full paths to RSGA files
+    Output: a NumPy structured array (RSGA_DTYPE) with one record per file that has an issue time and
+        proton probabilities: issue_time (datetime64), day1, day2, day3 (probabilities, 0-1, float32)
+        and path_index (the file's index in filepaths).  Files that can't be read or parsed are left out.
+    Description:
+        Bulk version of Proton.ParseDataFile for reprocessing many files at once.  The files are read into
+        one buffer (each one after a marker line holding its index), a single compiled multi-line regex
+        (RSGA_PATTERN) finds every marker, ':Issued:' and 'Proton' line in it, and the issue times and
+        probabilities are then converted as whole columns.  As in ParseDataFile, the last ':Issued:' and
+        'Proton' lines of a file count.  Requires numpy.
+
+    """
+    import numpy as np
+
+    parts = []
+    for (i, f) in enumerate(filepaths):
+        try:
+            with open(f, errors='replace') as ifh: text = ifh.read()
+        except OSError:
+            continue
+        parts.append('\x00{}\n'.format(i))
+        parts.append(text if text.endswith('\n') else text + '\n')
+    rows = np.array(RSGA_PATTERN.findall(''.join(parts)), dtype=str).reshape(-1, 8)
+
+    # which file each line is from: the index of the last marker before it
+    file_index = np.maximum.accumulate(np.where(rows[:, 0] != '', rows[:, 0], '-1').astype(np.int64)) if len(rows) else np.zeros(0, dtype=np.int64)
+    def LastLines(is_kind):
+        # the last line of each file that is_kind selects, and that file's index
+        lines = np.flatnonzero(is_kind)
+        lines = lines[np.append(file_index[lines][1:] != file_index[lines][:-1], True)] if len(lines) else lines
+        return (lines, file_index[lines])
+    (issued, issued_files) = LastLines(rows[:, 1] != '')
+    (proton, proton_files) = LastLines(rows[:, 5] != '')
+
+    # issue times, 'YYYY Mon DD HHMM'
+    mon2IntD = CreateMonToIntDict()
+    year = rows[issued, 1].astype(np.int64)
+    month = np.array([mon2IntD.get(m, 0) for m in rows[issued, 2]], dtype=np.int64)
+    day = rows[issued, 3].astype(np.int64)
+    (hour, minute) = np.divmod(rows[issued, 4].astype(np.int64), 100)
+    month_start = (year - 1970).astype('datetime64[Y]') + (np.maximum(month, 1) - 1).astype('timedelta64[M]')
+    month_days = ((month_start + np.timedelta64(1, 'M')).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    valid = (month >= 1) & (day >= 1) & (day <= month_days) & (hour < 24) & (minute < 60)
+    issue_time = (month_start.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')).astype('datetime64[m]') + (hour*60 + minute).astype('timedelta64[m]')
+    (issued, issued_files, issue_time) = (issued[valid], issued_files[valid], issue_time[valid])
+
+    # files with both
+    (path_index, i, j) = np.intersect1d(issued_files, proton_files, assume_unique=True, return_indices=True)
+    records = np.zeros(len(path_index), dtype=RSGA_DTYPE)
+    records['issue_time'] = issue_time[i]
+    probabilities = rows[proton[j], 5:8].astype(np.float32) / np.float32(100.)
+    (records['day1'], records['day2'], records['day3']) = (probabilities[:, 0], probabilities[:, 1], probabilities[:, 2])
+    records['path_index'] = path_index
+    return records
+# end ParseRSGAFiles
+
 
 class DataFormat():
     def __init__(self, start, end, dbo, verbose, logger, lfh, cfg):
@@ -37,6 +167,19 @@ class DataFormat():
     # end DataFormat.__init__
 
 
+    def __getstate__(self):
+        """
+        Input: self: (object) this DataFormat object
+        Output: (dictionary) what a copy of this object sent to a worker process (see Proton.ParseAll) holds
+        Description: The database connection and the log file handle stay in this process.
+
+        """
+        state = self.__dict__.copy()
+        state['dbo'] = state['lfh'] = None
+        return state
+    # end DataFormat.__getstate__
+
+
     def AlreadyInDatabase(self, f):
         """
         Input:
@@ -156,12 +299,13 @@ class DataFormat():
     # end DataFormat.GetForecastID
 
 
-    def GetFTPConnection(self, ftp_domain):
+    def GetFTPConnection(self, ftp_domain, port=21):
         """
         Input: 
             self:       (object) this DataFormat object
             ftp_domain: (string) the domain name for the FTP server
-        Output: FTP object that holds a connection to the FTP server
+            port:       (integer) the FTP server's port
+        Output: FTP object that holds a connection to the FTP server (not logged in yet)
         Description:
              Try getting an FTP connection
              NOTE: Added 10 retries because connecting to the SWPC FTP server tends to fail a lot due to a maximum number of connections.
@@ -178,11 +322,10 @@ class DataFormat():
         while count <= 10 and ftp == None:
             try:
                 count += 1
-                ftp = FTP(ftp_domain) # connect to host, default port
+                ftp = ftplib.FTP(timeout=60)
+                ftp.connect(ftp_domain, port)
             except ftplib.all_errors:
-                self.logger.critical('SWPC FTP Server is refusing the connection.')
-                self.ExitGracefully()
-            except:
+                ftp = None
                 if count < 10:
                     self.logger.debug('Cannot connect to the SWPC FTP server.  Will try again in a few seconds.')
                     time.sleep(2)
@@ -514,6 +657,9 @@ class Proton(DataFormat):
         self.output_directory_template = os.path.join(self.cfg['archive_dir'], '{}')
         self.output_file_full_path_template = os.path.join(self.output_directory_template, self.output_file_template)
         self.downloaded_files = list()
+        self.archive_index = collections.OrderedDict() # date (midnight) -> the RSGA file for that day (see Reload)
+        self.listed_prefixes = [] # the path prefixes Reload listed every file under ...
+        self.listed_files = set() # ... and the files it found there (see ReadParseCache)
         self.got_good_files = False
 
         if mode == 'download': self.Download()
@@ -532,73 +678,140 @@ class Proton(DataFormat):
         Input: self: (object) this Proton object
         Output: None
         Description:
-            Download the three-day RSGA forecast file(s) from SWPC's FTP site.
+            Download the three-day RSGA forecast file(s) from SWPC's FTP site, for the days from start to end.
             The URL used is ftp://ftp.swpc.noaa.gov/pub/warehouse/2019/RSGA/
             NOTE: You can download historical data from this location as well, going back to 2018.01.01.  
+
+            Each year's RSGA directory is listed once (NLST) and only the files that are on the server but not in
+            the local archive yet are fetched, over cfg['ftp_connections'] (default 4) connections at once (see 
+            DownloadFile, which cfg['ftp_tries'] and cfg['ftp_backoff'] are passed to).  cfg['ftp_host'] and 
+            cfg['ftp_port'] point it at another FTP server (e.g. a local copy).
+            All the files for those days that are in the archive afterwards go in self.downloaded_files.
     
         """
 
         self.logger.debug('[DS#4/Proton] Entered Download.')
 
         # Initializing needed variables
-        ftp_domain = 'ftp.swpc.noaa.gov'
-        curr_year = None
-        ftp = None
-        count = 0
-
-        ftp = self.GetFTPConnection(ftp_domain)
+        ftp_domain = self.cfg.get('ftp_host', 'ftp.swpc.noaa.gov')
+        ftp_port = self.cfg.get('ftp_port', 21)
+        days = collections.OrderedDict() # year -> the days in [start, end] (inclusive) in that year
+        d = first_day = datetime.datetime(self.start_date.year, self.start_date.month, self.start_date.day)
+        while d <= self.end_date:
+            days.setdefault(d.year, []).append(d)
+            d += datetime.timedelta(days=1)
+        after_last_day = d
+        (archive_index, _, _) = self.IndexArchive(first_day, after_last_day) # the files already in the archive, in either layout
+
+        ftp = self.GetFTPConnection(ftp_domain, ftp_port)
         self.logger.debug('[DS#4/Proton] Got a connection to the FTP server.')
 
         # Now that you have the FTP connection, log in anonymously
         ftp.login()               # user anonymous, passwd anonymous@
         self.logger.debug('[DS#4/Proton] Logged in to the FTP server.')
 
-        # Loop through all the days you need to get the forecast for and download the forecast
-        for d in DateRange(self.start_date, self.end_date+datetime.timedelta(days=1)): # Adding a day because DateRange does not include the ending date given
+        # List each year's directory on the FTP server once and work out which files are missing from the archive
+        fetches = [] # (remote path, local path) of each file to download
+        for (year, year_days) in days.items():
+            file_path = '/pub/warehouse/{0}/RSGA/'.format(year)
+            try:
+                on_server = set(name.rsplit('/', 1)[-1] for name in ftp.nlst(file_path))
+            except ftplib.all_errors as e:
+                self.logger.warning(f'[DS#4/Proton] Failed at listing SWPC directory {file_path}: {e}')
+                on_server = set()
+            for d in year_days:
+                f_in = '{0}{1:02d}{2:02d}RSGA.txt'.format(d.year, d.month, d.day) # example: '20190609RSGA.txt'
+                f_out_full_path = ArchivePath(self.cfg['archive_dir'], d) # example: '<archive_dir>/RSGA/2019/06/20190609RSGA.txt'
+                if d in archive_index and os.stat(archive_index[d]).st_size > 0:
+                    continue
+                if f_in not in on_server:
+                    # Do NOT e-mail anyone because this is going to happen EVERY time the new file is slightly late, which is frequently.
+                    self.logger.warning(f'[DS#4/Proton] SWPC file {f_in} is not on the FTP site (yet)')
+                    continue
+                fetches.append((file_path + f_in, f_out_full_path))
+        ftp.quit()
+        self.logger.info(f'[DS#4/Proton] Downloading {len(fetches)} SWPC 3-Day Forecast RSGA files from the FTP site.')
+
+        # Fetch the missing files; each thread reuses its own FTP connection
+        if fetches:
+            import concurrent.futures
+            session = threading.local()
+            connections = []
+            def Fetch(fetch):
+                return self.DownloadFile(session, connections, ftp_domain, ftp_port, *fetch, tries=self.cfg.get('ftp_tries', 5), 
+                                         backoff=self.cfg.get('ftp_backoff', 2.))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.cfg.get('ftp_connections', 4)) as executor:
+                fetched = list(executor.map(Fetch, fetches))
+            for connection in connections:
+                try: connection.quit()
+                except ftplib.all_errors: connection.close()
+            self.logger.info(f'[DS#4/Proton] Successfully downloaded {sum(fetched)} of {len(fetches)} SWPC 3-Day Forecast RSGA files from FTP site.')
+
+        # Put all the files for those days that are in the archive now in the list of files to be ingested into the database
+        (self.archive_index, _, _) = self.IndexArchive(first_day, after_last_day)
+        self.downloaded_files = list(self.archive_index.values())
 
-            # change the directory you are in on the FTP server, based on the year value for the data you are trying to download.
-            if curr_year != d.year:
-                curr_year = d.year
-                file_path = '/pub/warehouse/{0}/RSGA/'.format(curr_year) 
-                ftp.cwd(file_path)        # change directory
+        self.logger.debug('[DS#4/Proton] Exiting Download.')
+        return
+    # end Proton.Download
 
-                # Make sure the output directory exists
-                f_out_dir = os.path.join(self.cfg['archive_dir'], 'RSGA', str(d.year))
-                if not os.path.exists(f_out_dir): os.mkdir(f_out_dir)
 
-            # Format the input and output filenames/paths
-            date_ = '{0}{1:02d}{2:02d}'.format(d.year, d.month, d.day) # example: '20190609'
-            f_in = '{0}RSGA.txt'.format(date_) # example: '20190609RSGA.txt'
-            f_out = 'noaa.swpc.rsga.10mev.{0}.txt'.format(date_) # example: 'noaa.swpc.rsga.10mev.20190609.txt'
-            f_out_full_path = os.path.join(f_out_dir, f_out) 
+    def DownloadFile(self, session, connections, ftp_domain, ftp_port, remote_path, local_path, tries=5, backoff=2.):
+        """ 
+        Input:
+            self:        (object) this Proton object
+            session:     (threading.local) holds this thread's FTP connection (as session.ftp) between files
+            connections: (list) the connections that are open, so Download can close them at the end
+            ftp_domain:  (string) the domain name for the FTP server
+            ftp_port:    (integer) the FTP server's port
+            remote_path: (string) the file on the FTP server
+            local_path:  (string) where to put it
+            tries:       (integer) how many times to try
+            backoff:     (float) seconds to wait after the first failed try; doubled after each one
+        Output: (boolean) whether the file was downloaded
+        Description: Download one file.  It is written to a temporary file next to local_path first and only 
+            renamed to local_path once it is complete (and not empty), so a failed download leaves nothing behind.
+            An empty file (one SWPC hasn't filled in yet) or a permanent (5xx) error isn't tried again.  After any
+            other failure the connection is dropped and a new one is made for the next try.
 
-            # Try to actually download the file from the FTP server, if the file does not already exist.
+        """
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        temp_path = f'{local_path}.{os.getpid()}.{threading.get_ident()}.part'
+        for attempt in range(tries):
             try:
-                if not os.path.exists(f_out_full_path):
-                    ftp.retrbinary('RETR {0}'.format(f_in), open('{0}'.format(f_out_full_path), 'wb').write)
-                    self.logger.debug(f'[DS#4/Proton] Just dumped Proton/RSGA data to file ({f_out})')
-            except:
-                self.logger.warning(f'[DS#4/Proton] Failed at retrieving SWPC file {f_in}')
-
-
-            # Determine success/failure of download
-            if not os.path.exists(f_out_full_path) or (os.path.exists(f_out_full_path) and os.stat(f_out_full_path).st_size == 0):
-                # If it fails to download, you'll get a file named properly, but it will be an empty file.
-                try: os.remove(f_out_full_path) # remove the empty file so it doesn't cause problems later
+                if getattr(session, 'ftp', None) is None:
+                    session.ftp = ftplib.FTP(timeout=60)
+                    connections.append(session.ftp)
+                    session.ftp.connect(ftp_domain, ftp_port)
+                    session.ftp.login()
+                with open(temp_path, 'wb') as fh:
+                    session.ftp.retrbinary('RETR {0}'.format(remote_path), fh.write)
+                if os.stat(temp_path).st_size == 0:
+                    # the file is late (SWPC puts an empty file up first); it'll be there on a later run
+                    self.logger.warning(f'[DS#4/Proton] SWPC file {remote_path} is empty on the FTP site (yet)')
+                    break
+                os.replace(temp_path, local_path)
+                self.logger.debug(f'[DS#4/Proton] Just dumped Proton/RSGA data to file ({local_path})')
+                return True
+            except ftplib.error_perm as e:
+                # the server won't send the file; trying again won't help
+                self.logger.warning(f'[DS#4/Proton] Failed at retrieving SWPC file {remote_path}: {e}')
+                break
+            except ftplib.all_errors as e:
+                self.logger.debug(f'[DS#4/Proton] Try {attempt+1} of {tries} at retrieving SWPC file {remote_path} failed: {e}')
+                if getattr(session, 'ftp', None) is not None:
+                    session.ftp.close()
+                    connections.remove(session.ftp)
+                    session.ftp = None
+                if attempt + 1 < tries:
+                    time.sleep(backoff * 2**attempt)
+            finally:
+                try: os.remove(temp_path)
                 except OSError: pass
-                self.logger.warning(f'[DS#4/Proton] Downloaded empty SWPC file ({f_out}) from FTP site')
-                # Do NOT e-mail anyone because this is going to happen EVERY time the new file is slightly late, which is frequently.
-                #self.EmailErrorToResponsiblePerson(802, subj)
-            elif os.path.exists(f_out_full_path):
-                # If it downloads successfully, put it in the list of files to be ingested into the database
-                self.downloaded_files.append(f_out_full_path)
-                self.logger.info('[DS#4/Proton] Successfully downloaded SWPC 3-Day Forecast RSGA file from FTP site.')
-                self.got_good_files = False
-                
-        ftp.quit()
-        self.logger.debug('[DS#4/Proton] Exiting Download.')
-        return
-    # end Proton.Download
+        else:
+            self.logger.warning(f'[DS#4/Proton] Failed at retrieving SWPC file {remote_path} ({tries} tries)')
+        return False
+    # end Proton.DownloadFile
 
 
     def GetPredictionWindow(self, day, issue_time):
@@ -698,8 +911,9 @@ class Proton(DataFormat):
         Input: self: (object) this Proton object
         Output: None
         Description:
-            Get a list of all the RSGA files already downloaded and stored in the local data archive.
-            Sort the list and store it in self.downloaded_files.
+            Get a list of the RSGA files already downloaded and stored in the local data archive for the days in 
+            [start, end) -- or for all the days, if cfg['reload_all'] is set (see IndexArchive).
+            Index the files by date in self.archive_index, and store the list (sorted by date) in self.downloaded_files.
 
             NOTE: this data source has been limited to 1996 - 2012.11.13, per Leila on 2020.02.27
 
@@ -707,50 +921,252 @@ class Proton(DataFormat):
 
         self.logger.debug('[DS#4/Proton] Entered Reload.')
 
+        reload_all = self.cfg.get('reload_all', False)
+        (self.archive_index, self.listed_prefixes, self.listed_files) = self.IndexArchive(self.start_date, self.end_date, reload_all)
+        self.downloaded_files = list(self.archive_index.values())
+        self.logger.debug('[DS#4/Proton] Got list of RSGA files in the data archive.')
 
-        # Get a list of all the >10 MeV RSGA files in the archive.
-        # The filename pattern for the archived files is <archive_dir_from_config.json>/RSGA/YYYY/MM/YYYYMMDDRSGA*.txt
-        fp1 = os.path.join(self.cfg['archive_dir'], 'RSGA', '*', '*', '*RSGA.txt')
+        self.logger.debug('[DS#4/Proton] Exiting Reload.')
+        return 
+    # end Proton.Reload
 
-        # Loop through all the filename patterns and get a list of the files that match each one
-        for fp in [fp1]:
-            # Get the list of file paths that match that filename pattern
-            for f in glob.glob(fp):
-                self.downloaded_files.append(f)
-        self.logger.debug('[DS#4/Proton] Got list of RSGA files in the data archive.')
+    def IndexArchive(self, start, end, reload_all=False):
+        """ 
+        Input:
+            self:       (object) this Proton object
+            start:      (datetime object) the first day to index
+            end:        (datetime object) index the days before this
+            reload_all: (boolean) index every day in the archive instead
+        Output: (tuple) 
+            (OrderedDict) date (midnight) -> the RSGA file for that day in the local data archive, sorted by date
+            (list) the path prefixes that were listed (see ReadParseCache)
+            (set) all the files found under them
+        Description: Only the RSGA/YYYY/MM directories of the months that intersect [start, end) are listed (and
+            the legacy RSGA/YYYY files of those years), so indexing a month takes the same time however big the 
+            archive is.
 
+        """
 
-        # sort the file list
-        self.downloaded_files.sort()
-        self.logger.debug('[DS#4/Proton] Sorted the list of RSGA files in the data archive.')
+        # The filename pattern for the archived files is <archive_dir_from_config.json>/RSGA/YYYY/MM/YYYYMMDDRSGA.txt
+        # (see ArchivePath).  Files downloaded before that were put in <archive_dir>/RSGA/YYYY/noaa.swpc.rsga.10mev.YYYYMMDD.txt;
+        # they are still picked up, unless the day also has a file in the RSGA/YYYY/MM directory.
+        rsga_dir = os.path.join(self.cfg['archive_dir'], 'RSGA')
+        if reload_all:
+            patterns = [os.path.join(rsga_dir, '*', 'noaa.swpc.rsga.10mev.*.txt'), os.path.join(rsga_dir, '*', '*', '*RSGA.txt')]
+        else:
+            years = range(start.year, (end - datetime.timedelta(microseconds=1)).year + 1)
+            months = collections.OrderedDict() # (year, month) of each month that intersects [start, end)
+            d = datetime.datetime(start.year, start.month, 1)
+            while d < end:
+                months[(d.year, d.month)] = True
+                d = (d + datetime.timedelta(days=32)).replace(day=1)
+            patterns = ([os.path.join(rsga_dir, f'{year:04d}', 'noaa.swpc.rsga.10mev.*.txt') for year in years]
+                        + [os.path.join(rsga_dir, f'{year:04d}', f'{month:02d}', '*RSGA.txt') for (year, month) in months])
+
+        # Index the files that match those patterns by the date in their names
+        archive_index = {}
+        listed_prefixes = list(collections.OrderedDict.fromkeys(fp.split('*')[0] for fp in patterns))
+        listed_files = set()
+        for fp in patterns:
+            for f in sorted(glob.glob(fp)):
+                listed_files.add(f)
+                date = ArchiveDate(f)
+                if date is None:
+                    self.logger.debug(f'[DS#4/Proton] Skipping {f}: no date in the file name.')
+                    continue
+                if reload_all or ((date >= start) and (date < end)):
+                    archive_index[date] = f
 
+        # sort the index by date
+        return (collections.OrderedDict(sorted(archive_index.items())), listed_prefixes, listed_files)
+    # end Proton.IndexArchive
 
-        self.logger.debug('[DS#4/Proton] Exiting Reload.')
-        return 
-    # end Proton.Reload
+    def FilesToParse(self, datefilter=True):
+        """ 
+        Input:
+            self:       (object) this Proton object
+            datefilter: (boolean) only keep the files whose YYYYMMDD (from the filename) is in [start, end)
+        Output: (list) the downloaded/reloaded files ParseAll and ParseAllArray parse, in order
 
-    def ParseAll(self, datefilter=True):
-        forecasts = collections.OrderedDict()
+        """
+        filepaths = []
         for filepath in self.downloaded_files:
-            filedir, filename = os.path.split(filepath)
             if datefilter:
-                match = re.search('(\d{4})(\d{2})(\d{2})RSGA.txt', filename)
-                if match:
-                    year = int(match.group(1))
-                    month = int(match.group(2))
-                    day = int(match.group(3))
-                    date = datetime.datetime(year, month, day, 0, 0)
-                else:
-                    continue
-                if not ((date >= self.start_date) and (date < self.end_date)):
+                date = ArchiveDate(filepath)
+                if date is None or not ((date >= self.start_date) and (date < self.end_date)):
                     continue
-            try:
-                forecasts[filepath] = self.ParseDataFile(filepath)
-            except:
-                # logging should have been done upstream; just move on
+            filepaths.append(filepath)
+        return filepaths
+    # end Proton.FilesToParse
+
+    def ParseAll(self, datefilter=True, workers=None, pool='process', chunk_size=None):
+        """ 
+        Input:
+            self:       (object) this Proton object
+            datefilter: (boolean) see FilesToParse
+            workers:    (integer|None) number of worker processes (or threads) to parse with.  None or 1 parses here.
+            pool:       (string) 'process' or 'thread': the kind of concurrent.futures pool the workers are
+            chunk_size: (integer|None) files per pool task.  None picks one from the number of files and workers.
+        Output: (OrderedDict) file path -> (issue time, day 1, day 2, day 3) (see ParseDataFile), in file order
+        Description: Parse all the files.  A file that can't be parsed is left out of the result and put in the
+            failure report, self.parse_failures (file path -> error message, in file order).
+            If cfg['parse_cache'] names a SQLite file, only the files that are new or changed (size or modification 
+            time) since they were put in it get parsed (see ReadParseCache and WriteParseCache).
+
+        """
+        filepaths = self.FilesToParse(datefilter)
+        parse_cache = self.cfg.get('parse_cache')
+        if parse_cache:
+            (cached, stats) = self.ReadParseCache(parse_cache, filepaths)
+        else:
+            (cached, stats) = ({}, {})
+        filepaths_to_parse = [filepath for filepath in filepaths if filepath not in cached]
+        if len(filepaths_to_parse) == 0:
+            results = []
+        elif workers is None or workers <= 1:
+            results = self.ParseFiles(filepaths_to_parse)
+        else:
+            import concurrent.futures
+            if chunk_size is None: chunk_size = max(1, min(64, len(filepaths_to_parse) // (workers * 4)))
+            chunks = [filepaths_to_parse[i:i+chunk_size] for i in range(0, len(filepaths_to_parse), chunk_size)]
+            if pool == 'thread':
+                executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+                parse = self.ParseFiles
+            elif pool == 'process':
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=InitParsePool, initargs=(self,))
+                parse = ParseFilesInPool
+            else:
+                raise ValueError(f'Unknown pool \'{pool}\'. It has to be \'process\' or \'thread\'.')
+            with executor:
+                results = list(itertools.chain.from_iterable(executor.map(parse, chunks))) # map keeps the chunks in order
+        if parse_cache:
+            self.WriteParseCache(parse_cache, stats, results)
+            self.logger.info(f'[DS#4/Proton] Parsed {len(filepaths_to_parse)} RSGA files; took {len(cached)} from the parse cache.')
+
+        forecasts = collections.OrderedDict()
+        self.parse_failures = collections.OrderedDict()
+        parsed = {filepath: (forecast, error) for (filepath, forecast, error) in results}
+        for filepath in filepaths:
+            if filepath in cached:
+                forecasts[filepath] = cached[filepath]
                 continue
-                
+            (forecast, error) = parsed[filepath]
+            if error is None: forecasts[filepath] = forecast
+            else: self.parse_failures[filepath] = error
+        if self.parse_failures:
+            self.logger.warning(f'[DS#4/Proton] Could not parse {len(self.parse_failures)} of {len(filepaths)} RSGA files.')
         return forecasts
     # end Proton.ParseAll
 
+    def ParseFiles(self, filepaths):
+        """ 
+        Input:
+            self:      (object) this Proton object
+            filepaths: (list) full paths to data files
+        Output: (list) one (file path, ParseDataFile result or None, error message or None) tuple per file, in order
+        Description: Parse the files one after the other (what each ParseAll worker does with its chunk).
+
+        """
+        results = []
+        for filepath in filepaths:
+            try:
+                results.append((filepath, self.ParseDataFile(filepath), None))
+            except (Exception, SystemExit) as e:
+                results.append((filepath, None, f'{type(e).__name__}: {e}'))
+        return results
+    # end Proton.ParseFiles
+
+    def ReadParseCache(self, filename, filepaths):
+        """ 
+        Input:
+            self:      (object) this Proton object
+            filename:  (string) the parse cache (SQLite) file.  It is created if it isn't there.
+            filepaths: (list) full paths to the data files about to be parsed
+        Output: (tuple) two dictionaries:
+            file path -> ParseDataFile result, for the files that haven't changed since they were cached
+            file path -> (size, modification time in ns), for the other files (that can be stat'ed)
+        Description: Look the files up in the parse cache.  Entries for files that are no longer in the parts of
+            the archive Reload listed (self.listed_prefixes) are deleted from it; the rest of the cache isn't read.
+
+        """
+        import sqlite3
+        cx = sqlite3.connect(filename, timeout=60)
+        try:
+            with cx:
+                cx.execute('CREATE TABLE IF NOT EXISTS rsga_parse_cache (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, '
+                           'issue_time TEXT, day1 REAL, day2 REAL, day3 REAL)')
+                rows = {}
+                for i in range(0, len(filepaths), 500): # stay under SQLite's limit on the number of ? in a statement
+                    chunk = filepaths[i:i+500]
+                    query = 'SELECT * FROM rsga_parse_cache WHERE path IN ({})'.format(', '.join('?' * len(chunk)))
+                    rows.update((row[0], row[1:]) for row in cx.execute(query, chunk))
+                deleted = []
+                for prefix in self.listed_prefixes:
+                    # the paths that start with prefix (the primary key index makes this a range scan)
+                    for (path,) in cx.execute('SELECT path FROM rsga_parse_cache WHERE path >= ? AND path < ?', (prefix, prefix + '\U0010ffff')):
+                        if path not in self.listed_files: deleted.append((path,))
+                cx.executemany('DELETE FROM rsga_parse_cache WHERE path = ?', deleted)
+        finally:
+            cx.close()
+        if deleted: self.logger.info(f'[DS#4/Proton] Pruned {len(deleted)} deleted RSGA files from the parse cache.')
+
+        cached = {}
+        stats = {}
+        for filepath in filepaths:
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                continue # ParseDataFile will report it
+            row = rows.get(filepath)
+            if row is not None and row[:2] == (st.st_size, st.st_mtime_ns):
+                issue = None if row[2] is None else datetime.datetime.fromisoformat(row[2])
+                cached[filepath] = (issue,) + row[3:]
+            else:
+                stats[filepath] = (st.st_size, st.st_mtime_ns)
+        return (cached, stats)
+    # end Proton.ReadParseCache
+
+    def WriteParseCache(self, filename, stats, results):
+        """ 
+        Input:
+            self:     (object) this Proton object
+            filename: (string) the parse cache (SQLite) file
+            stats:    (dictionary) file path -> (size, modification time in ns) from ReadParseCache, before parsing
+            results:  (list) see ParseFiles
+        Output: None
+        Description: Put the files that were parsed successfully in the parse cache.  Files that couldn't be parsed
+            aren't cached, so they are tried again (and reported) the next time.
+
+        """
+        import sqlite3
+        rows = []
+        for (filepath, forecast, error) in results:
+            if error is not None or filepath not in stats: continue
+            (issue, day1, day2, day3) = forecast
+            rows.append((filepath,) + stats[filepath] + (None if issue is None else issue.isoformat(), day1, day2, day3))
+        cx = sqlite3.connect(filename, timeout=60)
+        try:
+            with cx:
+                cx.executemany('INSERT OR REPLACE INTO rsga_parse_cache VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        finally:
+            cx.close()
+        return
+    # end Proton.WriteParseCache
+
+    def ParseAllArray(self, datefilter=True):
+        """ 
+        Input:
+            self:       (object) this Proton object
+            datefilter: (boolean) see FilesToParse
+        Output: (tuple) the ParseRSGAFiles structured array and the list of file paths its path_index refers to
+        Description: ParseAll for reprocessing the whole archive: all the files are parsed in bulk (see 
+            ParseRSGAFiles) instead of one ParseDataFile call each.  Requires numpy.
+
+        """
+        filepaths = self.FilesToParse(datefilter)
+        records = ParseRSGAFiles(filepaths)
+        self.logger.info(f'[DS#4/Proton] Parsed {len(records)} of {len(filepaths)} RSGA files in bulk.')
+        return (records, filepaths)
+    # end Proton.ParseAllArray
+
 # end class Proton
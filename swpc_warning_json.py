@@ -196,24 +196,23 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Download SWPC warnings from SWPC FTP site; generate SWPC warning forecast JSONs.')
     parser.add_argument('yearmonth', nargs='?', default=current_yearmonth(), help='month in YYYY/MM format')
     parser.add_argument('--all', action='store_true')
+    parser.add_argument('--columns-db', default=None,
+                        help='also put the submissions in this columnar SQLite file')
     args = parser.parse_args()
 
     # Get forecasts for appropriate time range
     forecast_data_filepaths, year, month = get_forecast_data_files(args.yearmonth, args.all)
 
-    # Constant list of JSON data for this type of forecast
-    json_args = ['--model-short-name', 'SWPC Warning',
-                 '--spase-id', '{TBD}',
-                 '--mode', 'forecast',
-                 '--energy-units', 'MeV',
-                 '--all-clear-threshold-units' , 'pfu',
-                 '--species', 'proton',
-                 '--location', 'earth',
-                 ]
-    if get_next_element(json_args, 'spase_id') == '{TBD}':
+    # Constant JSON data for this type of forecast
+    json_model = {'short_name': 'SWPC Warning',
+                  'spase_id': '{TBD}'}
+    json_mode = 'forecast'
+    json_energy_units = 'MeV'
+    json_threshold_units = 'pfu'
+    json_species = 'proton'
+    json_location = 'earth'
+    if json_model['spase_id'] == '{TBD}':
         print('WARNING: SPASE ID is not set.')
-    program_desc = 'Convert directory of files that contain SWPC SPE and ESPE warnings (archive_*.html) to CCMC JSON.'
-    json_parser = sep_json_writer.InitParser(program_desc)
     
     forecasts_df = pd.DataFrame()
     for filepath in forecast_data_filepaths:
@@ -225,37 +224,40 @@ if __name__ == '__main__':
         condition = (forecasts_df['Valid From'].dt.year == year) & (forecasts_df['Valid From'].dt.month == month)
         forecasts_df = forecasts_df[condition]
     json_warning, json_extended_warning = get_json_parameters(forecasts_df)
-    for entry in json_warning:
-        year_str, month_str = get_entry_year_month(entry)
-        output_dir = os.path.join(model_info.model_root['SWPC'], 'Warning', year_str, month_str)
-        useargs = [*json_args,
-                   '--output', os.path.join(output_dir, get_output_name(entry['prediction_window_start'], entry['prediction_window_end'], entry['issue_time'])),
-                   '--issue-time', entry['issue_time'],
-                   '--energy-min', entry['energy_low'],
-                   '--energy-max', entry['energy_high'],
-                   '--all-clear', False,
-                   '--all-clear-threshold' , entry['threshold'],
-                   '--prediction-window', entry['prediction_window_start'], entry['prediction_window_start'],
-                   '--human-evaluation-last-data-time', entry['last_data_time']
-                   ]
-        (output_filename, output_dir, log_msgs, log_dir, log_starter, data_dict) = sep_json_writer.ParseArguments(json_parser, useargs)
-        sep_json_writer.ConvertToJSON(data_dict, output_filename, output_dir, log_msgs, log_dir, log_starter)
-
-    for entry in json_extended_warning: 
-        year_str, month_str = get_entry_year_month(entry)
-        output_dir = os.path.join(model_info.model_root['SWPC'], 'Warning', year_str, month_str)
-        useargs = [*json_args,
-                   '--output', os.path.join(output_dir, get_output_name(entry['prediction_window_start'], entry['prediction_window_end'], entry['issue_time'], extended=True)),
-                   '--issue-time', entry['issue_time'],
-                   '--energy-min', entry['energy_low'],
-                   '--energy-max', entry['energy_high'],
-                   '--all-clear-threshold' , entry['threshold'],
-                   '--prediction-window', entry['prediction_window_start'], entry['prediction_window_start'],
-                   '--human-evaluation-last-data-time', entry['last_data_time']
-                   ]
-        (output_filename, output_dir, log_msgs, log_dir, log_starter, data_dict) = sep_json_writer.ParseArguments(json_parser, useargs)
-        sep_json_writer.ConvertToJSON(data_dict, output_filename, output_dir, log_msgs, log_dir, log_starter)
-
-        # NOTE: OUTPUT DIR DOES NOTHING AS AN ARGUMENT TO sep_json_writer.ConvertToJSON(...)
+    data_dicts = []
+    output_filenames = []
+    for (entries, extended) in [(json_warning, False), (json_extended_warning, True)]:
+        for entry in entries:
+            year_str, month_str = get_entry_year_month(entry)
+            output_dir = os.path.join(model_info.model_root['SWPC'], 'Warning', year_str, month_str)
+            forecast = {'energy_channel': {'min': entry['energy_low'],
+                                           'max': entry['energy_high'],
+                                           'units': json_energy_units},
+                        'species': json_species,
+                        'location': json_location,
+                        'prediction_window': {'start_time': entry['prediction_window_start'],
+                                              'end_time': entry['prediction_window_start']}}
+            # Extended warnings do not carry an all clear boolean
+            if not extended:
+                forecast['all_clear'] = {'all_clear_boolean': False,
+                                         'threshold': entry['threshold'],
+                                         'threshold_units': json_threshold_units}
+            data_dicts.append({'model': dict(json_model),
+                               'issue_time': entry['issue_time'],
+                               'mode': json_mode,
+                               'triggers': [{'human_evaluation': {'last_data_time': entry['last_data_time']}}],
+                               'forecasts': [forecast]})
+            output_filenames.append(os.path.join(output_dir, get_output_name(entry['prediction_window_start'], entry['prediction_window_end'], entry['issue_time'], extended=extended)))
 
+    # A warning that fails validation is skipped (and reported) instead of stopping the whole month
+    results = sep_json_writer.ConvertDataDicts(data_dicts, output_filenames, write_mode='if_changed', columns_db=args.columns_db, on_error='collect', dedupe=True, group=True) # repeated warnings and re-runs are skipped; warnings issued together share a file
+    # One invalid warning fails its whole group, so convert the members of a failed group one at a time to keep the valid ones
+    retry = [i for result in results if result['errors'] and result['write_status'] != 'duplicate' and len(result['members']) > 1 for i in result['members']]
+    results = [result for result in results if not (result['errors'] and len(result['members']) > 1)]
+    if retry:
+        results += sep_json_writer.ConvertDataDicts([data_dicts[i] for i in retry], [output_filenames[i] for i in retry], write_mode='if_changed', columns_db=args.columns_db, on_error='collect', dedupe=True)
+    for result in results:
+        for error in result['errors']:
+            print('SKIPPED', result['output_filename'], '-', error['message'])
 
+    # NOTE: OUTPUT DIR DOES NOTHING AS AN ARGUMENT TO sep_json_writer.ConvertToJSON(...)
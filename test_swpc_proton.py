@@ -0,0 +1,121 @@
+"""Proton.Download against a local FTP server (pyftpdlib) standing in for SWPC's.
+
+    python -m pytest -q test_swpc_proton.py
+"""
+import swpc_proton
+
+import datetime
+import logging
+import os
+import threading
+
+import pytest
+
+pyftpdlib = pytest.importorskip('pyftpdlib')
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler
+from pyftpdlib.servers import ThreadedFTPServer
+
+START = datetime.datetime(2019, 12, 28)
+END = datetime.datetime(2020, 1, 4)       # Download includes the end day
+
+
+def rsga_text(day):
+    return (':Issued: {} 2200 UTC\n'
+            'Proton     {:02d}/02/03\n'.format(day.strftime('%Y %b %d'), day.day))
+
+
+def archive_files(archive_dir):
+    return sorted(os.path.relpath(os.path.join(root, name), archive_dir)
+                  for (root, _, names) in os.walk(archive_dir) for name in names)
+
+
+@pytest.fixture
+def ftp_server(tmp_path):
+    """Serve pub/warehouse/YYYY/RSGA/ for START..END from tmp_path/server.
+
+    Yields (port, retrs, failures, server_dir): the RETR file names in order,
+    {file name: how many more RETRs to refuse with a 426} and the served tree.
+    """
+    server_dir = tmp_path / 'server'
+    day = START
+    while day <= END:
+        year_dir = server_dir / 'pub' / 'warehouse' / str(day.year) / 'RSGA'
+        year_dir.mkdir(parents=True, exist_ok=True)
+        (year_dir / day.strftime('%Y%m%dRSGA.txt')).write_text(rsga_text(day))
+        day += datetime.timedelta(days=1)
+
+    retrs = []
+    failures = {}
+    class Handler(FTPHandler):
+        def ftp_RETR(self, file):
+            name = os.path.basename(file)
+            retrs.append(name)
+            if failures.get(name, 0) > 0:
+                failures[name] -= 1
+                self.respond('426 Connection closed; transfer aborted.')
+                return
+            return FTPHandler.ftp_RETR(self, file)
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(str(server_dir))
+    Handler.authorizer = authorizer
+    logging.getLogger('pyftpdlib').setLevel(logging.ERROR)
+    server = ThreadedFTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield (server.address[1], retrs, failures, server_dir)
+    server.close_all()
+    thread.join(5)
+
+
+def download(archive_dir, port):
+    cfg = dict(archive_dir=str(archive_dir), ftp_host='127.0.0.1', ftp_port=port,
+               ftp_connections=3, ftp_tries=3, ftp_backoff=0.01)
+    return swpc_proton.Proton(START, END, 'download', None, False, logging.getLogger('test_swpc_proton'), None, cfg)
+
+
+def test_download_fetches_only_missing_files(tmp_path, ftp_server):
+    (port, retrs, failures, _) = ftp_server
+    archive_dir = tmp_path / 'archive'
+    have = archive_dir / 'RSGA' / '2019' / '12' / '20191229RSGA.txt'
+    have.parent.mkdir(parents=True)
+    have.write_text('already here')
+    legacy = archive_dir / 'RSGA' / '2020' / 'noaa.swpc.rsga.10mev.20200102.txt'
+    legacy.parent.mkdir(parents=True)
+    legacy.write_text(rsga_text(datetime.datetime(2020, 1, 2)))
+    empty = archive_dir / 'RSGA' / '2019' / '12' / '20191230RSGA.txt'
+    empty.write_text('')
+
+    p = download(archive_dir, port)
+
+    assert sorted(retrs) == ['20191228RSGA.txt', '20191230RSGA.txt', '20191231RSGA.txt',
+                             '20200101RSGA.txt', '20200103RSGA.txt', '20200104RSGA.txt']
+    assert have.read_text() == 'already here'
+    assert empty.read_text() == rsga_text(datetime.datetime(2019, 12, 30))
+    assert len(p.downloaded_files) == 8
+    assert str(legacy) in p.downloaded_files
+
+    # a second run has nothing to fetch
+    del retrs[:]
+    download(archive_dir, port)
+    assert retrs == []
+
+
+def test_download_retries_and_cleans_up(tmp_path, ftp_server):
+    (port, retrs, failures, server_dir) = ftp_server
+    failures['20191231RSGA.txt'] = 2   # fails twice, then succeeds
+    failures['20200101RSGA.txt'] = 99  # always fails
+    (server_dir / 'pub' / 'warehouse' / '2020' / 'RSGA' / '20200103RSGA.txt').write_text('') # not filled in yet
+    archive_dir = tmp_path / 'archive'
+
+    p = download(archive_dir, port)
+
+    assert retrs.count('20191231RSGA.txt') == 3
+    assert retrs.count('20200101RSGA.txt') == 3   # ftp_tries
+    assert retrs.count('20200103RSGA.txt') == 1   # an empty file isn't tried again
+    files = archive_files(archive_dir)
+    assert not [f for f in files if f.endswith('.part')]
+    assert os.path.join('RSGA', '2019', '12', '20191231RSGA.txt') in files
+    assert os.path.join('RSGA', '2020', '01', '20200101RSGA.txt') not in files
+    assert os.path.join('RSGA', '2020', '01', '20200103RSGA.txt') not in files
+    assert len(p.downloaded_files) == 6